@@ -0,0 +1,81 @@
+"""
+compare benchmark results saved by two runs of ``pytest benchmarks``, e.g. on two commits
+
+    $ python benchmarks/compare.py .benchmarks/<old commit>.json .benchmarks/<new commit>.json
+
+Prints the ratio of new / old for time and peak memory of each benchmark,
+and exits with status 1 if any ratio is greater than ``--threshold``.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(old, new, threshold=1.2):
+    """compare results loaded from two json files saved by ``pytest benchmarks``
+
+    Parameters
+    ----------
+    old, new : dict
+        loaded from json files
+    threshold : float
+        ratio of new / old above which a result is reported as a regression.
+        Default is 1.2, i.e. 20% slower or more memory.
+
+    Returns
+    -------
+    rows : list
+        of dicts with keys 'name', 'metric', 'old', 'new', 'ratio', 'regression',
+        one for each metric of each benchmark in both files
+    """
+    rows = []
+    for name, new_result in new['results'].items():
+        old_result = old['results'].get(name)
+        if old_result is None:
+            continue
+        for metric in ('time', 'peak_memory'):
+            if metric not in old_result or metric not in new_result:
+                continue
+            ratio = new_result[metric] / old_result[metric] if old_result[metric] else float('inf')
+            rows.append({
+                'name': name,
+                'metric': metric,
+                'old': old_result[metric],
+                'new': new_result[metric],
+                'ratio': ratio,
+                'regression': ratio > threshold,
+            })
+    return rows
+
+
+def _format(metric, value):
+    if metric == 'time':
+        return f"{value * 1000:.3f} ms"
+    return f"{value / 2 ** 20:.3f} MiB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='compare benchmark results from two runs')
+    parser.add_argument('old', help='json file with results from old run')
+    parser.add_argument('new', help='json file with results from new run')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='ratio of new / old above which a result is a regression. Default is 1.2')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as fp:
+        old = json.load(fp)
+    with open(args.new) as fp:
+        new = json.load(fp)
+    rows = compare(old, new, args.threshold)
+
+    print(f"old: {old['commit']}\nnew: {new['commit']}\n")
+    print(f"{'name':<60} {'metric':<12} {'old':>14} {'new':>14} {'ratio':>8}")
+    for row in rows:
+        flag = '  <-- regression' if row['regression'] else ''
+        print(f"{row['name']:<60} {row['metric']:<12} {_format(row['metric'], row['old']):>14} "
+              f"{_format(row['metric'], row['new']):>14} {row['ratio']:>8.2f}{flag}")
+    return 1 if any(row['regression'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+benchmarks for evfuncs, run with
+
+    $ pytest benchmarks
+
+they are not run with the tests, because ``testpaths`` in pyproject.toml is set to ``tests``.
+
+Time and peak memory for each benchmark are reported in the summary at the end of the run,
+and saved to a json file, by default ``.benchmarks/<commit>.json``
+(use ``--benchmark-json`` to specify another file).
+Results from two commits can be compared with
+
+    $ python benchmarks/compare.py .benchmarks/<old commit>.json .benchmarks/<new commit>.json
+"""
+import datetime
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+import scipy
+
+import evfuncs
+from tests.fixtures import *
+
+
+# maps name of each benchmark to dict with 'time' in seconds and/or 'peak_memory' in bytes
+RESULTS = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark-json', action='store', default=None,
+                     help='json file where benchmark results are saved. '
+                          'Default is .benchmarks/<commit>.json')
+
+
+@pytest.fixture
+def timeit(request):
+    """fixture that times a function call, returning the best time in seconds
+    out of ``repeat`` calls, and saves the result so it is reported
+    in the summary at the end of the run"""
+    def _timeit(func, *args, name=None, repeat=5, **kwargs):
+        times = []
+        for _ in range(repeat):
+            tic = time.perf_counter()
+            func(*args, **kwargs)
+            times.append(time.perf_counter() - tic)
+        best = min(times)
+        RESULTS.setdefault(name or request.node.name, {})['time'] = best
+        return best
+    return _timeit
+
+
+@pytest.fixture
+def memit(request):
+    """fixture that measures the peak memory allocated by a function call,
+    with ``tracemalloc``, returning the peak in bytes, and saves the result so it is reported
+    in the summary at the end of the run"""
+    def _memit(func, *args, name=None, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        RESULTS.setdefault(name or request.node.name, {})['peak_memory'] = peak
+        return peak
+    return _memit
+
+
+@pytest.fixture
+def bench(timeit, memit):
+    """fixture that measures both the time and the peak memory of a function call.
+    Not named ``benchmark``, so it does not clash with the fixture from pytest-benchmark"""
+    def _bench(func, *args, name=None, repeat=5, **kwargs):
+        memit(func, *args, name=name, **kwargs)
+        return timeit(func, *args, name=name, repeat=repeat, **kwargs)
+    return _bench
+
+
+def write_synthetic_recording(cbin, duration, num_channels=1, samp_freq=32000, seed=0):
+    """write a synthetic recording to a .cbin file, with a .rec file,
+    made of noise plus 100 ms "syllables" (3 kHz tones) every 200 ms,
+    so benchmarks can use recordings longer than the ones in the test data"""
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * samp_freq)
+    t = np.arange(num_samples) / samp_freq
+    song = 300 * rng.standard_normal(num_samples)
+    is_syllable = (t % 0.2) < 0.1
+    song[is_syllable] += 8000 * np.sin(2 * np.pi * 3000 * t[is_syllable])
+    data = np.repeat(song[:, np.newaxis], num_channels, axis=1)
+    data.astype('>i2').tofile(cbin)  # channels interleaved, like EvTAF
+
+    rec = Path(cbin).with_suffix('.rec')
+    rec.write_text(
+        "File created: Fri, Mar 23, 2012, 08:08:15\n"
+        "\n"
+        "     begin rec = 0 ms\n"
+        "     trig time  = 0 ms\n"
+        f"     rec end = {int(duration * 1000)} ms\n"
+        "\n"
+        f"ADFREQ =   {samp_freq}\n"
+        f"Chans = {num_channels}\n"
+        f"Samples = {num_samples}\n"
+        "Catch = 0\n"
+        "T Before = 2.0000000000E+0\n"
+        "T After = 2.0000000000E+0\n"
+    )
+    return Path(cbin)
+
+
+@pytest.fixture(scope='session')
+def synthetic_cbin(tmp_path_factory):
+    """fixture that returns a function which makes a synthetic recording,
+    with a given duration in seconds and number of channels, and returns path to .cbin file.
+    Recordings are only written once per session"""
+    tmp_path = tmp_path_factory.mktemp('synthetic')
+    made = {}
+
+    def _synthetic_cbin(duration, num_channels=1):
+        if (duration, num_channels) not in made:
+            cbin = tmp_path / f'synthetic_{duration}s_{num_channels}ch.cbin'
+            made[(duration, num_channels)] = write_synthetic_recording(cbin, duration, num_channels)
+        return made[(duration, num_channels)]
+    return _synthetic_cbin
+
+
+def _git_commit():
+    """get commit that benchmarks were run on, with '-dirty' appended if there are uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True, cwd=Path(__file__).parent).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                capture_output=True, text=True, check=True,
+                                cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + '-dirty' if status else commit
+
+
+def pytest_sessionfinish(session):
+    if not RESULTS:
+        return
+    commit = _git_commit()
+    results_json = session.config.getoption('--benchmark-json')
+    if results_json is None:
+        name = commit[:12] + ('-dirty' if commit.endswith('-dirty') else '')
+        results_json = Path(session.config.rootpath) / '.benchmarks' / f'{name}.json'
+    results_json = Path(results_json)
+    results_json.parent.mkdir(parents=True, exist_ok=True)
+    with results_json.open('w') as fp:
+        json.dump(
+            {
+                'commit': commit,
+                'datetime': datetime.datetime.now().isoformat(),
+                'machine': platform.machine(),
+                'python': platform.python_version(),
+                'evfuncs': evfuncs.__version__,
+                'numpy': np.__version__,
+                'scipy': scipy.__version__,
+                'results': RESULTS,
+            },
+            fp,
+            indent=2,
+        )
+    session.config._benchmark_json = results_json
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not RESULTS:
+        return
+    terminalreporter.section('benchmark results')
+    terminalreporter.write_line(f"{'name':<60} {'time (ms)':>12} {'peak memory (MiB)':>18}")
+    for name, result in RESULTS.items():
+        time_ms = f"{result['time'] * 1000:.3f}" if 'time' in result else '-'
+        peak_mib = f"{result['peak_memory'] / 2 ** 20:.3f}" if 'peak_memory' in result else '-'
+        terminalreporter.write_line(f"{name:<60} {time_ms:>12} {peak_mib:>18}")
+    results_json = getattr(config, '_benchmark_json', None)
+    if results_json is not None:
+        terminalreporter.write_line(f"results saved in {results_json}")
@@ -0,0 +1,31 @@
+"""
+benchmark evfuncs.annot.Annotations, on a synthetic corpus
+with as many syllables as a season of song
+"""
+import numpy as np
+import pytest
+
+import evfuncs.annot
+
+
+@pytest.fixture(scope='module')
+def season():
+    """one million syllables, in 20,000 files"""
+    rng = np.random.default_rng(0)
+    n_files, per_file = 20000, 50
+    labels = rng.choice(list('abcdefghij'), size=(n_files, per_file))
+    durations = rng.uniform(20, 200, size=(n_files, per_file))
+    gaps = rng.uniform(5, 50, size=(n_files, per_file))
+    onsets = np.cumsum(durations + gaps, axis=1) - durations
+    return evfuncs.annot.Annotations._from_files(
+        [f'{ind}.cbin.not.mat' for ind in range(n_files)],
+        list(onsets), list(onsets + durations), [''.join(row) for row in labels],
+    )
+
+
+def test_annotations_stats(season, bench):
+    bench(season.stats, repeat=3)
+
+
+def test_annotations_gaps(season, timeit):
+    timeit(lambda: season.gaps)
@@ -0,0 +1,69 @@
+"""
+benchmark methods of evfuncs.bandpass_filtfilt
+"""
+import numpy as np
+import pytest
+
+import evfuncs
+
+
+@pytest.mark.parametrize(
+    'method',
+    [
+        'filtfilt',
+        'fft',
+        'oa',
+    ]
+)
+def test_bandpass_filtfilt_method(cbins, bench, method):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    bench(evfuncs.bandpass_filtfilt, dat, fs, method=method)
+
+
+# number of samples in each bracket that determines number of taps in filter
+@pytest.mark.parametrize(
+    'num_samples, numtaps',
+    [
+        (300, 64),
+        (700, 128),
+        (1500, 256),
+        (32000, 512),
+    ]
+)
+@pytest.mark.parametrize(
+    'method',
+    [
+        'filtfilt',
+        'fft',
+    ]
+)
+def test_bandpass_filtfilt_numtaps(cbins, bench, num_samples, numtaps, method):
+    assert evfuncs.evfuncs._numtaps(num_samples) == numtaps
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    bench(evfuncs.bandpass_filtfilt, dat[:num_samples], fs, method=method, repeat=20)
+
+
+@pytest.mark.parametrize(
+    'method',
+    [
+        'filtfilt',
+        'fft',
+        'oa',
+    ]
+)
+def test_bandpass_filtfilt_long(synthetic_cbin, bench, method):
+    dat, fs = evfuncs.load_cbin(synthetic_cbin(100))
+    bench(evfuncs.bandpass_filtfilt, dat, fs, method=method, repeat=3)
+
+
+def test_bandpass_filtfilt_speedup(cbins, timeit):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    filtfilt_time = timeit(evfuncs.bandpass_filtfilt, dat, fs, method='filtfilt',
+                           name='speedup_filtfilt')
+    for method in ('fft', 'oa'):
+        method_time = timeit(evfuncs.bandpass_filtfilt, dat, fs, method=method,
+                             name=f'speedup_{method}')
+        print(f"speedup of method '{method}' over 'filtfilt': {filtfilt_time / method_time:.1f}x")
+        assert method_time < filtfilt_time
+        assert np.allclose(evfuncs.bandpass_filtfilt(dat, fs, method=method),
+                           evfuncs.bandpass_filtfilt(dat, fs))
@@ -0,0 +1,19 @@
+"""
+benchmark time to import evfuncs, in a new interpreter,
+since short-lived worker processes and command-line invocations pay this cost every time
+
+Like the other benchmarks, these do not assert anything about time, because it depends on the machine.
+Regressions are caught by comparing results from two commits with ``benchmarks/compare.py``.
+That scipy is not imported is checked by ``test_import_does_not_import_scipy`` in the tests.
+"""
+import subprocess
+import sys
+
+
+def test_import_evfuncs(timeit):
+    timeit(subprocess.run, [sys.executable, '-c', 'import evfuncs'], check=True)
+
+
+def test_import_python(timeit):
+    # baseline, time to start interpreter without importing evfuncs
+    timeit(subprocess.run, [sys.executable, '-c', 'pass'], check=True)
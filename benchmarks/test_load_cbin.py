@@ -0,0 +1,53 @@
+"""
+benchmark evfuncs.load_cbin, for files with different numbers of channels and durations
+"""
+import numpy as np
+import pytest
+
+import evfuncs
+
+
+def test_load_cbin(cbins, bench):
+    bench(lambda: [evfuncs.load_cbin(cbin) for cbin in cbins])
+
+
+@pytest.mark.parametrize(
+    'duration, num_channels',
+    [
+        (10, 1),
+        (10, 2),
+        (10, 4),
+        (100, 1),
+        (100, 4),
+    ]
+)
+@pytest.mark.parametrize(
+    'mmap',
+    [
+        False,
+        True,
+    ]
+)
+def test_load_cbin_synthetic(synthetic_cbin, bench, duration, num_channels, mmap):
+    cbin = synthetic_cbin(duration, num_channels)
+    bench(evfuncs.load_cbin, cbin, mmap=mmap)
+
+
+@pytest.mark.parametrize(
+    'dtype',
+    [
+        None,
+        'int16',
+        'float32',
+        'float64',
+    ]
+)
+def test_load_cbin_dtype(synthetic_cbin, bench, dtype):
+    cbin = synthetic_cbin(100, 2)
+    bench(evfuncs.load_cbin, cbin, dtype=dtype)
+
+
+def test_load_cbin_out(synthetic_cbin, bench):
+    cbin = synthetic_cbin(100, 2)
+    out = np.empty((100 * 32000,), dtype=np.float32)
+    bench(evfuncs.load_cbin, cbin, out=out)
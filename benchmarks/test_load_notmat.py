@@ -0,0 +1,17 @@
+"""
+benchmark readers used by evfuncs.load_notmat
+"""
+import pytest
+
+import evfuncs
+
+
+@pytest.mark.parametrize(
+    'reader',
+    [
+        'scipy',
+        'fast',
+    ]
+)
+def test_load_notmat_reader(notmats, bench, reader):
+    bench(lambda: [evfuncs.load_notmat(notmat, reader=reader) for notmat in notmats])
@@ -0,0 +1,42 @@
+"""
+benchmark coarse-to-fine segmenting with evfuncs.pyramid
+"""
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.pyramid
+
+
+@pytest.fixture(scope='module')
+def mostly_silent(tmp_path_factory):
+    """smoothed envelope of one hour at 32 kHz, silent except for
+    one second of song every minute, saved to a .npy file"""
+    samp_freq = 32000
+    smooth = np.full(3600 * samp_freq, 100.)
+    t = np.arange(samp_freq) / samp_freq
+    song = np.where((t % 0.2) < 0.1, 20000., 100.)
+    for start in range(0, smooth.shape[0], 60 * samp_freq):
+        smooth[start:start + samp_freq] = song
+    npy = tmp_path_factory.mktemp('pyramid') / 'smooth.npy'
+    np.save(npy, smooth)
+    return npy, samp_freq
+
+
+def test_build_pyramid(mostly_silent, timeit):
+    npy, samp_freq = mostly_silent
+    smooth = np.load(npy)
+    timeit(evfuncs.pyramid.build_pyramid, smooth, samp_freq=samp_freq, repeat=3)
+
+
+def test_segment_song_mostly_silent(mostly_silent, timeit):
+    npy, samp_freq = mostly_silent
+    smooth = np.load(npy, mmap_mode='r')
+    timeit(evfuncs.segment_song, smooth, samp_freq, repeat=3)
+
+
+def test_segment_song_pyramid_mostly_silent(mostly_silent, timeit):
+    npy, samp_freq = mostly_silent
+    smooth = np.load(npy, mmap_mode='r')
+    pyramid = evfuncs.pyramid.build_pyramid(np.load(npy), samp_freq=samp_freq)
+    timeit(evfuncs.segment_song, smooth, samp_freq, pyramid=pyramid, repeat=3)
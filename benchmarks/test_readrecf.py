@@ -0,0 +1,29 @@
+"""
+benchmark parsing .rec files
+"""
+import evfuncs
+import evfuncs.cache
+import evfuncs.index
+
+
+def test_readrecf(rec_files, bench):
+    bench(lambda: [evfuncs.readrecf(rec_file) for rec_file in rec_files])
+
+
+def test_rec_cache(rec_files, tmp_path, bench):
+    with evfuncs.cache.RecCache(tmp_path / 'rec_cache.json') as rec_cache:
+        for rec_file in rec_files:
+            rec_cache.readrecf(rec_file)
+    rec_cache = evfuncs.cache.RecCache(tmp_path / 'rec_cache.json')
+    bench(lambda: [rec_cache.readrecf(rec_file) for rec_file in rec_files])
+
+
+def test_build_index(gy6or6_032312_subset_root, bench):
+    bench(lambda: evfuncs.index.build_index(gy6or6_032312_subset_root))
+
+
+def test_build_index_rec_cache(gy6or6_032312_subset_root, tmp_path, bench):
+    with evfuncs.cache.RecCache(tmp_path / 'rec_cache.json') as rec_cache:
+        evfuncs.index.build_index(gy6or6_032312_subset_root, rec_cache=rec_cache)
+    rec_cache = evfuncs.cache.RecCache(tmp_path / 'rec_cache.json')
+    bench(lambda: evfuncs.index.build_index(gy6or6_032312_subset_root, rec_cache=rec_cache))
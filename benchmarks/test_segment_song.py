@@ -0,0 +1,16 @@
+"""
+benchmark evfuncs.segment_song
+"""
+import evfuncs
+
+
+def test_segment_song(cbins, bench):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    smooth = evfuncs.smooth_data(dat, fs)
+    bench(evfuncs.segment_song, smooth, fs, return_Hz=True, repeat=20)
+
+
+def test_segment_song_long(synthetic_cbin, bench):
+    dat, fs = evfuncs.load_cbin(synthetic_cbin(100))
+    smooth = evfuncs.smooth_data(dat, fs, filter_method='fft')
+    bench(evfuncs.segment_song, smooth, fs, return_Hz=True)
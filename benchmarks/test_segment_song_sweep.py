@@ -0,0 +1,33 @@
+"""
+benchmark evfuncs.sweep.segment_song_sweep against calling evfuncs.segment_song for each point in grid
+"""
+import itertools
+
+import numpy as np
+
+import evfuncs
+import evfuncs.sweep
+
+
+THRESHOLDS = np.arange(1000, 10000, 500)
+MIN_SYL_DURS = [0.005, 0.01, 0.02, 0.03]
+MIN_SILENT_DURS = [0.001, 0.002, 0.005, 0.01]
+
+
+def _segment_song_grid(smooth, fs):
+    for threshold, min_syl_dur, min_silent_dur in itertools.product(THRESHOLDS, MIN_SYL_DURS,
+                                                                     MIN_SILENT_DURS):
+        evfuncs.segment_song(smooth, fs, threshold, min_syl_dur, min_silent_dur)
+
+
+def test_segment_song_grid(cbins, timeit):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    smooth = evfuncs.smooth_data(dat, fs)
+    timeit(_segment_song_grid, smooth, fs, repeat=3)
+
+
+def test_segment_song_sweep(cbins, timeit):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    smooth = evfuncs.smooth_data(dat, fs)
+    timeit(evfuncs.sweep.segment_song_sweep, smooth, fs, THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS,
+           repeat=3)
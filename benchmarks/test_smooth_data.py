@@ -0,0 +1,38 @@
+"""
+benchmark methods of evfuncs.smooth_data
+"""
+import pytest
+
+import evfuncs
+
+
+@pytest.mark.parametrize(
+    'smooth_method, dtype',
+    [
+        ('convolve', None),
+        ('running', None),
+        ('running', 'float32'),
+    ]
+)
+def test_smooth_data_smooth_method(cbins, bench, smooth_method, dtype):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    dat = dat.astype(float)
+    bench(evfuncs.smooth_data, dat, fs, freq_cutoffs=None,
+          smooth_method=smooth_method, dtype=dtype)
+
+
+def test_smooth_data(cbins, bench):
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    bench(evfuncs.smooth_data, dat, fs)
+
+
+@pytest.mark.parametrize(
+    'filter_method',
+    [
+        'filtfilt',
+        'fft',
+    ]
+)
+def test_smooth_data_long(synthetic_cbin, bench, filter_method):
+    dat, fs = evfuncs.load_cbin(synthetic_cbin(100))
+    bench(evfuncs.smooth_data, dat, fs, filter_method=filter_method, repeat=3)
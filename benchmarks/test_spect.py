@@ -0,0 +1,33 @@
+"""
+benchmark evfuncs.spect.syllable_spectrograms,
+compared with calling scipy.signal.spectrogram for each syllable
+"""
+import numpy as np
+import pytest
+import scipy.signal
+
+import evfuncs
+import evfuncs.spect
+
+
+@pytest.fixture
+def syllables(synthetic_cbin):
+    # synthetic recording has a 100 ms syllable every 200 ms
+    dat, fs = evfuncs.load_cbin(synthetic_cbin(100))
+    onsets = np.arange(0, 99.8, 0.2)
+    return dat, fs, onsets, onsets + 0.1
+
+
+def _spectrogram_loop(dat, fs, onsets, offsets):
+    for start, stop in zip(np.round(onsets * fs).astype(int), np.round(offsets * fs).astype(int)):
+        scipy.signal.spectrogram(dat[start:stop].astype(np.float64), fs, window='hann', nperseg=512)
+
+
+def test_spectrogram_loop(syllables, bench):
+    bench(_spectrogram_loop, *syllables)
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+@pytest.mark.parametrize('output', ['padded', 'ragged'])
+def test_syllable_spectrograms(syllables, bench, output, dtype):
+    bench(evfuncs.spect.syllable_spectrograms, *syllables, output=output, dtype=dtype)
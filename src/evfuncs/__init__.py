@@ -10,4 +10,14 @@ from .__about__ import (
     __version__,
 )
 
-from .evfuncs import readrecf, load_cbin, load_notmat, bandpass_filtfilt, smooth_data, segment_song
+from .evfuncs import (
+    readrecf,
+    load_cbin,
+    load_notmat,
+    bandpass_filtfilt,
+    bandpass_filter_cache_clear,
+    bandpass_filter_cache_info,
+    smooth_data,
+    segment_song,
+)
+from . import annot, batch, cache, clips, index, instrument, prefetch, pyramid, spect, store, stream, sweep
@@ -0,0 +1,191 @@
+"""
+minimal reader for the small MAT-files (version 5) saved by evsonganaly.
+
+Only supports numeric and char arrays, which is all that .not.mat files contain.
+Returns values the same way that ``scipy.io.loadmat(filename, squeeze_me=True)`` does,
+but is much faster for small files since it only parses the variables that are asked for.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+
+# data types, from MAT-file format documentation
+MI_INT8 = 1
+MI_UINT8 = 2
+MI_INT16 = 3
+MI_UINT16 = 4
+MI_INT32 = 5
+MI_UINT32 = 6
+MI_SINGLE = 7
+MI_DOUBLE = 9
+MI_INT64 = 12
+MI_UINT64 = 13
+MI_MATRIX = 14
+MI_COMPRESSED = 15
+MI_UTF8 = 16
+MI_UTF16 = 17
+MI_UTF32 = 18
+
+MI_DTYPES = {
+    MI_INT8: 'i1',
+    MI_UINT8: 'u1',
+    MI_INT16: 'i2',
+    MI_UINT16: 'u2',
+    MI_INT32: 'i4',
+    MI_UINT32: 'u4',
+    MI_SINGLE: 'f4',
+    MI_DOUBLE: 'f8',
+    MI_INT64: 'i8',
+    MI_UINT64: 'u8',
+}
+
+MX_CHAR_CLASS = 4
+# classes of numeric arrays, mxDOUBLE_CLASS through mxUINT64_CLASS
+MX_NUMERIC_CLASSES = range(6, 16)
+
+HEADER_LEN = 128
+# version in header of MAT-files version 5 (and 7, that only adds compression).
+# Version 7.3 files are HDF5 files, with version 0x0200
+MAT5_VERSION = 0x0100
+# number of decompressed bytes needed to read the name of a variable:
+# tag (8) + array flags (16) + dimensions (8 + 8 for 2-d) + name (8 + up to 64),
+# with plenty of room to spare for arrays with more dimensions
+NAME_LEN = 256
+
+
+class UnsupportedMatFileError(Exception):
+    """raised when a file is not a MAT-file that can be read by this module"""
+
+
+def _read_tag(buffer, pos, byte_order):
+    """read tag of data element; returns data type, number of bytes,
+    position where data starts, and position of next element"""
+    mi_type, n_bytes = struct.unpack_from(byte_order + 'II', buffer, pos)
+    if mi_type >> 16:  # "small data element", data is packed into tag
+        return mi_type & 0xFFFF, mi_type >> 16, pos + 4, pos + 8
+    data_pos = pos + 8
+    # data elements are padded to 8 bytes, except for compressed elements
+    end = data_pos + n_bytes if mi_type == MI_COMPRESSED else data_pos + n_bytes + (-n_bytes % 8)
+    return mi_type, n_bytes, data_pos, end
+
+
+def _read_matrix_header(buffer, pos, byte_order):
+    """read array flags, dimensions and name of matrix element that starts at ``pos``,
+    i.e. just after the miMATRIX tag. Returns class, dimensions, name,
+    and position of the real part of the data"""
+    _, _, data_pos, pos = _read_tag(buffer, pos, byte_order)
+    flags, = struct.unpack_from(byte_order + 'I', buffer, data_pos)
+    mx_class = flags & 0xFF
+    is_complex = bool(flags & (1 << 11))
+    _, n_bytes, data_pos, pos = _read_tag(buffer, pos, byte_order)
+    dims = struct.unpack_from(f'{byte_order}{n_bytes // 4}i', buffer, data_pos)
+    _, n_bytes, data_pos, pos = _read_tag(buffer, pos, byte_order)
+    name = bytes(buffer[data_pos:data_pos + n_bytes]).decode('ascii')
+    return mx_class, is_complex, dims, name, pos
+
+
+def _read_matrix(buffer, pos, byte_order, mx_class, is_complex, dims, name):
+    """read the real part of a numeric or char matrix,
+    and return it squeezed the same way as ``scipy.io.loadmat``"""
+    if is_complex or not (mx_class == MX_CHAR_CLASS or mx_class in MX_NUMERIC_CLASSES):
+        raise UnsupportedMatFileError(
+            f"Can only read real numeric or char arrays, but variable {name} has class {mx_class}"
+        )
+    mi_type, n_bytes, data_pos, _ = _read_tag(buffer, pos, byte_order)
+    if mx_class == MX_CHAR_CLASS:
+        if mi_type in (MI_UTF8, MI_INT8, MI_UINT8):
+            chars = bytes(buffer[data_pos:data_pos + n_bytes]).decode('utf-8')
+        elif mi_type in (MI_UTF16, MI_UINT16):
+            chars = bytes(buffer[data_pos:data_pos + n_bytes]).decode(
+                'utf-16-le' if byte_order == '<' else 'utf-16-be'
+            )
+        else:
+            raise UnsupportedMatFileError(
+                f"Can't read char array {name} saved with data type {mi_type}"
+            )
+        if 0 in dims:
+            return np.array([], dtype='<U1')  # what loadmat returns for an empty char array
+        if len(dims) == 2 and dims[0] > 1:
+            # char matrix with multiple rows, stored column-major
+            arr = np.array(list(chars)).reshape(dims, order='F')
+            return np.array([''.join(row) for row in arr])
+        return chars
+    # like loadmat with mat_dtype=False, keep the type the data was saved as
+    arr = np.frombuffer(buffer, dtype=byte_order + MI_DTYPES[mi_type],
+                        count=n_bytes // np.dtype(MI_DTYPES[mi_type]).itemsize, offset=data_pos)
+    arr = arr.astype(MI_DTYPES[mi_type])  # native byte order
+    if 0 in dims:
+        return arr.reshape((0,))  # loadmat squeezes empty arrays to 1-d
+    arr = np.squeeze(arr.reshape(dims, order='F'))
+    if arr.ndim == 0:
+        return arr.item()
+    return arr
+
+
+def loadmat(filename, variable_names):
+    """load variables from a MAT-file, version 5,
+    returning them as ``scipy.io.loadmat(filename, squeeze_me=True)`` would
+
+    Parameters
+    ----------
+    filename : str, Path
+        name of MAT-file
+    variable_names : sequence
+        of str, names of variables to load.
+        Variables that are not in the file are not in the returned dict.
+
+    Returns
+    -------
+    mat_dict : dict
+        mapping variable names to values
+    """
+    with open(filename, 'rb') as fp:
+        buffer = fp.read()
+    if len(buffer) < HEADER_LEN or buffer[126:128] not in (b'IM', b'MI'):
+        raise UnsupportedMatFileError(f"Not a version 5 MAT-file: {filename}")
+    byte_order = '<' if buffer[126:128] == b'IM' else '>'
+    version, = struct.unpack_from(byte_order + 'H', buffer, 124)
+    if version != MAT5_VERSION:
+        # e.g. version 7.3, which is an HDF5 file
+        raise UnsupportedMatFileError(
+            f"Not a version 5 MAT-file: {filename}, version in header was: {version:#06x}"
+        )
+    buffer = memoryview(buffer)  # so slices are not copies
+
+    variable_names = set(variable_names)
+    mat_dict = {}
+    pos = HEADER_LEN
+    try:
+        while pos + 8 <= len(buffer) and len(mat_dict) < len(variable_names):
+            mi_type, n_bytes, data_pos, pos = _read_tag(buffer, pos, byte_order)
+            if data_pos + n_bytes > len(buffer):
+                raise UnsupportedMatFileError(f"MAT-file is truncated: {filename}")
+            if mi_type == MI_COMPRESSED:
+                decompressor = zlib.decompressobj()
+                # only decompress enough to get name, in case we can skip this variable
+                element = decompressor.decompress(buffer[data_pos:data_pos + n_bytes], NAME_LEN)
+                mi_type, _, matrix_pos, _ = _read_tag(element, 0, byte_order)
+                if mi_type != MI_MATRIX:
+                    continue
+                mx_class, is_complex, dims, name, real_pos = _read_matrix_header(element, matrix_pos, byte_order)
+                if name not in variable_names:
+                    continue
+                element += decompressor.decompress(decompressor.unconsumed_tail) + decompressor.flush()
+                if not decompressor.eof:
+                    raise UnsupportedMatFileError(f"MAT-file is truncated: {filename}")
+                mat_dict[name] = _read_matrix(element, real_pos, byte_order, mx_class, is_complex, dims, name)
+            elif mi_type == MI_MATRIX:
+                if n_bytes == 0:
+                    continue
+                mx_class, is_complex, dims, name, real_pos = _read_matrix_header(buffer, data_pos, byte_order)
+                if name not in variable_names:
+                    continue
+                mat_dict[name] = _read_matrix(buffer, real_pos, byte_order, mx_class, is_complex, dims, name)
+        if 0 < len(buffer) - pos < 8:  # file ends in the middle of a tag
+            raise UnsupportedMatFileError(f"MAT-file is truncated: {filename}")
+    except (struct.error, zlib.error, ValueError, KeyError, UnicodeDecodeError) as err:
+        # raised when data elements are corrupt, so the reader can fall back to ``scipy.io.loadmat``
+        raise UnsupportedMatFileError(f"Could not read MAT-file: {filename}") from err
+    return mat_dict
@@ -0,0 +1,346 @@
+"""
+compact store of annotations from many files, with onsets, offsets and labels
+of all syllables concatenated into flat arrays, and vectorized statistics
+computed over all syllables at once, grouped by label
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .evfuncs import _paths_from, load_notmat
+
+
+# label given to segments that do not have one, e.g. segments returned by ``segment_song``.
+# This is the label that evsonganaly gives to unlabeled segments
+UNLABELED = '-'
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _codes_from_labels(labels):
+    """helper function that converts a string of labels, one character per syllable,
+    into integer codes, and the sorted unique labels that codes index into"""
+    codepoints = np.frombuffer(labels.encode('utf-32-le'), dtype=np.uint32)
+    unique, codes = np.unique(codepoints, return_inverse=True)
+    names = np.array([chr(codepoint) for codepoint in unique], dtype='<U1')
+    return codes.astype(np.int32), names
+
+
+class Annotations:
+    """onsets, offsets and labels of syllables from many files,
+    concatenated into flat arrays, with an index of where each file starts
+
+    Labels are stored as integer codes into ``label_names``,
+    so that statistics can be grouped by label without Python loops.
+    Usually made with ``from_notmats``, ``from_index`` or ``from_segments``,
+    so that hand annotations and predicted segments can be analyzed the same way.
+
+    Parameters
+    ----------
+    onsets, offsets : numpy.ndarray
+        onsets and offsets of all syllables, in milliseconds
+    label_codes : numpy.ndarray
+        label of each syllable, as an index into ``label_names``
+    label_names : numpy.ndarray
+        unique labels, one string per label
+    file_offsets : numpy.ndarray
+        1-d vector of ints, with length (number of files + 1).
+        Syllables from file ``i`` are ``onsets[file_offsets[i]:file_offsets[i + 1]]``.
+    files : numpy.ndarray
+        name of each file
+
+    Examples
+    --------
+    >>> annots = Annotations.from_notmats('gy6or6_032312_subset')
+    >>> stats = annots.stats()
+    >>> for label, count, median in zip(stats['labels'], stats['counts'], stats['duration_percentiles'][:, 2]):
+    ...     print(label, count, median)
+    """
+    def __init__(self, onsets, offsets, label_codes, label_names, file_offsets, files):
+        self.onsets = np.asarray(onsets, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.float64)
+        self.label_codes = np.asarray(label_codes, dtype=np.int32)
+        self.label_names = np.asarray(label_names, dtype=str)
+        self.file_offsets = np.asarray(file_offsets, dtype=np.int64)
+        self.files = np.asarray(files, dtype=str)
+        if not (self.onsets.shape == self.offsets.shape == self.label_codes.shape):
+            raise ValueError(
+                f"onsets, offsets and label_codes must have the same shape, but shapes were: "
+                f"{self.onsets.shape}, {self.offsets.shape}, {self.label_codes.shape}"
+            )
+        if self.file_offsets.shape[0] != self.files.shape[0] + 1 or self.file_offsets[-1] != len(self):
+            raise ValueError(
+                "file_offsets must have length (number of files + 1), "
+                "and its last element must be the number of syllables"
+            )
+
+    @classmethod
+    def _from_files(cls, files, onsets, offsets, labels):
+        """helper method that makes annotations from lists with one element per file,
+        where ``labels`` is a list of strings with one character per syllable"""
+        n_syllables = [onsets_file.shape[0] for onsets_file in onsets]
+        for file, n, labels_file in zip(files, n_syllables, labels):
+            if len(labels_file) != n:
+                raise ValueError(
+                    f"number of labels for {file} was {len(labels_file)}, "
+                    f"but number of onsets was {n}"
+                )
+        label_codes, label_names = _codes_from_labels(''.join(labels))
+        return cls(
+            np.concatenate(onsets) if onsets else np.array([], dtype=np.float64),
+            np.concatenate(offsets) if offsets else np.array([], dtype=np.float64),
+            label_codes,
+            label_names,
+            np.concatenate(([0], np.cumsum(n_syllables, dtype=np.int64))),
+            [str(file) for file in files],
+        )
+
+    @classmethod
+    def from_notmats(cls, notmats):
+        """make annotations from .not.mat files
+
+        Parameters
+        ----------
+        notmats : str, Path, list
+            a directory containing .not.mat files, a single .not.mat file,
+            or a list of .not.mat files
+
+        Returns
+        -------
+        annots : Annotations
+        """
+        notmats = _paths_from(notmats, pattern='*.not.mat')
+        files, onsets, offsets, labels = [], [], [], []
+        for notmat in notmats:
+            notmat_dict = load_notmat(notmat, reader='fast', variables=['labels', 'onsets', 'offsets'])
+            files.append(notmat)
+            onsets.append(np.atleast_1d(np.asarray(notmat_dict['onsets'], dtype=np.float64)))
+            offsets.append(np.atleast_1d(np.asarray(notmat_dict['offsets'], dtype=np.float64)))
+            # labels is an empty array, not a string, when no segments are labeled
+            labels.append(''.join(np.atleast_1d(notmat_dict['labels'])))
+        return cls._from_files(files, onsets, offsets, labels)
+
+    @classmethod
+    def from_index(cls, index):
+        """make annotations from an index made by ``evfuncs.index.build_index``,
+        without reading any .not.mat files
+
+        Parameters
+        ----------
+        index : dict
+            returned by ``evfuncs.index.build_index`` or ``evfuncs.index.load_index``
+
+        Returns
+        -------
+        annots : Annotations
+            with one file for every .cbin file in index
+        """
+        label_codes, label_names = _codes_from_labels(
+            ''.join(''.join(np.atleast_1d(labels)) for labels in index['labels'])
+        )
+        segment_offsets = np.asarray(index['segment_offsets'], dtype=np.int64)
+        if label_codes.shape[0] != segment_offsets[-1]:
+            raise ValueError(
+                f"number of labels in index was {label_codes.shape[0]}, "
+                f"but number of onsets was {segment_offsets[-1]}"
+            )
+        return cls(index['onsets'], index['offsets'], label_codes, label_names,
+                   segment_offsets, index['cbin'])
+
+    @classmethod
+    def from_segments(cls, segments, files=None, label=UNLABELED):
+        """make annotations from segments returned by ``evfuncs.segment_song``
+
+        Parameters
+        ----------
+        segments : list
+            of tuples (onsets_s, offsets_s), one per file, as returned by ``segment_song``,
+            with onsets and offsets in seconds. Tuples can be (None, None)
+            for files without segments.
+        files : list
+            name of each file. Default is None, in which case files are named
+            by their position in ``segments``.
+        label : str
+            label given to every segment. Default is ``UNLABELED``, '-'.
+
+        Returns
+        -------
+        annots : Annotations
+            with onsets and offsets converted to milliseconds, like .not.mat files
+
+        Examples
+        --------
+        >>> segments = []
+        >>> for cbin in cbins:
+        ...     rawsong, samp_freq = load_cbin(cbin)
+        ...     segments.append(segment_song(smooth_data(rawsong, samp_freq), samp_freq))
+        >>> predicted = Annotations.from_segments(segments, files=cbins)
+        >>> annotated = Annotations.from_notmats(notmats)
+        """
+        segments = list(segments)
+        if files is None:
+            files = [str(ind) for ind in range(len(segments))]
+        if len(files) != len(segments):
+            raise ValueError(
+                f"number of files was {len(files)}, but number of segments was {len(segments)}"
+            )
+        onsets, offsets, labels = [], [], []
+        for onsets_s, offsets_s, *_ in segments:
+            if onsets_s is None:
+                onsets_s, offsets_s = np.array([]), np.array([])
+            onsets.append(np.asarray(onsets_s, dtype=np.float64) * 1000)
+            offsets.append(np.asarray(offsets_s, dtype=np.float64) * 1000)
+            labels.append(label * onsets[-1].shape[0])
+        return cls._from_files(files, onsets, offsets, labels)
+
+    def __len__(self):
+        return self.onsets.shape[0]
+
+    @property
+    def n_files(self):
+        return self.files.shape[0]
+
+    @property
+    def labels(self):
+        """label of each syllable, as an array of strings"""
+        return self.label_names[self.label_codes]
+
+    @property
+    def file_index(self):
+        """index of the file that each syllable is from"""
+        return np.repeat(np.arange(self.n_files), np.diff(self.file_offsets))
+
+    @property
+    def durations(self):
+        """duration of each syllable, in milliseconds"""
+        return self.offsets - self.onsets
+
+    @property
+    def gaps(self):
+        """silent gap after each syllable, in milliseconds,
+        from its offset to the onset of the next syllable in the same file.
+        NaN for the last syllable in each file"""
+        gaps = np.full(len(self), np.nan)
+        gaps[:-1] = self.onsets[1:] - self.offsets[:-1]
+        last = self.file_offsets[1:][np.diff(self.file_offsets) > 0] - 1
+        gaps[last] = np.nan
+        return gaps
+
+    def file(self, ind):
+        """get annotations for one file
+
+        Returns
+        -------
+        annot_dict : dict
+            with keys 'file', 'onsets', 'offsets', and 'labels',
+            where 'labels' is a string, as returned by ``evfuncs.load_notmat``
+        """
+        start, stop = self.file_offsets[ind], self.file_offsets[ind + 1]
+        return {
+            'file': str(self.files[ind]),
+            'onsets': self.onsets[start:stop],
+            'offsets': self.offsets[start:stop],
+            'labels': ''.join(self.labels[start:stop]),
+        }
+
+    def stats(self, percentiles=PERCENTILES):
+        """compute statistics of syllables grouped by label, for all syllables at once
+
+        Parameters
+        ----------
+        percentiles : sequence
+            of percentiles of durations and gaps to compute, between 0 and 100.
+            Default is (5, 25, 50, 75, 95).
+
+        Returns
+        -------
+        stats_dict : dict
+            with following key, value pairs
+                labels : numpy.ndarray
+                    unique labels, the order of rows in all other values
+                counts : numpy.ndarray
+                    number of syllables with each label
+                duration_mean : numpy.ndarray
+                    mean duration of syllables with each label, in milliseconds
+                duration_percentiles : numpy.ndarray
+                    with shape (number of labels, number of percentiles),
+                    percentiles of durations, in milliseconds,
+                    computed the same way as ``numpy.percentile``
+                gap_percentiles : numpy.ndarray
+                    with shape (number of labels, number of percentiles),
+                    percentiles of silent gaps after syllables with each label, in milliseconds,
+                    not including the last syllable in each file
+                transition_counts : numpy.ndarray
+                    with shape (number of labels, number of labels),
+                    where element ``[i, j]`` is the number of times
+                    a syllable with label ``i`` is followed by a syllable with label ``j``
+                    in the same file
+                percentiles : numpy.ndarray
+                    percentiles that were computed
+        """
+        percentiles = np.asarray(percentiles, dtype=np.float64)
+        n_labels = self.label_names.shape[0]
+        counts = np.bincount(self.label_codes, minlength=n_labels)
+        durations = self.durations
+        with np.errstate(invalid='ignore', divide='ignore'):
+            duration_mean = np.bincount(self.label_codes, weights=durations, minlength=n_labels) / counts
+
+        gaps = self.gaps
+        has_gap = ~np.isnan(gaps)
+        # a syllable is followed by another in the same file if and only if it has a gap
+        transitions = self.label_codes[:-1][has_gap[:-1]] * n_labels + self.label_codes[1:][has_gap[:-1]]
+        transition_counts = np.bincount(transitions, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+        return {
+            'labels': self.label_names,
+            'counts': counts,
+            'duration_mean': duration_mean,
+            'duration_percentiles': _grouped_percentiles(durations, self.label_codes, n_labels, percentiles),
+            'gap_percentiles': _grouped_percentiles(gaps[has_gap], self.label_codes[has_gap], n_labels,
+                                                    percentiles),
+            'transition_counts': transition_counts,
+            'percentiles': percentiles,
+        }
+
+    def save(self, path):
+        """save annotations in a .npz file"""
+        path = Path(path)
+        # np.savez adds .npz if it's not already the suffix, so write to file object.
+        # Temporary file is unique to this process, so concurrent saves don't write to the same file
+        tmp_path = path.parent.joinpath(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('wb') as fp:
+            np.savez(fp, onsets=self.onsets, offsets=self.offsets, label_codes=self.label_codes,
+                     label_names=self.label_names, file_offsets=self.file_offsets, files=self.files)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """load annotations saved with ``Annotations.save``"""
+        with np.load(path, allow_pickle=False) as npz:
+            return cls(npz['onsets'], npz['offsets'], npz['label_codes'],
+                       npz['label_names'], npz['file_offsets'], npz['files'])
+
+
+def _grouped_percentiles(values, groups, n_groups, percentiles):
+    """helper function that computes percentiles of ``values`` in each group,
+    with linear interpolation like ``numpy.percentile``, by sorting once.
+    Percentiles are NaN for groups with no values"""
+    # sort by value, then stable sort by group, which is faster than ``numpy.lexsort``
+    order = np.argsort(values)
+    order = order[np.argsort(groups[order], kind='stable')]
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # fractional position of each percentile within each group, shape (n_groups, n_percentiles)
+    positions = (counts[:, np.newaxis] - 1) * (percentiles / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, counts[:, np.newaxis] - 1)
+    fraction = positions - lower
+    result = np.full((n_groups, percentiles.shape[0]), np.nan)
+    has_values = counts > 0
+    lower_values = values[(starts[:, np.newaxis] + lower)[has_values]]
+    upper_values = values[(starts[:, np.newaxis] + upper)[has_values]]
+    fraction = fraction[has_values]
+    result[has_values] = lower_values + (upper_values - lower_values) * fraction
+    return result
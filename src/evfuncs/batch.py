@@ -0,0 +1,162 @@
+"""
+functions for running the load_cbin -> smooth_data -> segment_song pipeline
+over many .cbin files in parallel
+"""
+import collections
+import concurrent.futures
+import os
+import traceback
+from pathlib import Path
+
+from .evfuncs import _paths_from, load_cbin, load_notmat, smooth_data, segment_song
+
+
+def segment_file(cbin, channel=0, freq_cutoffs=(500, 10000), smooth_win=2,
+                 threshold=5000, min_syl_dur=0.02, min_silent_dur=0.002,
+                 params_from_notmat=False, envelope_cache=None):
+    """segment one .cbin file into syllables,
+    by loading it with ``load_cbin``, smoothing with ``smooth_data``,
+    and then segmenting with ``segment_song``
+
+    Parameters
+    ----------
+    cbin : str, Path
+        .cbin file to segment
+    channel : int
+        Channel in file to load. Default is 0.
+    freq_cutoffs : list
+        passed to ``smooth_data``. Default is (500, 10000).
+    smooth_win : int
+        passed to ``smooth_data``. Default is 2.
+    threshold : int
+        passed to ``segment_song``. Default is 5000.
+    min_syl_dur : float
+        passed to ``segment_song``. Default is 0.02.
+    min_silent_dur : float
+        passed to ``segment_song``. Default is 0.002.
+    params_from_notmat : bool
+        if True, use the values for ``threshold``, ``min_syl_dur``,
+        ``min_silent_dur`` and ``smooth_win`` saved in the .not.mat file
+        associated with ``cbin``, instead of the values passed in.
+        Default is False.
+    envelope_cache : evfuncs.cache.EnvelopeCache
+        if specified, smoothed audio is loaded from this cache
+        when it has already been computed, instead of filtering and smoothing again.
+        Default is None.
+
+    Returns
+    -------
+    result : dict
+        with following key, value pairs
+            cbin : pathlib.Path
+                .cbin file that was segmented
+            onsets : numpy.ndarray
+                onsets of segments, in seconds. None if there were no segments.
+            offsets : numpy.ndarray
+                offsets of segments, in seconds. None if there were no segments.
+            error : str
+                None if segmenting succeeded.
+                Otherwise, the traceback of the exception that was raised.
+    """
+    cbin = Path(cbin)
+    try:
+        if params_from_notmat:
+            notmat_dict = load_notmat(cbin)
+            threshold = notmat_dict['threshold']
+            min_syl_dur = notmat_dict['min_dur'] / 1000
+            min_silent_dur = notmat_dict['min_int'] / 1000
+            smooth_win = notmat_dict['sm_win']
+        if envelope_cache is None:
+            rawsong, samp_freq = load_cbin(cbin, channel=channel)
+            smooth = smooth_data(rawsong, samp_freq, freq_cutoffs, smooth_win)
+        else:
+            smooth, samp_freq = envelope_cache.smooth_data(cbin, channel, freq_cutoffs, smooth_win)
+        onsets, offsets = segment_song(smooth, samp_freq, threshold,
+                                       min_syl_dur, min_silent_dur)
+    except Exception:
+        return {'cbin': cbin, 'onsets': None, 'offsets': None,
+                'error': traceback.format_exc()}
+    return {'cbin': cbin, 'onsets': onsets, 'offsets': offsets, 'error': None}
+
+
+def _segment_chunk(cbins, kwargs):
+    """helper function run by worker processes, that segments a chunk of files"""
+    return [segment_file(cbin, **kwargs) for cbin in cbins]
+
+
+def segment_files(cbins, n_workers=None, chunksize=8, max_in_flight=None,
+                  ordered=True, **kwargs):
+    """segment many .cbin files into syllables, in parallel
+
+    Fans out ``evfuncs.batch.segment_file`` over a pool of processes.
+
+    Parameters
+    ----------
+    cbins : str, Path, list
+        a directory containing .cbin files, a single .cbin file, or a list of .cbin files.
+    n_workers : int
+        number of worker processes. Default is None,
+        in which case the number of CPUs is used.
+        If 0, files are segmented in the calling process.
+    chunksize : int
+        number of files sent to a worker process at a time. Default is 8.
+    max_in_flight : int
+        maximum number of chunks that are submitted to the pool
+        and not yet yielded, which bounds how many results are held in memory.
+        Default is None, in which case it is two times ``n_workers``.
+    ordered : bool
+        if True, results are yielded in the same order as ``cbins``.
+        If False, results are yielded as soon as chunks complete.
+        Default is True.
+    **kwargs
+        passed to ``evfuncs.batch.segment_file``, e.g. ``threshold``
+
+    Yields
+    ------
+    result : dict
+        returned by ``evfuncs.batch.segment_file``, one for each file.
+        If an exception was raised when segmenting a file, the traceback
+        is in ``result['error']``, and the rest of the files are still segmented.
+
+    Examples
+    --------
+    >>> for result in segment_files('gy6or6_032312_subset', threshold=1500):
+    ...     if result['error'] is None:
+    ...         print(result['cbin'], result['onsets'])
+    """
+    cbins = _paths_from(cbins)
+    chunks = [cbins[ind:ind + chunksize] for ind in range(0, len(cbins), chunksize)]
+
+    if n_workers == 0:
+        for chunk in chunks:
+            yield from _segment_chunk(chunk, kwargs)
+        return
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = 2 * n_workers
+
+    chunks = iter(chunks)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+        in_flight = collections.deque()
+
+        def _submit():
+            for chunk in chunks:
+                in_flight.append(executor.submit(_segment_chunk, chunk, kwargs))
+                if len(in_flight) >= max_in_flight:
+                    break
+
+        _submit()
+        while in_flight:
+            if ordered:
+                future = in_flight.popleft()
+            else:
+                done, _ = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                future = done.pop()
+                in_flight.remove(future)
+            results = future.result()
+            _submit()
+            yield from results
@@ -0,0 +1,346 @@
+"""
+persistent on-disk caches, so that repeated passes over the same files
+can skip work that was already done
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .evfuncs import _rec_path, load_cbin, readrecf, smooth_data
+
+
+def _rec_dict_to_json(rec_dict):
+    """helper function that converts rec_dict returned by ``readrecf``
+    to something that can be saved as json"""
+    rec_json = dict(rec_dict)
+    if 'feedback_info' in rec_json:
+        # keys are floats, which json would convert to strings
+        rec_json['feedback_info'] = list(rec_json['feedback_info'].items())
+    return rec_json
+
+
+def _rec_dict_from_json(rec_json):
+    """helper function that converts rec_dict saved as json
+    back to the dict returned by ``readrecf``"""
+    rec_dict = dict(rec_json)
+    if 'header' in rec_dict:
+        rec_dict['header'] = list(rec_dict['header'])
+    if 'thresholds' in rec_dict:
+        rec_dict['thresholds'] = list(rec_dict['thresholds'])
+    if 'feedback_info' in rec_dict:
+        rec_dict['feedback_info'] = {time: fb_type for time, fb_type in rec_dict['feedback_info']}
+    return rec_dict
+
+
+class RecCache:
+    """persistent on-disk cache of metadata parsed from .rec files by ``readrecf``
+
+    Each entry is keyed by the absolute path of the .rec file,
+    and is only used if the file's size and modification time
+    are the same as when the entry was made.
+
+    Parameters
+    ----------
+    path : str, Path
+        json file where cache is saved.
+        If it exists, entries are loaded from it.
+
+    Attributes
+    ----------
+    hits : int
+        number of times a .rec file was found in the cache
+    misses : int
+        number of times a .rec file had to be parsed
+
+    Examples
+    --------
+    >>> with RecCache('rec_cache.json') as rec_cache:
+    ...     durs = []
+    ...     for recf in sorted(Path('gy6or6_032312_subset').glob('*.rec')):
+    ...         rec_dict = rec_cache.readrecf(recf)
+    ...         durs.append(rec_dict['num_samples'] / rec_dict['sample_freq'])
+
+    Use cache when building an index, so .rec files are only parsed once
+
+    >>> with RecCache('rec_cache.json') as rec_cache:
+    ...     index = evfuncs.index.build_index('gy6or6_032312_subset', rec_cache=rec_cache)
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.exists():
+            with self.path.open('r') as fp:
+                self._entries = json.load(fp)
+        else:
+            self._entries = {}
+        self._modified = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.save()
+
+    def readrecf(self, filename):
+        """read .rec file, using cached metadata if the file has not changed
+
+        Parameters
+        ----------
+        filename : str, Path
+            name of .rec file, can include path
+
+        Returns
+        -------
+        rec_dict : dict
+            same as returned by ``evfuncs.readrecf``
+        """
+        # abspath + os.stat are much faster than Path.resolve + Path.stat,
+        # which matters since the point of the cache is to make this fast
+        key = os.path.abspath(filename)
+        stat = os.stat(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            self.hits += 1
+            return _rec_dict_from_json(entry['rec_dict'])
+
+        self.misses += 1
+        rec_dict = readrecf(key)
+        self._entries[key] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'rec_dict': _rec_dict_to_json(rec_dict),
+        }
+        self._modified = True
+        return rec_dict
+
+    def save(self):
+        """save cache to ``path``, if any entries were added"""
+        if not self._modified:
+            return
+        # write to temporary file then rename, so an interrupted save can't corrupt the cache.
+        # Name of temporary file is unique to process, so processes saving at the same time don't collide
+        tmp_path = self.path.parent.joinpath(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('w') as fp:
+            json.dump(self._entries, fp)
+        os.replace(tmp_path, self.path)
+        self._modified = False
+
+    def clear(self):
+        """remove all entries from the cache"""
+        self._entries = {}
+        self._modified = True
+
+
+class EnvelopeCache:
+    """persistent on-disk cache of smoothed amplitude envelopes
+    computed from .cbin files by ``evfuncs.smooth_data``,
+    so that segmenting the same files again with different parameters
+    for ``segment_song`` skips filtering and smoothing
+
+    Each envelope is saved in its own file in ``directory``,
+    with a name that is a hash of the key for that envelope.
+    The key is made from the .cbin file (its absolute path, size and modification time,
+    or a hash of its contents), the sampling frequency,
+    and the parameters passed to ``smooth_data``.
+
+    Parameters
+    ----------
+    directory : str, Path
+        directory where envelopes are saved. Created if it does not exist.
+    max_bytes : int
+        maximum total size of files in cache, in bytes.
+        When adding an envelope makes the cache larger than this,
+        least recently used envelopes are removed.
+        Default is None, in which case the size is not limited.
+    dtype : str, numpy.dtype
+        data type that envelopes are saved as. One of {'float32', 'float64'}.
+        Default is 'float64'. Use 'float32' to save half the space.
+    compress : bool
+        if True, save envelopes compressed, with ``numpy.savez_compressed``.
+        Default is False.
+    key : str
+        how .cbin files are identified. One of {'stat', 'content'}.
+        If 'stat', by absolute path, size and modification time, which is fast.
+        If 'content', by a hash of the contents of the file, so the key is the same
+        if the file is moved or copied, but the file has to be read to compute it.
+        Default is 'stat'.
+
+    Attributes
+    ----------
+    hits : int
+        number of times an envelope was found in the cache
+    misses : int
+        number of times an envelope had to be computed
+
+    Examples
+    --------
+    >>> envelope_cache = EnvelopeCache('envelopes', max_bytes=2 ** 30, dtype='float32')
+    >>> for threshold in (3000, 5000, 7000):
+    ...     for cbin in sorted(Path('gy6or6_032312_subset').glob('*.cbin')):
+    ...         smooth, samp_freq = envelope_cache.smooth_data(cbin)
+    ...         onsets, offsets = segment_song(smooth, samp_freq, threshold)
+
+    Notes
+    -----
+    Recently used is tracked with the modification time of each file in the cache,
+    which is updated every time the envelope is loaded, so no index needs to be saved,
+    and more than one process can use the same cache.
+    """
+    def __init__(self, directory, max_bytes=None, dtype='float64', compress=False, key='stat'):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError(
+                f"dtype must be one of {{'float32', 'float64'}}, but was: {dtype}"
+            )
+        self.compress = compress
+        if key not in ('stat', 'content'):
+            raise ValueError(
+                f"key must be one of {{'stat', 'content'}}, but was: {key}"
+            )
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+
+    def _file_key(self, cbin):
+        """helper function that identifies a .cbin file, by stat or by contents"""
+        if self.key == 'content':
+            digest = hashlib.sha1()
+            with open(cbin, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(2 ** 20), b''):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        path = os.path.abspath(cbin)
+        stat = os.stat(path)
+        return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _path(self, cbin, sample_freq, channel, smooth_kwargs):
+        """helper function that returns path of file where envelope is saved"""
+        key = json.dumps(
+            [self._file_key(cbin), sample_freq, channel, self.dtype.str, smooth_kwargs],
+            sort_keys=True,
+        )
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return self.directory / (name + ('.npz' if self.compress else '.npy'))
+
+    def _files(self):
+        return [path for path in self.directory.iterdir() if path.suffix in ('.npy', '.npz')]
+
+    def __len__(self):
+        return len(self._files())
+
+    @property
+    def total_bytes(self):
+        """total size of files in cache, in bytes"""
+        total = 0
+        for path in self._files():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:  # removed by another process
+                pass
+        return total
+
+    def smooth_data(self, cbin, channel=0, freq_cutoffs=(500, 10000), smooth_win=2,
+                    filter_method='filtfilt', smooth_method='convolve'):
+        """load a .cbin file and smooth it with ``evfuncs.smooth_data``,
+        or load the smoothed envelope from the cache if it was already computed
+
+        Parameters
+        ----------
+        cbin : str, Path
+            .cbin file
+        channel : int
+            Channel in file to load. Default is 0.
+        freq_cutoffs, smooth_win, filter_method, smooth_method
+            passed to ``evfuncs.smooth_data``
+
+        Returns
+        -------
+        smooth : numpy.ndarray
+            smoothed envelope, with data type ``dtype``
+        sample_freq : int
+            sampling frequency of .cbin file
+        """
+        cbin = Path(cbin)
+        sample_freq = readrecf(_rec_path(cbin))['sample_freq']
+        smooth_kwargs = {
+            'freq_cutoffs': None if freq_cutoffs is None else [float(freq) for freq in freq_cutoffs],
+            'smooth_win': smooth_win,
+            'filter_method': filter_method,
+            'smooth_method': smooth_method,
+        }
+        path = self._path(cbin, sample_freq, channel, smooth_kwargs)
+        try:
+            smooth = self._load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            # ValueError or OSError if file was only partially written, e.g. by a killed process
+            pass
+        else:
+            os.utime(path)  # mark as most recently used
+            self.hits += 1
+            return smooth, sample_freq
+
+        self.misses += 1
+        rawsong, sample_freq = load_cbin(cbin, channel=channel)
+        smooth = smooth_data(rawsong, sample_freq, freq_cutoffs, smooth_win,
+                             filter_method=filter_method, smooth_method=smooth_method)
+        smooth = smooth.astype(self.dtype, copy=False)
+        self._save(path, smooth)
+        if self.max_bytes is not None:
+            self.evict()
+        return smooth, sample_freq
+
+    def _load(self, path):
+        if self.compress:
+            with np.load(path, allow_pickle=False) as npz:
+                return npz['smooth']
+        return np.load(path, allow_pickle=False)
+
+    def _save(self, path, smooth):
+        # write to temporary file then rename, so other processes never see a partial file
+        tmp_path = path.parent.joinpath(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('wb') as fp:
+            if self.compress:
+                np.savez_compressed(fp, smooth=smooth)
+            else:
+                np.save(fp, smooth, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """remove least recently used envelopes until total size of files in cache
+        is not more than ``max_bytes``"""
+        if self.max_bytes is None:
+            return
+        entries = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # removed by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """remove all envelopes from the cache"""
+        for path in self._files():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,119 @@
+"""
+command-line interface for evfuncs
+"""
+import argparse
+import csv
+import sys
+
+
+def _segment(args):
+    from .batch import segment_files
+
+    cbins = args.cbins[0] if len(args.cbins) == 1 else args.cbins
+    kwargs = dict(
+        channel=args.channel,
+        freq_cutoffs=(args.freq_cutoffs[0], args.freq_cutoffs[1]),
+        smooth_win=args.smooth_win,
+        threshold=args.threshold,
+        min_syl_dur=args.min_syl_dur,
+        min_silent_dur=args.min_silent_dur,
+        params_from_notmat=args.params_from_notmat,
+    )
+    if args.envelope_cache is not None:
+        from .cache import EnvelopeCache
+
+        kwargs['envelope_cache'] = EnvelopeCache(args.envelope_cache, max_bytes=args.envelope_cache_max_bytes)
+    n_errors = 0
+    with open(args.output, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['cbin', 'onset_s', 'offset_s'])
+        for result in segment_files(cbins, n_workers=args.workers, chunksize=args.chunksize,
+                                    ordered=not args.unordered, **kwargs):
+            if result['error'] is not None:
+                n_errors += 1
+                print(f"error segmenting {result['cbin']}:\n{result['error']}", file=sys.stderr)
+                continue
+            if result['onsets'] is None:
+                continue
+            for onset, offset in zip(result['onsets'], result['offsets']):
+                writer.writerow([str(result['cbin']), onset, offset])
+    return 1 if n_errors else 0
+
+
+def _convert(args):
+    from .store import convert
+
+    cbins = args.cbins[0] if len(args.cbins) == 1 else args.cbins
+    names = convert(cbins, args.output, root=args.root, compresslevel=args.compresslevel)
+    print(f"converted {len(names)} files to {args.output}")
+    return 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='evfuncs',
+        description='Functions for working with files created by the EvTAF program and the evsonganaly GUI',
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    segment_parser = subparsers.add_parser(
+        'segment',
+        help='segment .cbin files into syllables, in parallel, and save onsets and offsets to a csv file'
+    )
+    segment_parser.add_argument('cbins', nargs='+',
+                                help='directory containing .cbin files, or a list of .cbin files')
+    segment_parser.add_argument('-o', '--output', default='segments.csv',
+                                help='name of csv file to save onsets and offsets in. '
+                                     'Default is segments.csv')
+    segment_parser.add_argument('--workers', type=int, default=None,
+                                help='number of worker processes. Default is number of CPUs')
+    segment_parser.add_argument('--chunksize', type=int, default=8,
+                                help='number of files sent to a worker at a time. Default is 8')
+    segment_parser.add_argument('--unordered', action='store_true',
+                                help='save results as they complete, instead of in the order of files')
+    segment_parser.add_argument('--channel', type=int, default=0,
+                                help='channel in .cbin files to load. Default is 0')
+    segment_parser.add_argument('--freq-cutoffs', type=float, nargs=2, default=(500, 10000),
+                                help='cutoff frequencies for bandpass filter. Default is 500 10000')
+    segment_parser.add_argument('--smooth-win', type=int, default=2,
+                                help='size of smoothing window in milliseconds. Default is 2')
+    segment_parser.add_argument('--threshold', type=float, default=5000,
+                                help='amplitude threshold for segments. Default is 5000')
+    segment_parser.add_argument('--min-syl-dur', type=float, default=0.02,
+                                help='minimum duration of a segment, in seconds. Default is 0.02')
+    segment_parser.add_argument('--min-silent-dur', type=float, default=0.002,
+                                help='minimum duration of silent gap between segments, in seconds. '
+                                     'Default is 0.002')
+    segment_parser.add_argument('--params-from-notmat', action='store_true',
+                                help='use the segmenting parameters saved in the .not.mat file '
+                                     'for each .cbin file')
+    segment_parser.add_argument('--envelope-cache', default=None,
+                                help='directory where smoothed audio is cached, so that segmenting '
+                                     'the same files again with different parameters skips smoothing')
+    segment_parser.add_argument('--envelope-cache-max-bytes', type=int, default=None,
+                                help='maximum size of envelope cache in bytes; '
+                                     'least recently used envelopes are removed. Default is no limit')
+    segment_parser.set_defaults(func=_segment)
+
+    convert_parser = subparsers.add_parser(
+        'convert',
+        help='convert .cbin files, with their .rec and .not.mat files, into a single compressed container'
+    )
+    convert_parser.add_argument('cbins', nargs='+',
+                                help='directory containing .cbin files, or a list of .cbin files')
+    convert_parser.add_argument('-o', '--output', required=True,
+                                help='name of container file to create')
+    convert_parser.add_argument('--root', default=None,
+                                help='directory that names of files in container are relative to. '
+                                     'Default is the directory being converted')
+    convert_parser.add_argument('--compresslevel', type=int, default=6,
+                                help='level of compression, from 0 to 9. Default is 6')
+    convert_parser.set_defaults(func=_convert)
+
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
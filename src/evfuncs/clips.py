@@ -0,0 +1,172 @@
+"""
+functions for extracting clips of annotated syllables from .cbin audio files,
+using the onsets and offsets in .not.mat files
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .evfuncs import _notmat_path, _paths_from, _rec_path, load_cbin, load_notmat, readrecf
+
+
+SyllableClip = namedtuple('SyllableClip', ['cbin', 'label', 'onset', 'offset', 'audio'])
+SyllableClip.__doc__ = """a clip of audio containing one annotated syllable
+
+Attributes
+----------
+cbin : pathlib.Path
+    .cbin file that clip was extracted from
+label : str
+    label for syllable, from .not.mat file
+onset : float
+    onset of syllable, in milliseconds
+offset : float
+    offset of syllable, in milliseconds
+audio : numpy.ndarray
+    1-d vector of 16-bit signed integers, the audio for the syllable
+"""
+
+
+def _segments_in_samples(notmat_dict, sample_freq, num_samples):
+    """helper function that converts onsets and offsets from a .not.mat,
+    which are in milliseconds, to indices of samples,
+    sorted by onset so a file can be read once, sequentially"""
+    onsets = notmat_dict['onsets']
+    offsets = notmat_dict['offsets']
+    labels = np.array(list(notmat_dict['labels']))
+    starts = np.round(onsets / 1000 * sample_freq).astype(int)
+    stops = np.round(offsets / 1000 * sample_freq).astype(int)
+    starts = np.clip(starts, 0, num_samples)
+    stops = np.clip(stops, starts, num_samples)
+    order = np.argsort(starts, kind='stable')
+    return labels[order], onsets[order], offsets[order], starts[order], stops[order]
+
+
+def iter_syllable_clips(cbins, channel=0):
+    """iterate over every annotated syllable in .cbin files,
+    without loading the audio of entire songs into memory
+
+    Parameters
+    ----------
+    cbins : str, Path, list
+        a directory containing .cbin files, or a list of .cbin files.
+        Files that do not have an associated .not.mat file are skipped.
+    channel : int
+        Channel in files to load. Default is 0.
+
+    Yields
+    ------
+    clip : SyllableClip
+        named tuple with fields ``cbin``, ``label``, ``onset``, ``offset``, ``audio``.
+        Onsets and offsets are in milliseconds, as in .not.mat files.
+
+    Examples
+    --------
+    >>> for clip in iter_syllable_clips('gy6or6_032312_subset'):
+    ...     print(clip.label, clip.audio.shape)
+
+    Notes
+    -----
+    Each .cbin file is memory-mapped with ``evfuncs.load_cbin``,
+    and clips are read in order of their onsets,
+    so each file is read at most once, sequentially,
+    and only the samples within annotated segments are read.
+    """
+    for cbin in _paths_from(cbins):
+        notmat = _notmat_path(cbin)
+        if not notmat.exists():
+            continue
+        notmat_dict = load_notmat(notmat)
+        data, sample_freq = load_cbin(cbin, channel=channel, mmap=True)
+        for label, onset, offset, start, stop in zip(
+                *_segments_in_samples(notmat_dict, sample_freq, data.shape[0])
+        ):
+            yield SyllableClip(cbin, label, onset, offset, np.array(data[start:stop]))
+
+
+def extract_syllable_clips(cbins, channel=0):
+    """extract every annotated syllable in .cbin files
+    into one contiguous array, with an index of where each clip starts and stops
+
+    Parameters
+    ----------
+    cbins : str, Path, list
+        a directory containing .cbin files, or a list of .cbin files.
+        Files that do not have an associated .not.mat file are skipped.
+    channel : int
+        Channel in files to load. Default is 0.
+
+    Returns
+    -------
+    clips_dict : dict
+        with following key, value pairs
+            audio : numpy.ndarray
+                1-d vector of 16-bit signed integers, all clips concatenated
+            clip_offsets : numpy.ndarray
+                1-d vector of ints, with length (number of clips + 1).
+                Clip ``i`` is ``audio[clip_offsets[i]:clip_offsets[i + 1]]``.
+            labels : numpy.ndarray
+                label of each clip
+            onsets : numpy.ndarray
+                onset of each clip, in milliseconds
+            offsets : numpy.ndarray
+                offset of each clip, in milliseconds
+            file_index : numpy.ndarray
+                index into ``cbins`` of the file that each clip is from
+            cbins : list
+                of pathlib.Path, the .cbin files that clips are from
+            sample_freq : numpy.ndarray
+                sampling frequency of each file in ``cbins``
+
+    Examples
+    --------
+    >>> clips_dict = extract_syllable_clips('gy6or6_032312_subset')
+    >>> offs = clips_dict['clip_offsets']
+    >>> first_clip = clips_dict['audio'][offs[0]:offs[1]]
+    """
+    # first pass only reads annotations and .rec files, so we can allocate one array for all the clips.
+    # .cbin files are opened in the second pass, one at a time,
+    # so the number of open files does not grow with the number of .cbin files
+    segments = []
+    for cbin in _paths_from(cbins):
+        notmat = _notmat_path(cbin)
+        if not notmat.exists():
+            continue
+        rec_dict = readrecf(_rec_path(cbin))
+        sample_freq = rec_dict['sample_freq']
+        # same number of samples as ``load_cbin``, computed from size of file
+        num_samples = cbin.stat().st_size // (2 * rec_dict['num_channels'])
+        segments.append(
+            (cbin, sample_freq,
+             _segments_in_samples(load_notmat(notmat), sample_freq, num_samples))
+        )
+
+    clip_lens = [stops - starts for _, _, (_, _, _, starts, stops) in segments]
+    clip_lens = np.concatenate(clip_lens) if clip_lens else np.array([], dtype=int)
+    clip_offsets = np.concatenate(([0], np.cumsum(clip_lens))).astype(int)
+    audio = np.empty((clip_offsets[-1],), dtype='>i2')
+
+    clip_ind = 0
+    for cbin, _, (_, _, _, starts, stops) in segments:
+        data, _ = load_cbin(cbin, channel=channel, mmap=True)
+        for start, stop in zip(starts, stops):
+            audio[clip_offsets[clip_ind]:clip_offsets[clip_ind + 1]] = data[start:stop]
+            clip_ind += 1
+        del data  # close memory-mapped file before opening the next one
+
+    def _concat(ind):
+        arrs = [segment[2][ind] for segment in segments]
+        return np.concatenate(arrs) if arrs else np.array([])
+
+    return {
+        'audio': audio,
+        'clip_offsets': clip_offsets,
+        'labels': _concat(0),
+        'onsets': _concat(1),
+        'offsets': _concat(2),
+        'file_index': np.concatenate(
+            [np.full(segment[2][0].shape, ind, dtype=int) for ind, segment in enumerate(segments)]
+        ) if segments else np.array([], dtype=int),
+        'cbins': [segment[0] for segment in segments],
+        'sample_freq': np.array([segment[1] for segment in segments]),
+    }
@@ -2,13 +2,15 @@
 ev_funcs
 Python implementations of functions used with EvTAF and evsonganaly.m
 """
+import functools
 from pathlib import Path
 
 import numpy as np
-from scipy.io import loadmat
-import scipy.signal
 
+from . import _matv5, instrument
 
+
+@instrument.stage('readrecf')
 def readrecf(filename):
     """reads .rec files output by EvTAF
     and returns rec_dict with (approximately)
@@ -143,23 +145,132 @@ def readrecf(filename):
                     line = recfile.readline()
                     header.append(line)
                 rec_dict['header']=header
+        if instrument.is_enabled():
+            # loop only ends at end of file, so position of buffer is number of bytes read
+            instrument.add_bytes_read(recfile.buffer.tell())
     return rec_dict
 
 
-def load_cbin(filename, channel=0):
+def _rec_path(cbin):
+    """helper function that returns path to .rec file associated with a .cbin file"""
+    return cbin.parent.joinpath(cbin.stem + '.rec')
+
+
+def _notmat_path(cbin):
+    """helper function that returns path to .not.mat file associated with a .cbin file"""
+    return cbin.parent.joinpath(cbin.name + '.not.mat')
+
+
+def _paths_from(paths, pattern='*.cbin', recursive=False):
+    """helper function that returns a list of paths, given either a directory,
+    a single file, or a list of files.
+    For a directory, returns files in it that match ``pattern``, sorted,
+    including sub-directories if ``recursive`` is True"""
+    if isinstance(paths, (str, Path)):
+        paths = Path(paths)
+        if paths.is_dir():
+            return sorted(paths.rglob(pattern) if recursive else paths.glob(pattern))
+        return [paths]
+    return [Path(path) for path in paths]
+
+
+def _decode(data, channel, dtype, scale, out):
+    """helper function that copies channels from big-endian audio read from a .cbin file
+    into an array with data type ``dtype``, converting and scaling in a single pass"""
+    if np.isscalar(channel):
+        shape = (data.shape[0],)
+        channels = [channel]
+    else:
+        channels = list(channel)
+        shape = (len(channels), data.shape[0])
+
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    else:
+        if dtype is not None and out.dtype != dtype:
+            raise ValueError(
+                f"dtype of out, {out.dtype}, does not match dtype: {dtype}"
+            )
+        if out.shape[:-1] != shape[:-1] or out.shape[-1] < shape[-1]:
+            raise ValueError(
+                f"out must have shape {shape[:-1] + ('>=' + str(shape[-1]),)}, "
+                f"but shape was: {out.shape}"
+            )
+        # buffer can be longer than audio, so it can be reused for files of different lengths
+        out = out[..., :shape[-1]]
+    if scale is not None and not np.issubdtype(out.dtype, np.floating):
+        raise ValueError(
+            f"scale can only be used with a floating point dtype, but dtype was: {out.dtype}"
+        )
+
+    out_2d = out.reshape((-1, shape[-1]))
+    for row, channel_ in enumerate(channels):
+        if scale is None:
+            np.copyto(out_2d[row], data[:, channel_], casting='unsafe')
+        else:
+            np.multiply(data[:, channel_], scale, out=out_2d[row], dtype=out.dtype, casting='unsafe')
+    return out
+
+
+@instrument.stage('load_cbin')
+def load_cbin(filename, channel=0, mmap=False, start=None, stop=None, units='samples',
+              dtype=None, scale=None, out=None):
     """loads .cbin files output by EvTAF.
     
     Parameters
     ----------
     filename : str
         name of .cbin file, can include path
-    channel : int
+    channel : int, list
         Channel in file to load. Default is 0.
+        If a list of ints, those channels are loaded,
+        and ``data`` is returned as a 2-d array
+        with shape (number of channels, number of samples).
+    mmap : bool
+        if True, memory-map the file instead of reading it into memory,
+        and return a read-only strided view of the requested channel.
+        Samples are only read from disk when the view is accessed,
+        so slicing the view and then copying, e.g. ``np.array(data[start:stop])``,
+        only reads that range of samples.
+        Default is False.
+    start : int, float
+        Start of segment of audio to load, in units specified by ``units``.
+        Default is None, in which case audio is loaded from the beginning of the file.
+    stop : int, float
+        End of segment of audio to load, in units specified by ``units``.
+        Like a Python slice, the sample at ``stop`` is not included.
+        Default is None, in which case audio is loaded until the end of the file.
+    units : str
+        Units of ``start`` and ``stop``. One of {'samples', 's'}.
+        If 's', ``start`` and ``stop`` are converted to samples
+        using the sampling frequency from the .rec file.
+        Default is 'samples'.
+    dtype : str, numpy.dtype
+        data type of returned audio, e.g. 'int16' for native-endian 16-bit integers,
+        or 'float32' or 'float64'. Can include byte order, e.g. '<i2'.
+        Audio is converted from the big-endian integers in the file
+        in a single pass, so that later steps do not have to swap bytes or upcast.
+        Default is None, in which case the audio is returned as it is in the file,
+        big-endian 16-bit signed integers, i.e. with dtype '>i2'.
+    scale : float
+        factor that audio is multiplied by as it is converted,
+        e.g. ``1 / 32768`` to get values between -1 and 1.
+        Only valid when ``dtype`` is a floating point type. Default is None.
+    out : numpy.ndarray
+        array that audio is written into, e.g. so that the same buffer
+        can be reused for many files. Must have shape (number of samples,)
+        for one channel, or (number of channels, number of samples) for a list of channels,
+        except that it can have more samples than the audio, in which case
+        audio is written into the start of ``out``. If ``dtype`` is not specified,
+        audio is converted to the data type of ``out``. Default is None.
 
     Returns
     -------
     data : numpy.ndarray
-        1-d vector of 16-bit signed integers
+        1-d vector of 16-bit signed integers,
+        or array with data type ``dtype``.
+        If ``mmap`` is True, this is a ``numpy.memmap``.
+        If ``out`` is specified, this is a view of ``out``.
     sample_freq : int or float
         sampling frequency in Hz. Typically 32000.
 
@@ -169,25 +280,104 @@ def load_cbin(filename, channel=0):
     >>> data, sample_freq = load_cbin(cbin_filename)
     >>> data
     array([-230, -223, -235, ...,   34,   36,   26], dtype=int16)
+
+    To only read part of a long recording from disk
+
+    >>> data, sample_freq = load_cbin(cbin_filename, mmap=True)
+    >>> clip = np.array(data[32000:64000])
+
+    or, equivalently, read just that segment, specified in seconds
+
+    >>> clip, sample_freq = load_cbin(cbin_filename, start=1.0, stop=2.0, units='s')
+
+    To get native-endian floating point audio, reusing one buffer for many files
+
+    >>> buffer = np.empty((32000 * 60,), dtype=np.float32)
+    >>> for cbin_filename in cbin_filenames:
+    ...     data, sample_freq = load_cbin(cbin_filename, dtype='float32', out=buffer)
+
+    Notes
+    -----
+    When ``start`` or ``stop`` are specified and ``mmap`` is False,
+    only the bytes for that segment are read from the file.
     """
     filename = Path(filename)
 
-    # .cbin files are big endian, 16 bit signed int, hence dtype=">i2" below
-    data = np.fromfile(filename, dtype=">i2")
-    recfile = filename.parent.joinpath(filename.stem + '.rec')
-    rec_dict = readrecf(recfile)
-    data = data[channel::rec_dict['num_channels']]  # step by number of channels
+    if units not in ('samples', 's'):
+        raise ValueError(
+            f"units must be one of {{'samples', 's'}} but was: {units}"
+        )
+    decode = dtype is not None or scale is not None or out is not None
+    if decode and mmap:
+        raise ValueError(
+            "dtype, scale and out can't be used when mmap is True, "
+            "because converting audio requires reading it"
+        )
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+
+    rec_dict = readrecf(_rec_path(filename))
+    num_channels = rec_dict['num_channels']
     sample_freq = rec_dict['sample_freq']
+
+    # .cbin files are big endian, 16 bit signed int, hence file_dtype=">i2" below
+    file_dtype = np.dtype(">i2")
+    num_samples = filename.stat().st_size // (file_dtype.itemsize * num_channels)
+    if units == 's':
+        start = None if start is None else int(round(start * sample_freq))
+        stop = None if stop is None else int(round(stop * sample_freq))
+    start, stop, _ = slice(start, stop).indices(num_samples)
+    stop = max(start, stop)
+
+    if mmap:
+        data = np.memmap(filename, dtype=file_dtype, mode="r",
+                         shape=(num_samples, num_channels))
+        data = data[start:stop]
+    else:
+        # seek straight to the first sample in the segment, and only read that segment
+        data = np.fromfile(filename, dtype=file_dtype,
+                           count=(stop - start) * num_channels,
+                           offset=start * num_channels * file_dtype.itemsize)
+        data = data.reshape(-1, num_channels)
+        instrument.add_bytes_read(data.nbytes)
+
+    # samples from each channel are interleaved, so each row is one sample from every channel
+    if decode:
+        data = _decode(data, channel, dtype, scale, out)
+    elif np.isscalar(channel):
+        data = data[:, channel]
+    else:
+        data = data[:, list(channel)].T
     return data, sample_freq
 
 
-def load_notmat(filename):
+# variables saved in .not.mat files by evsonganaly, that are loaded by the 'fast' reader
+NOTMAT_VARIABLES = ('Fs', 'fname', 'labels', 'onsets', 'offsets',
+                    'min_int', 'min_dur', 'threshold', 'sm_win')
+
+
+@instrument.stage('load_notmat')
+def load_notmat(filename, reader='scipy', variables=None):
     """loads .not.mat files created by evsonganaly (Matlab GUI for labeling song)
 
     Parameters
     ----------
     filename : str
         name of .not.mat file, can include path
+    reader : str
+        used to read file. One of {'scipy', 'fast'}.
+        If 'scipy', use ``scipy.io.loadmat``.
+        If 'fast', use a specialized reader that only parses the variables
+        saved by evsonganaly, which is much faster.
+        Values returned are the same for both readers, except that
+        the 'fast' reader does not return the '__header__', '__version__'
+        and '__globals__' keys that ``loadmat`` adds.
+        Default is 'scipy'.
+    variables : list
+        of str, names of variables to load.
+        Default is None, in which case all variables are loaded
+        by the 'scipy' reader, and all variables listed in
+        ``evfuncs.evfuncs.NOTMAT_VARIABLES`` are loaded by the 'fast' reader.
 
     Returns
     -------
@@ -202,10 +392,16 @@ def load_notmat(filename):
     dict_keys(['__header__', '__version__', '__globals__', 'Fs', 'fname', 'labels',
     'onsets', 'offsets', 'min_int', 'min_dur', 'threshold', 'sm_win'])
 
+    To quickly load just the annotations
+
+    >>> notmat_dict = load_notmat(a_notmat, reader='fast', variables=['labels', 'onsets', 'offsets'])
+
     Notes
     -----
     Basically a wrapper around `scipy.io.loadmat`. Calls `loadmat` with `squeeze_me=True`
     to remove extra dimensions from arrays that `loadmat` parser sometimes adds.
+    If the 'fast' reader can't read a file, e.g. because it was saved
+    in a different format, the file is read with `loadmat` instead.
 
     Also note that **onsets and offsets from .not.mat files are in milliseconds**.
     The GUI `evsonganaly` saves onsets and offsets in these units,
@@ -214,43 +410,76 @@ def load_notmat(filename):
     """
     filename = Path(filename)
 
+    if reader not in ('scipy', 'fast'):
+        raise ValueError(
+            f"reader must be one of {{'scipy', 'fast'}}, but was: {reader}"
+        )
+
     # have to cast to str and call endswith because 'ext' from Path will just be .mat
     if str(filename).endswith(".not.mat"):
         pass
     elif str(filename).endswith("cbin"):
-        filename = filename.parent.joinpath(filename.name + ".not.mat")
+        filename = _notmat_path(filename)
     else:
         ext = filename.suffix
         raise ValueError(
             f"Filename should have extension .cbin.not.mat or .cbin but extension was: {ext}"
         )
-    notmat_dict = loadmat(filename, squeeze_me=True)
+
+    if instrument.is_enabled():
+        instrument.add_bytes_read(filename.stat().st_size)
+    notmat_dict = None
+    if reader == 'fast':
+        try:
+            notmat_dict = _matv5.loadmat(
+                filename, NOTMAT_VARIABLES if variables is None else variables
+            )
+        except _matv5.UnsupportedMatFileError:
+            pass  # fall back to scipy below
+    if notmat_dict is None:
+        from scipy.io import loadmat
+
+        notmat_dict = loadmat(filename, squeeze_me=True, variable_names=variables)
     # ensure that onsets and offsets are always arrays, not scalar
     for key in ('onsets', 'offsets'):
+        if key not in notmat_dict:
+            continue
         if np.isscalar(notmat_dict[key]):  # `squeeze_me` makes them a ``float``, this will be True in that case
             value = np.array(notmat_dict[key])[np.newaxis]  # ``np.newaxis`` ensures 1-d array with shape (1,)
             notmat_dict[key] = value
     return notmat_dict
 
 
-def bandpass_filtfilt(rawsong, samp_freq, freq_cutoffs=(500, 10000)):
-    """filter song audio with band pass filter, then perform zero-phase
-    filtering with filtfilt function
+def _numtaps(num_samples):
+    """helper function that determines number of taps
+    used by ``bandpass_filtfilt``, given number of samples in audio"""
+    if num_samples < 387:
+        return 64
+    elif num_samples < 771:
+        return 128
+    elif num_samples < 1539:
+        return 256
+    else:
+        return 512
 
-    Parameters
-    ----------
-    rawsong : ndarray
-        audio
-    samp_freq : int
-        sampling frequency
-    freq_cutoffs : list
-        2 elements long, cutoff frequencies for bandpass filter.
-        Default is [500, 10000].
 
-    Returns
-    -------
-    filtsong : ndarray
+# maximum number of filters designed by ``_bandpass_filter`` that are cached.
+# In practice, there are only a handful of unique (samp_freq, freq_cutoffs, numtaps)
+BANDPASS_FILTER_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=BANDPASS_FILTER_CACHE_SIZE)
+@instrument.stage('firwin')
+def _bandpass_filter(samp_freq, freq_cutoffs, numtaps):
+    """helper function that designs FIR bandpass filter used by ``bandpass_filtfilt``.
+    Returns numerator ``b`` and denominator ``a`` of filter.
+
+    Filters are cached, so ``freq_cutoffs`` must be a tuple, and
+    the returned arrays are read-only since the same arrays are returned
+    every time the function is called with the same arguments.
     """
+    import scipy.signal
+
     if freq_cutoffs[0] <= 0:
         raise ValueError('Low frequency cutoff {} is invalid, '
                          'must be greater than zero.'
@@ -262,15 +491,6 @@ def bandpass_filtfilt(rawsong, samp_freq, freq_cutoffs=(500, 10000)):
                          'must be less than Nyquist rate, {}.'
                          .format(freq_cutoffs[1], Nyquist_rate))
 
-    if rawsong.shape[-1] < 387:
-        numtaps = 64
-    elif rawsong.shape[-1] < 771:
-        numtaps = 128
-    elif rawsong.shape[-1] < 1539:
-        numtaps = 256
-    else:
-        numtaps = 512
-
     cutoffs = np.asarray([freq_cutoffs[0] / Nyquist_rate,
                           freq_cutoffs[1] / Nyquist_rate])
     # code on which this is based, bandpass_filtfilt.m, says it uses Hann(ing)
@@ -282,19 +502,123 @@ def bandpass_filtfilt(rawsong, samp_freq, freq_cutoffs=(500, 10000)):
     b = scipy.signal.firwin(numtaps + 1, cutoffs, pass_zero=False)
     a = np.zeros((numtaps+1,))
     a[0] = 1  # make an "all-zero filter"
+    b.flags.writeable = False
+    a.flags.writeable = False
+    return b, a
+
+
+def bandpass_filter_cache_info():
+    """get statistics for the cache of filters designed by ``bandpass_filtfilt``
+
+    Returns
+    -------
+    cache_info : functools._CacheInfo
+        named tuple with fields ``hits``, ``misses``, ``maxsize``, ``currsize``
+
+    Examples
+    --------
+    >>> filtsong = bandpass_filtfilt(rawsong, samp_freq)
+    >>> bandpass_filter_cache_info()
+    CacheInfo(hits=0, misses=1, maxsize=64, currsize=1)
+    """
+    return _bandpass_filter.cache_info()
+
+
+def bandpass_filter_cache_clear():
+    """clear the cache of filters designed by ``bandpass_filtfilt``,
+    and reset its statistics"""
+    _bandpass_filter.cache_clear()
+
+
+def _odd_ext(x, padlen):
+    """helper function that pads last axis of ``x`` with an odd extension
+    of length ``padlen`` at each end, the default padding used by ``scipy.signal.filtfilt``"""
+    left_ext = 2 * x[..., :1] - x[..., padlen:0:-1]
+    right_ext = 2 * x[..., -1:] - x[..., -2:-(padlen + 2):-1]
+    return np.concatenate((left_ext, x, right_ext), axis=-1)
+
+
+BANDPASS_FILTFILT_METHODS = ('filtfilt', 'fft', 'oa')
+
+
+@instrument.stage('bandpass_filtfilt')
+def bandpass_filtfilt(rawsong, samp_freq, freq_cutoffs=(500, 10000), method='filtfilt'):
+    """filter song audio with band pass filter, then perform zero-phase
+    filtering with filtfilt function
+
+    Parameters
+    ----------
+    rawsong : ndarray
+        audio
+    samp_freq : int
+        sampling frequency
+    freq_cutoffs : list
+        2 elements long, cutoff frequencies for bandpass filter.
+        Default is [500, 10000].
+    method : str
+        engine used to filter. One of {'filtfilt', 'fft', 'oa'}.
+        If 'filtfilt', use ``scipy.signal.filtfilt``.
+        If 'fft' or 'oa', do the forward and backward pass as a single
+        convolution, using ``scipy.signal.fftconvolve`` or ``scipy.signal.oaconvolve``
+        (overlap-add), which is much faster for the long FIR filters used here.
+        All methods pad the audio in the same way, and give the same result
+        within floating point error. Default is 'filtfilt'.
+        If ``rawsong`` is ``float32``, methods 'fft' and 'oa' return ``float32``.
+
+    Returns
+    -------
+    filtsong : ndarray
+    """
+    if method not in BANDPASS_FILTFILT_METHODS:
+        raise ValueError(
+            f"method must be one of {BANDPASS_FILTFILT_METHODS}, but was: {method}"
+        )
+    # scipy is imported here instead of at the top of the module,
+    # so that ``import evfuncs`` is fast for code that only reads files
+    import scipy.signal
+
+    numtaps = _numtaps(rawsong.shape[-1])
+    b, a = _bandpass_filter(samp_freq, tuple(freq_cutoffs), numtaps)
     padlen = np.max((b.shape[-1] - 1, a.shape[-1] - 1))
-    filtsong = scipy.signal.filtfilt(b, a, rawsong, padlen=padlen)
+    if method == 'filtfilt':
+        filtsong = scipy.signal.filtfilt(b, a, rawsong, padlen=padlen)
+    else:
+        if rawsong.shape[-1] <= padlen:
+            raise ValueError(
+                f"The length of the input vector rawsong must be greater than padlen, "
+                f"which is {padlen}."
+            )
+        # for an FIR filter, filtering forward and then backward
+        # is the same as filtering once with the filter convolved with its reverse
+        h = np.convolve(b, b[::-1])
+        h = h.reshape((1,) * (rawsong.ndim - 1) + (-1,))
+        # keep single precision if that's what we were given, to save memory
+        dtype = np.float32 if rawsong.dtype == np.float32 else np.float64
+        h = h.astype(dtype)
+        ext = _odd_ext(np.asarray(rawsong, dtype=dtype), padlen)
+        if method == 'fft':
+            filtsong = scipy.signal.fftconvolve(ext, h, mode='valid', axes=-1)
+        elif method == 'oa':
+            filtsong = scipy.signal.oaconvolve(ext, h, mode='valid', axes=-1)
     return filtsong
 
 
-def smooth_data(rawsong, samp_freq, freq_cutoffs=(500, 10000), smooth_win=2):
+SMOOTH_DATA_METHODS = ('convolve', 'running')
+
+
+@instrument.stage('smooth_data')
+def smooth_data(rawsong, samp_freq, freq_cutoffs=(500, 10000), smooth_win=2,
+                filter_method='filtfilt', smooth_method='convolve', dtype=None):
     """filter raw audio and smooth signal
     used to calculate amplitude.
 
     Parameters
     ----------
     rawsong : ndarray
-        1-d numpy array, "raw" voltage waveform from microphone
+        1-d numpy array, "raw" voltage waveform from microphone.
+        Can also be a 2-d array with shape (number of signals, number of samples),
+        e.g. multiple channels or multiple recordings of equal length,
+        in which case each row is smoothed, in one vectorized pass.
     samp_freq : int
         sampling frequency
     freq_cutoffs: list
@@ -303,11 +627,30 @@ def smooth_data(rawsong, samp_freq, freq_cutoffs=(500, 10000), smooth_win=2):
         If None, in which case bandpass filter is not applied.
     smooth_win : integer
         size of smoothing window in milliseconds. Default is 2.
+    filter_method : str
+        engine used to filter, passed as the ``method`` argument
+        to ``bandpass_filtfilt``. One of {'filtfilt', 'fft', 'oa'}.
+        Default is 'filtfilt'.
+    smooth_method : str
+        engine used to smooth. One of {'convolve', 'running'}.
+        If 'convolve', convolve with a window using ``numpy.convolve``,
+        which takes time proportional to the number of samples
+        times the size of the window.
+        If 'running', compute a running mean with ``scipy.ndimage.uniform_filter1d``,
+        which takes time proportional to just the number of samples.
+        Both give the same result within floating point error.
+        Default is 'convolve'.
+    dtype : str, numpy.dtype
+        floating point type used for the filtered, squared, and smoothed audio.
+        One of {'float32', 'float64'}. Using 'float32' halves the memory used.
+        Default is None, in which case the type is determined by ``rawsong``
+        and the filtering, which is usually 'float64'.
 
     Returns
     -------
     smooth : ndarray
-        1-d numpy array, smoothed waveform
+        1-d numpy array, smoothed waveform.
+        If ``rawsong`` is 2-d, then ``smooth`` is 2-d, with one smoothed waveform per row.
 
     Applies a bandpass filter with the frequency cutoffs in spect_params,
     then rectifies the signal by squaring, and lastly smooths by taking
@@ -315,29 +658,62 @@ def smooth_data(rawsong, samp_freq, freq_cutoffs=(500, 10000), smooth_win=2):
     This is a very literal translation from the Matlab function SmoothData.m
     by Evren Tumer. Uses the Thomas-Santana algorithm.
     """
+    if smooth_method not in SMOOTH_DATA_METHODS:
+        raise ValueError(
+            f"smooth_method must be one of {SMOOTH_DATA_METHODS}, but was: {smooth_method}"
+        )
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError(
+                f"dtype must be one of {{'float32', 'float64'}}, but was: {dtype}"
+            )
+        rawsong = np.asarray(rawsong, dtype=dtype)
+
     if freq_cutoffs is None:
         # then don't do bandpass_filtfilt
         filtsong = rawsong
     else:
-        filtsong = bandpass_filtfilt(rawsong, samp_freq, freq_cutoffs)
+        filtsong = bandpass_filtfilt(rawsong, samp_freq, freq_cutoffs, method=filter_method)
+        if dtype is not None:
+            filtsong = filtsong.astype(dtype, copy=False)
 
     squared_song = np.power(filtsong, 2)
     len = np.round(samp_freq * smooth_win / 1000).astype(int)
-    h = np.ones((len,)) / len
-    smooth = np.convolve(squared_song, h)
-    offset = round((smooth.shape[-1] - filtsong.shape[-1]) / 2)
-    smooth = smooth[offset:filtsong.shape[-1] + offset]
+    # offset used to center result of "full" convolution,
+    # i.e., the output at sample i is the mean of samples i + offset - len + 1 to i + offset
+    offset = round((len - 1) / 2)
+    if smooth_method == 'convolve':
+        h = np.full((len,), 1 / len, dtype=np.float64 if dtype is None else dtype)
+        if squared_song.ndim == 1:
+            smooth = np.convolve(squared_song, h)
+        else:
+            import scipy.signal
+
+            smooth = scipy.signal.convolve(squared_song, h.reshape((1,) * (squared_song.ndim - 1) + (-1,)))
+        smooth = smooth[..., offset:filtsong.shape[-1] + offset]
+    elif smooth_method == 'running':
+        import scipy.ndimage
+
+        if not np.issubdtype(squared_song.dtype, np.floating):
+            squared_song = squared_song.astype(np.float64)
+        # origin shifts the window so it covers the same samples as the convolution
+        smooth = scipy.ndimage.uniform_filter1d(squared_song, len, axis=-1, mode='constant', cval=0.0,
+                                                origin=len - 1 - offset - len // 2)
     return smooth
 
 
+@instrument.stage('segment_song')
 def segment_song(smooth, samp_freq, threshold=5000, min_syl_dur=0.02,
-                 min_silent_dur=0.002, return_Hz=False):
+                 min_silent_dur=0.002, return_Hz=False, pyramid=None):
     """segment audio file of birdsong into syllables
 
     Parameters
     ----------
     smooth : np.ndarray
-        Smoothed audio waveform, returned by evfuncs.smooth_data
+        Smoothed audio waveform, returned by evfuncs.smooth_data.
+        Can also be a 2-d array with shape (number of signals, number of samples),
+        in which case each row is segmented, in one vectorized pass.
     samp_freq : int
         Sampling frequency at which audio was recorded. Returned by
         evfuncs.load_cbin.
@@ -355,6 +731,12 @@ def segment_song(smooth, samp_freq, threshold=5000, min_syl_dur=0.02,
     return_Hz : bool
         if True, returns the onsets and offsets in units of Hz.
         Default is False.
+    pyramid : evfuncs.pyramid.EnvelopePyramid
+        pyramid built from ``smooth`` with ``evfuncs.pyramid.build_pyramid``.
+        If specified, segment coarse-to-fine: only regions where the maximum
+        in the pyramid is above ``threshold`` are thresholded at full resolution,
+        so silent stretches of ``smooth`` are never read. Results are the same.
+        Only for 1-d ``smooth``. Default is None.
 
     Returns
     -------
@@ -368,48 +750,108 @@ def segment_song(smooth, samp_freq, threshold=5000, min_syl_dur=0.02,
     offsets_Hz : np.ndarray
         Offset times of syllables in song, in seconds.
         Only returned if "return_Hz" is True.
+    rows : np.ndarray
+        Row of ``smooth`` that each onset and offset is from.
+        Only returned if ``smooth`` is 2-d. In that case, onsets and offsets
+        from all rows are concatenated, and are empty arrays if there are no segments.
 
     Equivalent to SegmentNotes.m function that is part of evsonganaly GUI.
     """
-    above_th = smooth > threshold
-    h = [1, -1]
-    # convolving with h causes:
-    # +1 whenever above_th changes from 0 to 1
-    # and -1 whenever above_th changes from 1 to 0
-    above_th_convoluted = np.convolve(h, above_th)
-
-    # always get in units of Hz first, then convert to s
-    onsets_Hz = np.where(above_th_convoluted > 0)[0]
-    offsets_Hz = np.where(above_th_convoluted < 0)[0]
-    onsets_s = onsets_Hz / samp_freq
-    offsets_s = offsets_Hz / samp_freq
+    if smooth.ndim == 2:
+        if pyramid is not None:
+            raise ValueError("pyramid can only be used when smooth is a 1-d array")
+        return _segment_song_2d(smooth, samp_freq, threshold, min_syl_dur,
+                                min_silent_dur, return_Hz)
+    elif smooth.ndim != 1:
+        raise ValueError(
+            f"smooth must be a 1-d or 2-d array, but number of dimensions was: {smooth.ndim}"
+        )
 
-    if onsets_s.shape[0] < 1 or offsets_s.shape[0] < 1:
+    if pyramid is not None:
+        onsets_Hz, offsets_Hz = pyramid.crossings(smooth, threshold)
+    else:
+        # pad with zeros at both ends, so every segment has an onset and offset
+        above_th = np.zeros((smooth.shape[0] + 2,), dtype=np.int8)
+        np.greater(smooth, threshold, out=above_th[1:-1].view(np.bool_))
+        # above_th changes from 0 to 1 at onsets, and from 1 to 0 at offsets,
+        # so crossings alternate onset, offset, onset, ...
+        crossings = np.flatnonzero(above_th[1:] != above_th[:-1])
+        onsets_Hz = crossings[0::2]
+        offsets_Hz = crossings[1::2]
+    if onsets_Hz.shape[0] < 1:
         return None, None  # because no onsets or offsets in this file
 
     # get rid of silent intervals that are shorter than min_silent_dur
-    silent_gap_durs = onsets_s[1:] - offsets_s[:-1]  # duration of silent gaps
-    keep_these = np.nonzero(silent_gap_durs > min_silent_dur)
-    onsets_s = np.concatenate(
-        (onsets_s[0, np.newaxis], onsets_s[1:][keep_these]))
-    offsets_s = np.concatenate(
-        (offsets_s[:-1][keep_these], offsets_s[-1, np.newaxis]))
-    if return_Hz:
-        onsets_Hz = np.concatenate(
-            (onsets_Hz[0, np.newaxis], onsets_Hz[1:][keep_these]))
-        offsets_Hz = np.concatenate(
-            (offsets_Hz[:-1][keep_these], offsets_Hz[-1, np.newaxis]))
+    keep_these = _exceeds_dur(onsets_Hz[1:], offsets_Hz[:-1], samp_freq, min_silent_dur)
+    onsets_Hz = onsets_Hz[np.concatenate(([True], keep_these))]
+    offsets_Hz = offsets_Hz[np.concatenate((keep_these, [True]))]
 
     # eliminate syllables with duration shorter than min_syl_dur
-    syl_durs = offsets_s - onsets_s
-    keep_these = np.nonzero(syl_durs > min_syl_dur)
-    onsets_s = onsets_s[keep_these]
-    offsets_s = offsets_s[keep_these]
-    if return_Hz:
-        onsets_Hz = onsets_Hz[keep_these]
-        offsets_Hz = offsets_Hz[keep_these]
+    keep_these = _exceeds_dur(offsets_Hz, onsets_Hz, samp_freq, min_syl_dur)
+    onsets_Hz = onsets_Hz[keep_these]
+    offsets_Hz = offsets_Hz[keep_these]
 
+    # only convert to seconds at the end
+    onsets_s = onsets_Hz / samp_freq
+    offsets_s = offsets_Hz / samp_freq
     if return_Hz:
         return onsets_s, offsets_s, onsets_Hz, offsets_Hz
     else:
         return onsets_s, offsets_s
+
+
+def _exceeds_dur(stop, start, samp_freq, min_dur):
+    """helper function that determines whether intervals between
+    sample indices ``start`` and ``stop`` are longer than ``min_dur`` seconds.
+
+    Compares integer number of samples, except for intervals within one sample of
+    ``min_dur``, where it compares ``stop / samp_freq - start / samp_freq`` instead,
+    so that the result is exactly the same as computing the durations in seconds
+    """
+    n_samples = stop - start
+    min_samples = min_dur * samp_freq
+    exceeds = n_samples > min_samples
+    borderline = np.flatnonzero(np.abs(n_samples - min_samples) <= 1)
+    if borderline.shape[0]:
+        exceeds[borderline] = (
+            stop[borderline] / samp_freq - start[borderline] / samp_freq > min_dur
+        )
+    return exceeds
+
+
+def _segment_song_2d(smooth, samp_freq, threshold, min_syl_dur, min_silent_dur, return_Hz):
+    """helper function that segments each row of a 2-d array,
+    with the same algorithm as ``segment_song``, vectorized across rows"""
+    above_th = smooth > threshold
+    # pad with zeros at both ends of each row, so every segment has an onset and offset
+    padded = np.zeros((above_th.shape[0], above_th.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = above_th
+    # +1 whenever above_th changes from 0 to 1, -1 whenever it changes from 1 to 0,
+    # same as result of convolving with [1, -1] in segment_song
+    crossings = np.diff(padded, axis=-1)
+    # np.nonzero returns indices in row-major order,
+    # so onsets and offsets from the same segment line up
+    rows, onsets_Hz = np.nonzero(crossings > 0)
+    _, offsets_Hz = np.nonzero(crossings < 0)
+
+    # get rid of silent intervals that are shorter than min_silent_dur,
+    # only considering intervals between segments in the same row
+    is_boundary = (rows[1:] != rows[:-1]) | _exceeds_dur(onsets_Hz[1:], offsets_Hz[:-1],
+                                                         samp_freq, min_silent_dur)
+    # (not concatenating with [True], so this also works when there are no segments)
+    keep_onsets = np.ones(onsets_Hz.shape, dtype=bool)
+    keep_onsets[1:] = is_boundary
+    keep_offsets = np.ones(offsets_Hz.shape, dtype=bool)
+    keep_offsets[:-1] = is_boundary
+    onsets_Hz, rows = onsets_Hz[keep_onsets], rows[keep_onsets]
+    offsets_Hz = offsets_Hz[keep_offsets]
+
+    # eliminate syllables with duration shorter than min_syl_dur
+    keep_these = _exceeds_dur(offsets_Hz, onsets_Hz, samp_freq, min_syl_dur)
+    onsets_Hz, offsets_Hz, rows = onsets_Hz[keep_these], offsets_Hz[keep_these], rows[keep_these]
+    onsets_s = onsets_Hz / samp_freq
+    offsets_s = offsets_Hz / samp_freq
+    if return_Hz:
+        return onsets_s, offsets_s, onsets_Hz, offsets_Hz, rows
+    else:
+        return onsets_s, offsets_s, rows
@@ -0,0 +1,221 @@
+"""
+functions for building an index of a corpus of files created by EvTAF and evsonganaly:
+one table with the metadata from every .cbin, .rec, and .not.mat file,
+that can be saved to a single file and reloaded quickly
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .evfuncs import _notmat_path, _rec_path, load_notmat, readrecf
+
+
+# segmenting parameters saved in .not.mat files, that are columns in the index
+NOTMAT_PARAMS = ('min_int', 'min_dur', 'threshold', 'sm_win')
+
+
+def _stat(path):
+    """helper function that returns (modification time, size) of a file,
+    or (-1, -1) if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return -1, -1
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _index_file(cbin, rec, notmat, has_notmat, rec_cache=None):
+    """helper function that reads metadata for one .cbin file,
+    and returns it as a dict with one value per column"""
+    rec_dict = readrecf(rec) if rec_cache is None else rec_cache.readrecf(rec)
+    row = {
+        'sample_freq': rec_dict['sample_freq'],
+        'num_samples': rec_dict['num_samples'],
+        'num_channels': rec_dict['num_channels'],
+    }
+    if has_notmat:
+        notmat_dict = load_notmat(notmat)
+        # labels is an empty array, not a string, when no segments are labeled
+        row['labels'] = ''.join(np.atleast_1d(notmat_dict['labels']))
+        row['onsets'] = np.asarray(notmat_dict['onsets'], dtype=np.float64)
+        row['offsets'] = np.asarray(notmat_dict['offsets'], dtype=np.float64)
+        for param in NOTMAT_PARAMS:
+            row[param] = notmat_dict[param]
+    else:
+        row['labels'] = ''
+        row['onsets'] = np.array([], dtype=np.float64)
+        row['offsets'] = np.array([], dtype=np.float64)
+        for param in NOTMAT_PARAMS:
+            row[param] = np.nan
+    return row
+
+
+def _rows_from_index(index):
+    """helper function that converts columns of an index
+    back to a dict mapping each .cbin path to a dict of values for that row,
+    so rows can be reused when updating the index"""
+    rows = {}
+    for ind, cbin in enumerate(index['cbin']):
+        start, stop = index['segment_offsets'][ind], index['segment_offsets'][ind + 1]
+        row = {
+            key: index[key][ind]
+            for key in ('sample_freq', 'num_samples', 'num_channels', 'labels',
+                        'cbin_mtime_ns', 'cbin_size', 'rec_mtime_ns', 'rec_size',
+                        'notmat_mtime_ns', 'notmat_size') + NOTMAT_PARAMS
+        }
+        row['labels'] = str(row['labels'])
+        row['onsets'] = index['onsets'][start:stop]
+        row['offsets'] = index['offsets'][start:stop]
+        rows[str(cbin)] = row
+    return rows
+
+
+def build_index(root, index_path=None, rec_cache=None):
+    """build an index of all .cbin files in a directory and its sub-directories,
+    with metadata from associated .rec and .not.mat files
+
+    Parameters
+    ----------
+    root : str, Path
+        directory to search for .cbin files. Sub-directories are also searched.
+        .cbin files without a .rec file are skipped.
+    index_path : str, Path
+        file where index is saved, with ``numpy.savez``.
+        If it already exists, rows for files that have not changed since it was saved
+        are reused instead of reading the files again, and the updated index is saved.
+        Default is None, in which case the index is not saved.
+    rec_cache : evfuncs.cache.RecCache
+        cache used to read .rec files, so that .rec files that have not changed
+        are not parsed again, e.g. when the same files are in more than one index,
+        or when the index is not saved. Default is None, in which case
+        .rec files are parsed with ``evfuncs.readrecf``.
+
+    Returns
+    -------
+    index : dict
+        mapping column names to numpy arrays, with one element per .cbin file,
+        except for ``onsets``, ``offsets`` and ``segment_offsets``.
+        Columns are:
+            root : str
+                directory that was indexed
+            cbin : numpy.ndarray
+                path of each .cbin file, relative to ``root``
+            sample_freq, num_samples, num_channels : numpy.ndarray
+                from .rec files
+            has_notmat : numpy.ndarray
+                True if .cbin file has a .not.mat file
+            labels : numpy.ndarray
+                labels from .not.mat files, one string per file
+            min_int, min_dur, threshold, sm_win : numpy.ndarray
+                segmenting parameters from .not.mat files, NaN if there is no .not.mat
+            onsets, offsets : numpy.ndarray
+                onsets and offsets, in milliseconds, from all .not.mat files concatenated
+            segment_offsets : numpy.ndarray
+                onsets and offsets for file ``i`` are
+                ``onsets[segment_offsets[i]:segment_offsets[i + 1]]``
+            cbin_mtime_ns, cbin_size, rec_mtime_ns, rec_size, notmat_mtime_ns, notmat_size : numpy.ndarray
+                modification time and size of each file when it was indexed,
+                -1 for a .not.mat file that does not exist
+
+    Examples
+    --------
+    >>> index = build_index('gy6or6', 'gy6or6_index.npz')
+    >>> durs = index['offsets'] - index['onsets']
+    >>> print(f"total annotated song in ms: {durs.sum()}")
+
+    Share parsed .rec files between indexes of directories that contain the same files
+
+    >>> with RecCache('rec_cache.json') as rec_cache:
+    ...     index = build_index('gy6or6', rec_cache=rec_cache)
+    ...     index_subset = build_index('gy6or6/032312', rec_cache=rec_cache)
+    """
+    root = Path(root)
+    if index_path is not None and Path(index_path).exists():
+        previous = _rows_from_index(load_index(index_path))
+    else:
+        previous = {}
+
+    rows = {}
+    for cbin in sorted(root.rglob('*.cbin')):
+        rec = _rec_path(cbin)
+        notmat = _notmat_path(cbin)
+        cbin_mtime_ns, cbin_size = _stat(cbin)
+        rec_mtime_ns, rec_size = _stat(rec)
+        if rec_size == -1:
+            continue
+        notmat_mtime_ns, notmat_size = _stat(notmat)
+        signature = {
+            'cbin_mtime_ns': cbin_mtime_ns, 'cbin_size': cbin_size,
+            'rec_mtime_ns': rec_mtime_ns, 'rec_size': rec_size,
+            'notmat_mtime_ns': notmat_mtime_ns, 'notmat_size': notmat_size,
+        }
+        cbin_rel = cbin.relative_to(root).as_posix()
+        row = previous.get(cbin_rel)
+        if row is None or any(row[key] != value for key, value in signature.items()):
+            row = _index_file(cbin, rec, notmat, has_notmat=notmat_size != -1, rec_cache=rec_cache)
+            row.update(signature)
+        rows[cbin_rel] = row
+
+    n_segments = [row['onsets'].shape[0] for row in rows.values()]
+    index = {
+        'root': str(root),
+        'cbin': np.array(list(rows.keys()), dtype=str),
+        'has_notmat': np.array([row['notmat_size'] != -1 for row in rows.values()], dtype=bool),
+        'labels': np.array([row['labels'] for row in rows.values()], dtype=str),
+        'onsets': np.concatenate(
+            [row['onsets'] for row in rows.values()]
+        ) if rows else np.array([], dtype=np.float64),
+        'offsets': np.concatenate(
+            [row['offsets'] for row in rows.values()]
+        ) if rows else np.array([], dtype=np.float64),
+        'segment_offsets': np.concatenate(([0], np.cumsum(n_segments))).astype(np.int64),
+    }
+    for key in ('sample_freq', 'num_samples', 'num_channels',
+                'cbin_mtime_ns', 'cbin_size', 'rec_mtime_ns', 'rec_size',
+                'notmat_mtime_ns', 'notmat_size'):
+        index[key] = np.array([row[key] for row in rows.values()], dtype=np.int64)
+    for key in NOTMAT_PARAMS:
+        index[key] = np.array([row[key] for row in rows.values()], dtype=np.float64)
+
+    if index_path is not None:
+        save_index(index, index_path)
+    return index
+
+
+def save_index(index, index_path):
+    """save an index built by ``build_index``
+
+    Parameters
+    ----------
+    index : dict
+        returned by ``build_index``
+    index_path : str, Path
+        file where index is saved, with ``numpy.savez``
+    """
+    index_path = Path(index_path)
+    # np.savez adds .npz if it's not already the suffix, so write to file object.
+    # Temporary file is unique to this process, so concurrent saves don't write to the same file
+    tmp_path = index_path.parent.joinpath(f"{index_path.name}.{os.getpid()}.tmp")
+    with tmp_path.open('wb') as fp:
+        np.savez(fp, **index)
+    os.replace(tmp_path, index_path)
+
+
+def load_index(index_path):
+    """load an index saved by ``build_index``
+
+    Parameters
+    ----------
+    index_path : str, Path
+        file where index was saved
+
+    Returns
+    -------
+    index : dict
+        mapping column names to numpy arrays, see ``build_index``
+    """
+    with np.load(index_path, allow_pickle=False) as npz:
+        index = {key: npz[key] for key in npz.files}
+    index['root'] = str(index['root'])
+    return index
@@ -0,0 +1,283 @@
+"""
+opt-in instrumentation of the functions in ``evfuncs.evfuncs``,
+that records wall time, bytes read from files, and bytes of arrays returned
+for each call, and aggregates them for each stage of processing.
+
+Stages are:
+    readrecf : parsing .rec files
+    load_cbin : reading .cbin files
+    load_notmat : reading .not.mat files
+    firwin : designing bandpass filters (only happens when filter is not already cached)
+    bandpass_filtfilt : bandpass filtering, including ``firwin``
+    smooth_data : filtering, squaring and smoothing audio, including ``bandpass_filtfilt``
+    segment_song : segmenting smoothed audio
+
+Because stages are nested, each call records both its total time,
+and its "self time", i.e. total time minus time spent in nested stages.
+
+Instrumentation is disabled by default, and when disabled
+the only overhead is checking one flag per call.
+
+Examples
+--------
+Collect statistics for one batch of files
+
+>>> with evfuncs.instrument.collect() as collector:
+...     for cbin in cbins:
+...         rawsong, samp_freq = evfuncs.load_cbin(cbin)
+...         smooth = evfuncs.smooth_data(rawsong, samp_freq)
+>>> print(collector.report())
+
+Collect statistics in a global registry until disabled
+
+>>> evfuncs.instrument.enable()
+>>> ...
+>>> stats = evfuncs.instrument.get_stats()
+>>> evfuncs.instrument.disable()
+
+Get each call as it happens
+
+>>> evfuncs.instrument.add_callback(lambda record: print(record.stage, record.time))
+
+Notes
+-----
+Statistics are collected per process, so calls made in worker processes,
+e.g. by ``evfuncs.batch.segment_files``, are not recorded in the parent process.
+"""
+import contextlib
+import functools
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+CallRecord = namedtuple('CallRecord', ['stage', 'time', 'self_time', 'bytes_read', 'bytes_allocated'])
+CallRecord.__doc__ = """record of one call to an instrumented function
+
+Attributes
+----------
+stage : str
+    name of stage
+time : float
+    wall time of call, in seconds
+self_time : float
+    wall time of call, minus time spent in nested stages
+bytes_read : int
+    number of bytes read from files
+bytes_allocated : int
+    number of bytes of arrays returned, not including memory-mapped arrays
+"""
+
+# whether any collector or callback is active; checked by every instrumented call
+_enabled = False
+_collectors = []
+_callbacks = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _ActiveCall:
+    """helper class that accumulates values for a call in progress"""
+    __slots__ = ('child_time', 'bytes_read')
+
+    def __init__(self):
+        self.child_time = 0.
+        self.bytes_read = 0
+
+
+class Collector:
+    """aggregates records of calls to instrumented functions, per stage
+
+    Attributes
+    ----------
+    stats : dict
+        mapping name of each stage to a dict with keys
+        ``calls``, ``time``, ``self_time``, ``max_time``, ``bytes_read``, and ``bytes_allocated``,
+        each the sum (or maximum) across all calls to that stage
+
+    Notes
+    -----
+    ``add`` and ``reset`` hold a lock, so records can be added from more than one thread,
+    e.g. by the worker threads of ``evfuncs.prefetch.Prefetcher``.
+    """
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        """add a ``CallRecord`` to statistics"""
+        with self._lock:
+            stage_stats = self.stats.get(record.stage)
+            if stage_stats is None:
+                stage_stats = self.stats[record.stage] = {
+                    'calls': 0, 'time': 0., 'self_time': 0., 'max_time': 0.,
+                    'bytes_read': 0, 'bytes_allocated': 0,
+                }
+            stage_stats['calls'] += 1
+            stage_stats['time'] += record.time
+            stage_stats['self_time'] += record.self_time
+            stage_stats['max_time'] = max(stage_stats['max_time'], record.time)
+            stage_stats['bytes_read'] += record.bytes_read
+            stage_stats['bytes_allocated'] += record.bytes_allocated
+
+    def reset(self):
+        """remove all statistics"""
+        with self._lock:
+            self.stats = {}
+
+    def report(self):
+        """return statistics as a table, in a string, sorted by self time"""
+        lines = [
+            f"{'stage':<20} {'calls':>8} {'time (s)':>10} {'self (s)':>10} {'max (s)':>10} "
+            f"{'read (MiB)':>11} {'alloc (MiB)':>12}"
+        ]
+        for stage, stage_stats in sorted(self.stats.items(), key=lambda item: -item[1]['self_time']):
+            lines.append(
+                f"{stage:<20} {stage_stats['calls']:>8} {stage_stats['time']:>10.4f} "
+                f"{stage_stats['self_time']:>10.4f} {stage_stats['max_time']:>10.4f} "
+                f"{stage_stats['bytes_read'] / 2 ** 20:>11.3f} "
+                f"{stage_stats['bytes_allocated'] / 2 ** 20:>12.3f}"
+            )
+        return '\n'.join(lines)
+
+
+# global registry, that collects statistics between calls to ``enable`` and ``disable``
+registry = Collector()
+
+
+def _update_enabled():
+    global _enabled
+    _enabled = bool(_collectors or _callbacks)
+
+
+def is_enabled():
+    """returns True if calls to instrumented functions are being recorded"""
+    return _enabled
+
+
+def enable():
+    """start collecting statistics in the global registry, returned by ``get_stats``"""
+    with _lock:
+        if registry not in _collectors:
+            _collectors.append(registry)
+        _update_enabled()
+
+
+def disable():
+    """stop collecting statistics in the global registry.
+    Does not reset statistics already collected"""
+    with _lock:
+        if registry in _collectors:
+            _collectors.remove(registry)
+        _update_enabled()
+
+
+def get_stats():
+    """get statistics collected in the global registry
+
+    Returns
+    -------
+    stats : dict
+        see ``Collector``
+    """
+    return registry.stats
+
+
+def reset():
+    """reset statistics collected in the global registry"""
+    registry.reset()
+
+
+def add_callback(callback):
+    """add a function that is called with a ``CallRecord``
+    after every call to an instrumented function"""
+    with _lock:
+        _callbacks.append(callback)
+        _update_enabled()
+
+
+def remove_callback(callback):
+    """remove a function added with ``add_callback``"""
+    with _lock:
+        _callbacks.remove(callback)
+        _update_enabled()
+
+
+@contextlib.contextmanager
+def collect():
+    """context manager that collects statistics for calls made inside it
+
+    Yields
+    ------
+    collector : Collector
+        with statistics for calls made inside the context
+    """
+    collector = Collector()
+    with _lock:
+        _collectors.append(collector)
+        _update_enabled()
+    try:
+        yield collector
+    finally:
+        with _lock:
+            _collectors.remove(collector)
+            _update_enabled()
+
+
+def add_bytes_read(n_bytes):
+    """add to number of bytes read by the instrumented function that is currently running.
+    Called by functions that read files; does nothing if instrumentation is disabled"""
+    if not _enabled:
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].bytes_read += n_bytes
+
+
+def _nbytes(result):
+    """helper function that counts bytes of arrays returned by a function"""
+    if isinstance(result, np.ndarray):
+        return 0 if isinstance(result, np.memmap) else result.nbytes
+    elif isinstance(result, (tuple, list)):
+        return sum(_nbytes(item) for item in result)
+    elif isinstance(result, dict):
+        return sum(_nbytes(item) for item in result.values())
+    return 0
+
+
+def _call(name, func, args, kwargs):
+    """helper function that calls an instrumented function and records the call"""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    active = _ActiveCall()
+    stack.append(active)
+    tic = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - tic
+        stack.pop()
+        if stack:
+            stack[-1].child_time += elapsed
+    record = CallRecord(name, elapsed, elapsed - active.child_time,
+                        active.bytes_read, _nbytes(result))
+    for collector in list(_collectors):
+        collector.add(record)
+    for callback in list(_callbacks):
+        callback(record)
+    return result
+
+
+def stage(name):
+    """decorator that instruments a function as a stage with name ``name``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            return _call(name, func, args, kwargs)
+        return wrapper
+    return decorator
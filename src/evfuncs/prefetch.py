@@ -0,0 +1,175 @@
+"""
+iterator that reads .cbin, .rec and .not.mat files in background threads,
+so that reading the next files overlaps with processing the current one
+"""
+import collections
+import concurrent.futures
+import time
+
+from .evfuncs import _notmat_path, _paths_from, load_cbin, load_notmat
+
+
+LoadedFile = collections.namedtuple('LoadedFile', ['cbin', 'audio', 'sample_freq', 'notmat'])
+LoadedFile.__doc__ = """audio and annotations loaded from one .cbin file
+
+Attributes
+----------
+cbin : pathlib.Path
+    .cbin file
+audio : numpy.ndarray
+    returned by ``evfuncs.load_cbin``
+sample_freq : int
+    returned by ``evfuncs.load_cbin``
+notmat : dict
+    returned by ``evfuncs.load_notmat``,
+    or None if the .cbin file does not have a .not.mat file,
+    or if ``notmat`` is False
+"""
+
+
+def _load_file(cbin, channel, notmat, notmat_reader):
+    """helper function that loads one file, run in a background thread"""
+    audio, sample_freq = load_cbin(cbin, channel=channel)
+    notmat_dict = None
+    if notmat:
+        notmat_path = _notmat_path(cbin)
+        if notmat_path.exists():
+            notmat_dict = load_notmat(notmat_path, reader=notmat_reader)
+    return LoadedFile(cbin, audio, sample_freq, notmat_dict)
+
+
+class Prefetcher:
+    """iterate over .cbin files, in order, while the next files
+    are read in background threads
+
+    Reading files mostly waits on disk or network I/O, which releases the GIL,
+    so it can overlap with CPU-bound processing like ``smooth_data``
+    in the thread that is iterating.
+
+    Parameters
+    ----------
+    cbins : str, Path, list
+        a directory containing .cbin files, a single .cbin file, or a list of .cbin files
+    prefetch : int
+        maximum number of files that are read ahead of the file being processed,
+        which bounds how much audio is held in memory. Default is 4.
+    n_threads : int
+        number of threads that read files. Default is None,
+        in which case it is the same as ``prefetch``.
+    channel : int
+        Channel in .cbin files to load. Default is 0.
+    notmat : bool
+        if True, also load .not.mat files. Default is True.
+    notmat_reader : str
+        passed to ``evfuncs.load_notmat`` as ``reader``. Default is 'fast'.
+
+    Attributes
+    ----------
+    n_files : int
+        number of files yielded so far
+    n_stalls : int
+        number of times the next file had not been read yet when it was needed
+    stall_time : float
+        total time in seconds spent waiting for files to be read
+    queue_depth : int
+        number of files that were already read and waiting,
+        when the last file was requested
+    queue_depth_total : int
+        sum of ``queue_depth`` for every file requested, so that
+        ``queue_depth_total / n_files`` is the mean queue depth
+
+    Examples
+    --------
+    >>> prefetcher = Prefetcher('gy6or6_032312_subset', prefetch=8)
+    >>> with prefetcher:
+    ...     for cbin, rawsong, samp_freq, notmat_dict in prefetcher:
+    ...         smooth = smooth_data(rawsong, samp_freq)
+    >>> print(prefetcher.stats())
+
+    Notes
+    -----
+    If ``n_stalls`` is close to the number of files, processing is waiting on reads,
+    and increasing ``prefetch`` and ``n_threads`` may help. If the mean queue depth
+    is close to ``prefetch``, reads are keeping up, and ``prefetch`` could be smaller.
+    If reading a file raises an exception, it is raised when that file is reached.
+    """
+    def __init__(self, cbins, prefetch=4, n_threads=None, channel=0, notmat=True,
+                 notmat_reader='fast'):
+        self.cbins = _paths_from(cbins)
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be at least 1, but was: {prefetch}")
+        self.prefetch = prefetch
+        self.n_threads = prefetch if n_threads is None else n_threads
+        self.channel = channel
+        self.notmat = notmat
+        self.notmat_reader = notmat_reader
+
+        self.n_files = 0
+        self.n_stalls = 0
+        self.stall_time = 0.
+        self.queue_depth = 0
+        self.queue_depth_total = 0
+        self._executor = None
+        self._in_flight = collections.deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """cancel reads that have not started, and stop background threads"""
+        for future in self._in_flight:
+            future.cancel()
+        self._in_flight.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        """get counters that can be used to size the prefetch window
+
+        Returns
+        -------
+        stats : dict
+            with keys ``n_files``, ``n_stalls``, ``stall_time``, and ``mean_queue_depth``
+        """
+        return {
+            'n_files': self.n_files,
+            'n_stalls': self.n_stalls,
+            'stall_time': self.stall_time,
+            'mean_queue_depth': self.queue_depth_total / self.n_files if self.n_files else 0.,
+        }
+
+    def __iter__(self):
+        self.close()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.n_threads)
+        cbins = iter(self.cbins)
+
+        def _submit():
+            for cbin in cbins:
+                self._in_flight.append(
+                    self._executor.submit(_load_file, cbin, self.channel, self.notmat, self.notmat_reader)
+                )
+                if len(self._in_flight) >= self.prefetch:
+                    break
+
+        try:
+            _submit()
+            while self._in_flight:
+                self.queue_depth = sum(future.done() for future in self._in_flight)
+                self.queue_depth_total += self.queue_depth
+                future = self._in_flight.popleft()
+                if not future.done():
+                    self.n_stalls += 1
+                    tic = time.perf_counter()
+                    concurrent.futures.wait([future])
+                    self.stall_time += time.perf_counter() - tic
+                # submit next read before yielding, so it happens while this file is processed
+                _submit()
+                loaded = future.result()
+                self.n_files += 1
+                yield loaded
+        finally:
+            self.close()
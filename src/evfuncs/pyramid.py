@@ -0,0 +1,304 @@
+"""
+multi-resolution pyramid of the amplitude envelope returned by ``evfuncs.smooth_data``,
+with the minimum, maximum and mean of blocks of samples at each level,
+so that long recordings can be drawn without scanning the full-rate envelope,
+and ``evfuncs.segment_song`` only has to threshold regions that could contain segments
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .evfuncs import load_cbin, smooth_data
+
+
+PYRAMID_SUFFIX = '.pyramid.npz'
+
+
+class EnvelopePyramid:
+    """minimum, maximum and mean of a smoothed amplitude envelope,
+    in blocks of samples that get ``factor`` times larger at each level
+
+    Level 0 has blocks of ``factor`` samples, level 1 has blocks of ``factor ** 2`` samples,
+    and so on, up to the coarsest level, that has a single block.
+    The last block at each level can be shorter than the others.
+    Made with ``build_pyramid``.
+
+    Attributes
+    ----------
+    mins, maxs, means : list
+        of numpy.ndarray, the minimum, maximum and mean of each block, one array per level.
+        Minimum and maximum have the same data type as the envelope, and ignore NaN.
+    factor : int
+        number of samples in each block at level 0, and number of blocks
+        at each level that make up one block at the next level
+    n_samples : int
+        number of samples in envelope
+    samp_freq : int
+        sampling frequency of envelope, or None if it was not specified
+    attrs : dict
+        other metadata, saved with the pyramid, e.g. parameters for ``smooth_data``
+    """
+    def __init__(self, mins, maxs, means, factor, n_samples, samp_freq=None, attrs=None):
+        self.mins = mins
+        self.maxs = maxs
+        self.means = means
+        self.factor = factor
+        self.n_samples = n_samples
+        self.samp_freq = samp_freq
+        self.attrs = {} if attrs is None else attrs
+
+    @property
+    def n_levels(self):
+        return len(self.maxs)
+
+    def block_size(self, level):
+        """number of samples in each block at ``level``"""
+        return self.factor ** (level + 1)
+
+    def overview(self, n_points=1000, start=0, stop=None):
+        """get minimum, maximum and mean of envelope between ``start`` and ``stop``,
+        at the finest level that has at most ``n_points`` blocks in that range,
+        e.g. to draw an overview of a long recording
+
+        Parameters
+        ----------
+        n_points : int
+            maximum number of blocks to return. Default is 1000.
+        start, stop : int
+            first and last sample of range. Default is the whole envelope.
+
+        Returns
+        -------
+        mins, maxs, means : numpy.ndarray
+            minimum, maximum and mean of each block
+        block_start : int
+            index of first sample in first block
+        block_size : int
+            number of samples in each block
+        """
+        stop = self.n_samples if stop is None else stop
+        # coarsest level has a single block, so this always stops at some level
+        for level in range(self.n_levels):
+            block_size = self.block_size(level)
+            first, last = start // block_size, -(-stop // block_size)
+            if last - first <= n_points:
+                break
+        return (self.mins[level][first:last], self.maxs[level][first:last],
+                self.means[level][first:last], first * block_size, block_size)
+
+    def crossings(self, smooth, threshold):
+        """find where ``smooth`` crosses ``threshold``, the same way as ``evfuncs.segment_song``,
+        but only thresholding blocks where the pyramid maximum is above ``threshold``
+
+        Blocks above ``threshold`` are found at the coarsest level,
+        then only blocks inside those are checked at the next finer level,
+        and so on down to level 0. Samples outside the blocks found
+        are all below ``threshold``, so they are never read, which is what makes
+        segmenting fast when ``smooth`` is memory-mapped and mostly silent.
+
+        Parameters
+        ----------
+        smooth : numpy.ndarray
+            Smoothed audio waveform that pyramid was built from,
+            e.g. loaded with ``numpy.load(..., mmap_mode='r')``.
+        threshold : int
+            value above which amplitude is considered part of a segment.
+
+        Returns
+        -------
+        onsets : numpy.ndarray
+            indices of first sample above ``threshold`` in each run of samples above it
+        offsets : numpy.ndarray
+            indices of first sample not above ``threshold`` after each run
+        """
+        if smooth.shape[0] != self.n_samples:
+            raise ValueError(
+                f"smooth has {smooth.shape[0]} samples, but pyramid was built from {self.n_samples} samples"
+            )
+        factor = self.factor
+        blocks = np.flatnonzero(self.maxs[-1] > threshold)
+        for level in range(self.n_levels - 2, -1, -1):
+            children = (blocks[:, np.newaxis] * factor + np.arange(factor)).ravel()
+            children = children[children < self.maxs[level].shape[0]]
+            blocks = children[self.maxs[level][children] > threshold]
+        if blocks.shape[0] < 1:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+
+        # threshold samples in blocks found, one row per block
+        above = np.zeros((blocks.shape[0], factor), dtype=bool)
+        n_full = self.n_samples // factor
+        is_full = blocks < n_full
+        full = smooth[:n_full * factor].reshape(n_full, factor)
+        above[is_full] = full[blocks[is_full]] > threshold
+        if not is_full[-1]:  # last block is shorter than others
+            tail = smooth[n_full * factor:]
+            above[-1, :tail.shape[0]] = tail > threshold
+        positions = (blocks[:, np.newaxis] * factor + np.arange(factor)).ravel()
+        above = above.ravel()
+
+        # previous sample is only in ``above`` if it is in the block just before,
+        # otherwise it's outside the blocks found, and so below threshold
+        prev = np.empty_like(above)
+        prev[0] = False
+        prev[1:] = above[:-1]
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(blocks) != 1) + 1))
+        prev[run_starts * factor] = False
+        onsets = positions[above & ~prev]
+
+        # offsets inside runs of blocks, plus offsets right after the end of a run
+        run_ends = np.concatenate((run_starts[1:], [blocks.shape[0]])) * factor - 1
+        run_ends = run_ends[above[run_ends]]
+        offsets = np.sort(np.concatenate((positions[~above & prev], positions[run_ends] + 1)))
+        return onsets, offsets
+
+    def save(self, path):
+        """save pyramid in a .npz file"""
+        arrays = {}
+        for level in range(self.n_levels):
+            arrays[f'mins_{level}'] = self.mins[level]
+            arrays[f'maxs_{level}'] = self.maxs[level]
+            arrays[f'means_{level}'] = self.means[level]
+        metadata = {
+            'factor': self.factor,
+            'n_samples': self.n_samples,
+            'samp_freq': None if self.samp_freq is None else int(self.samp_freq),
+            'n_levels': self.n_levels,
+            'attrs': self.attrs,
+        }
+        path = Path(path)
+        # write to temporary file then rename, so other processes never see a partial file
+        tmp_path = path.parent.joinpath(f"{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open('wb') as fp:
+            np.savez(fp, metadata=np.array(json.dumps(metadata)), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """load pyramid saved with ``EnvelopePyramid.save``"""
+        with np.load(path, allow_pickle=False) as npz:
+            metadata = json.loads(str(npz['metadata']))
+            n_levels = metadata['n_levels']
+            mins = [npz[f'mins_{level}'] for level in range(n_levels)]
+            maxs = [npz[f'maxs_{level}'] for level in range(n_levels)]
+            means = [npz[f'means_{level}'] for level in range(n_levels)]
+        return cls(mins, maxs, means, metadata['factor'], metadata['n_samples'],
+                   metadata['samp_freq'], metadata['attrs'])
+
+
+def _block_counts(n_samples, block_size):
+    """helper function that returns number of samples in each block"""
+    n_blocks = -(-n_samples // block_size)
+    counts = np.full(n_blocks, block_size, dtype=np.int64)
+    counts[-1] = n_samples - block_size * (n_blocks - 1)
+    return counts
+
+
+def build_pyramid(smooth, factor=16, samp_freq=None):
+    """build a pyramid of the minimum, maximum and mean of a smoothed amplitude envelope
+
+    Parameters
+    ----------
+    smooth : numpy.ndarray
+        Smoothed audio waveform, returned by ``evfuncs.smooth_data``.
+    factor : int
+        number of samples in each block at the finest level,
+        and how many times larger blocks are at each level. Default is 16.
+    samp_freq : int
+        Sampling frequency of ``smooth``, saved with pyramid. Default is None.
+
+    Returns
+    -------
+    pyramid : EnvelopePyramid
+
+    Examples
+    --------
+    >>> rawsong, samp_freq = load_cbin(cbin)
+    >>> smooth = smooth_data(rawsong, samp_freq)
+    >>> pyramid = build_pyramid(smooth, samp_freq=samp_freq)
+    >>> onsets, offsets = segment_song(smooth, samp_freq, pyramid=pyramid)
+    """
+    if smooth.ndim != 1:
+        raise ValueError(
+            f"smooth must be a 1-d array, but number of dimensions was: {smooth.ndim}"
+        )
+    if smooth.shape[0] < 1:
+        raise ValueError("smooth must have at least one sample")
+    if factor < 2:
+        raise ValueError(f"factor must be at least 2, but was: {factor}")
+
+    n_samples = smooth.shape[0]
+    starts = np.arange(0, n_samples, factor)
+    mins = [np.fmin.reduceat(smooth, starts)]
+    maxs = [np.fmax.reduceat(smooth, starts)]
+    means = [np.add.reduceat(smooth, starts, dtype=np.float64) / _block_counts(n_samples, factor)]
+    block_size = factor
+    while maxs[-1].shape[0] > 1:
+        starts = np.arange(0, maxs[-1].shape[0], factor)
+        mins.append(np.fmin.reduceat(mins[-1], starts))
+        maxs.append(np.fmax.reduceat(maxs[-1], starts))
+        # weight means of blocks by number of samples, because last block can be shorter
+        sums = np.add.reduceat(means[-1] * _block_counts(n_samples, block_size), starts)
+        block_size *= factor
+        means.append(sums / _block_counts(n_samples, block_size))
+    return EnvelopePyramid(mins, maxs, means, factor, n_samples, samp_freq)
+
+
+def pyramid_path(cbin):
+    """path of file where pyramid for a .cbin file is saved, next to the .cbin file"""
+    cbin = Path(cbin)
+    return cbin.parent / (cbin.name + PYRAMID_SUFFIX)
+
+
+def cbin_pyramid(cbin, channel=0, freq_cutoffs=(500, 10000), smooth_win=2, factor=16, save=True):
+    """get pyramid of smoothed amplitude envelope for a .cbin file,
+    loading it from next to the .cbin file if it was already saved there,
+    or building it with ``evfuncs.smooth_data`` and ``build_pyramid`` if not
+
+    A saved pyramid is only used if it was built with the same parameters,
+    from a file with the same size and modification time as ``cbin``.
+
+    Parameters
+    ----------
+    cbin : str, Path
+        .cbin file
+    channel : int
+        Channel in file to load. Default is 0.
+    freq_cutoffs, smooth_win
+        passed to ``evfuncs.smooth_data``
+    factor : int
+        passed to ``build_pyramid``. Default is 16.
+    save : bool
+        if True, save pyramid next to .cbin file when it has to be built,
+        in a file named ``<cbin>.pyramid.npz``. Default is True.
+
+    Returns
+    -------
+    pyramid : EnvelopePyramid
+    """
+    cbin = Path(cbin)
+    stat = cbin.stat()
+    attrs = {
+        'cbin_size': stat.st_size,
+        'cbin_mtime_ns': stat.st_mtime_ns,
+        'channel': channel,
+        'freq_cutoffs': None if freq_cutoffs is None else [float(freq) for freq in freq_cutoffs],
+        'smooth_win': smooth_win,
+    }
+    path = pyramid_path(cbin)
+    try:
+        pyramid = EnvelopePyramid.load(path)
+    except (FileNotFoundError, ValueError, OSError, KeyError):
+        pass
+    else:
+        if pyramid.factor == factor and pyramid.attrs == attrs:
+            return pyramid
+
+    rawsong, samp_freq = load_cbin(cbin, channel=channel)
+    smooth = smooth_data(rawsong, samp_freq, freq_cutoffs, smooth_win)
+    pyramid = build_pyramid(smooth, factor=factor, samp_freq=samp_freq)
+    pyramid.attrs = attrs
+    if save:
+        pyramid.save(path)
+    return pyramid
@@ -0,0 +1,224 @@
+"""
+functions for computing spectrograms of segmented syllables,
+for all syllables in a recording at once
+"""
+import functools
+
+import numpy as np
+
+
+# number of frames transformed at a time, which bounds memory used for temporary arrays
+FRAMES_PER_BATCH = 1024
+
+
+@functools.lru_cache(maxsize=32)
+def _window(window, nperseg, dtype):
+    """helper function that gets a window with ``scipy.signal.get_window``,
+    cached so it is only computed once for each window, length and data type"""
+    import scipy.signal
+
+    win = scipy.signal.get_window(window, nperseg).astype(dtype)
+    win.flags.writeable = False
+    return win
+
+
+def _to_samples(times, samp_freq, units):
+    """helper function that converts onsets or offsets to indices of samples"""
+    times = np.asarray(times)
+    if units == 'samples':
+        return times.astype(np.intp)
+    elif units == 's':
+        return np.round(times * samp_freq).astype(np.intp)
+    elif units == 'ms':
+        return np.round(times / 1000 * samp_freq).astype(np.intp)
+    raise ValueError(
+        f"units must be one of {{'samples', 's', 'ms'}} but was: {units}"
+    )
+
+
+def syllable_spectrograms(rawsong, samp_freq, onsets, offsets, units='s', nperseg=512,
+                          noverlap=None, window='hann', scaling='density', detrend='constant',
+                          output='padded', dtype='float64', workers=None):
+    """compute spectrograms of all syllables in a recording, in one batched pass
+
+    Frames from every syllable are gathered into one array, without copying
+    each syllable first, and transformed together with ``scipy.fft.rfft``.
+    The window is cached across calls. Each spectrogram is the same
+    as ``scipy.signal.spectrogram`` of the syllable audio, with ``mode='psd'``.
+
+    Parameters
+    ----------
+    rawsong : numpy.ndarray
+        1-d array of audio, returned by ``evfuncs.load_cbin``. Can be memory-mapped,
+        in which case only the samples within syllables are read.
+    samp_freq : int
+        Sampling frequency of ``rawsong``.
+    onsets, offsets : numpy.ndarray
+        Onsets and offsets of syllables, in units specified by ``units``.
+        E.g., returned by ``evfuncs.segment_song``, or from ``evfuncs.load_notmat``.
+    units : str
+        units of ``onsets`` and ``offsets``. One of {'s', 'ms', 'samples'}.
+        Default is 's', for onsets and offsets returned by ``segment_song``.
+        Use 'ms' for onsets and offsets from .not.mat files.
+    nperseg : int
+        number of samples in each frame. Default is 512.
+    noverlap : int
+        number of samples that frames overlap. Default is None,
+        in which case it is ``nperseg // 8``, as in ``scipy.signal.spectrogram``.
+    window : str, tuple
+        window, passed to ``scipy.signal.get_window``. Default is 'hann'.
+    scaling : str
+        One of {'density', 'spectrum'}, as in ``scipy.signal.spectrogram``.
+        Default is 'density'.
+    detrend : str, bool
+        One of {'constant', False}. If 'constant', the mean of each frame
+        is subtracted before windowing. Default is 'constant'.
+    output : str
+        One of {'padded', 'ragged'}. See Returns. Default is 'padded'.
+    dtype : str, numpy.dtype
+        One of {'float32', 'float64'}. Data type of spectrograms.
+        Using 'float32' also does the transform in single precision, which is faster.
+        Default is 'float64'.
+    workers : int
+        number of threads used by ``scipy.fft.rfft``. Default is None, one thread.
+
+    Returns
+    -------
+    spects_dict : dict
+        with following key, value pairs
+            spects : numpy.ndarray
+                If ``output`` is 'padded', a 3-d array with shape
+                (number of syllables, number of frequencies, maximum number of frames),
+                where spectrograms with fewer frames are padded with zeros.
+                If ``output`` is 'ragged', a 2-d array with shape
+                (number of frequencies, total number of frames),
+                with spectrograms of all syllables concatenated.
+            frame_offsets : numpy.ndarray
+                1-d vector of ints, with length (number of syllables + 1).
+                For ragged output, the spectrogram of syllable ``i`` is
+                ``spects[:, frame_offsets[i]:frame_offsets[i + 1]]``.
+            n_frames : numpy.ndarray
+                number of frames in the spectrogram of each syllable
+            freqs : numpy.ndarray
+                frequency of each row, in Hz
+            times : numpy.ndarray
+                time of the center of each frame, in seconds, relative to syllable onset,
+                for the syllable with the most frames
+            starts, stops : numpy.ndarray
+                onsets and offsets of syllables, in samples
+
+    Examples
+    --------
+    >>> rawsong, samp_freq = load_cbin(cbin)
+    >>> smooth = smooth_data(rawsong, samp_freq)
+    >>> onsets, offsets = segment_song(smooth, samp_freq)
+    >>> spects_dict = syllable_spectrograms(rawsong, samp_freq, onsets, offsets, dtype='float32')
+
+    Notes
+    -----
+    Syllables shorter than ``nperseg`` have a single frame, padded with zeros
+    after detrending, instead of using a shorter frame like ``scipy.signal.spectrogram``,
+    so that all spectrograms have the same frequencies.
+    Syllables with no samples have no frames.
+    """
+    import scipy.fft
+
+    if output not in ('padded', 'ragged'):
+        raise ValueError(
+            f"output must be one of {{'padded', 'ragged'}} but was: {output}"
+        )
+    if scaling not in ('density', 'spectrum'):
+        raise ValueError(
+            f"scaling must be one of {{'density', 'spectrum'}} but was: {scaling}"
+        )
+    if detrend not in ('constant', False):
+        raise ValueError(
+            f"detrend must be one of {{'constant', False}} but was: {detrend}"
+        )
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(
+            f"dtype must be one of {{'float32', 'float64'}}, but was: {dtype}"
+        )
+    if noverlap is None:
+        noverlap = nperseg // 8
+    if not 0 <= noverlap < nperseg:
+        raise ValueError(
+            f"noverlap must be at least 0 and less than nperseg, but was: {noverlap}"
+        )
+    step = nperseg - noverlap
+
+    starts = np.clip(_to_samples(onsets, samp_freq, units), 0, rawsong.shape[0])
+    stops = np.clip(_to_samples(offsets, samp_freq, units), starts, rawsong.shape[0])
+    lens = stops - starts
+    n_frames = np.where(lens >= nperseg, (lens - noverlap) // step, (lens > 0).astype(np.intp))
+    frame_offsets = np.concatenate(([0], np.cumsum(n_frames))).astype(np.intp)
+    n_total = frame_offsets[-1]
+
+    # index of syllable that each frame is from, and first sample of each frame
+    syllable_of_frame = np.repeat(np.arange(starts.shape[0]), n_frames)
+    frame_starts = (starts[syllable_of_frame]
+                    + (np.arange(n_total) - frame_offsets[syllable_of_frame]) * step)
+    is_short = lens[syllable_of_frame] < nperseg
+
+    win = _window(window, nperseg, dtype)
+    if scaling == 'density':
+        scale = 1.0 / (samp_freq * (win * win).sum())
+    else:
+        scale = 1.0 / win.sum() ** 2
+    n_freqs = nperseg // 2 + 1
+    # one-sided spectrum, so double everything but DC and (for even nperseg) Nyquist
+    scales = np.full(n_freqs, 2 * scale, dtype=dtype)
+    scales[0] = scale
+    if nperseg % 2 == 0:
+        scales[-1] = scale
+
+    if rawsong.shape[0] >= nperseg:
+        # view with one row per possible frame, made with ``as_strided``
+        # instead of ``sliding_window_view``, which requires numpy >= 1.20
+        frames_view = np.lib.stride_tricks.as_strided(
+            rawsong, shape=(rawsong.shape[0] - nperseg + 1, nperseg),
+            strides=(rawsong.strides[0], rawsong.strides[0]), writeable=False,
+        )
+    else:
+        frames_view = None
+    spects = np.empty((n_freqs, n_total), dtype=dtype)
+    for batch_start in range(0, n_total, FRAMES_PER_BATCH):
+        batch = slice(batch_start, min(batch_start + FRAMES_PER_BATCH, n_total))
+        batch_frame_starts = frame_starts[batch]
+        batch_is_short = is_short[batch]
+        frames = np.zeros((batch_frame_starts.shape[0], nperseg), dtype=dtype)
+        if frames_view is not None:
+            frames[~batch_is_short] = frames_view[batch_frame_starts[~batch_is_short]]
+        if detrend == 'constant':
+            frames -= frames.mean(axis=1, keepdims=True)
+        # short frames are detrended before they are padded, so padding stays zeros
+        for ind in np.flatnonzero(batch_is_short):
+            syllable = syllable_of_frame[batch][ind]
+            samples = frames[ind, :lens[syllable]]
+            samples[:] = rawsong[starts[syllable]:stops[syllable]]
+            if detrend == 'constant':
+                samples -= samples.mean()
+        frames *= win
+        fft = scipy.fft.rfft(frames, axis=1, workers=workers)
+        power = fft.real ** 2 + fft.imag ** 2
+        power *= scales
+        spects[:, batch] = power.T
+
+    freqs = np.fft.rfftfreq(nperseg, 1 / samp_freq)
+    max_frames = n_frames.max() if n_frames.shape[0] else 0
+    times = (np.arange(max_frames) * step + nperseg / 2) / samp_freq
+    if output == 'padded':
+        padded = np.zeros((starts.shape[0], n_freqs, max_frames), dtype=dtype)
+        padded[syllable_of_frame, :, np.arange(n_total) - frame_offsets[syllable_of_frame]] = spects.T
+        spects = padded
+
+    return {
+        'spects': spects,
+        'frame_offsets': frame_offsets,
+        'n_frames': n_frames,
+        'freqs': freqs,
+        'times': times,
+        'starts': starts,
+        'stops': stops,
+    }
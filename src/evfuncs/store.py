@@ -0,0 +1,240 @@
+"""
+functions for converting a corpus of .cbin, .rec and .not.mat files
+into a single compressed container, and reading from it.
+
+The container is a zip file, with one compressed member per .cbin file,
+that holds the audio from all channels as native-endian 16-bit integers,
+and a json member with the metadata from .rec files and annotations from .not.mat files.
+Reading one song only decompresses that song's member,
+but that member holds every channel, so all channels of the song are decompressed.
+"""
+import json
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from .cache import _rec_dict_from_json, _rec_dict_to_json
+from .evfuncs import _notmat_path, _paths_from, _rec_path, load_cbin, load_notmat, readrecf
+
+
+STORE_FORMAT = 'evfuncs-store'
+STORE_VERSION = 1
+METADATA_NAME = 'metadata.json'
+
+
+def _value_to_json(value):
+    """helper function that converts a value from a notmat_dict to something that can be saved as json"""
+    if isinstance(value, np.ndarray):
+        return {'ndarray': value.tolist(), 'dtype': value.dtype.str}
+    elif isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _value_from_json(value):
+    """helper function that converts a value saved by ``_value_to_json`` back"""
+    if isinstance(value, dict) and 'ndarray' in value:
+        return np.array(value['ndarray'], dtype=value['dtype'])
+    return value
+
+
+def _audio_name(name):
+    return f"audio/{name}.npy"
+
+
+def convert(cbins, store_path, root=None, compresslevel=6):
+    """convert .cbin files, with their .rec and .not.mat files,
+    into a single compressed container that can be read with ``CbinStore``
+
+    Parameters
+    ----------
+    cbins : str, Path, list
+        a directory containing .cbin files, a single .cbin file, or a list of .cbin files.
+        If a directory, sub-directories are also searched.
+        .not.mat files are optional; if a .cbin file does not have one,
+        then there are no annotations for it in the container.
+    store_path : str, Path
+        name of container file to create
+    root : str, Path
+        directory that names of files in the container are relative to.
+        Default is None, in which case it is ``cbins`` if that is a directory,
+        and otherwise names are just the name of each .cbin file.
+    compresslevel : int
+        level of compression, from 0 to 9. Default is 6.
+
+    Returns
+    -------
+    names : list
+        of str, names of .cbin files in container
+
+    Examples
+    --------
+    >>> convert('gy6or6_032312_subset', 'gy6or6.evstore')
+    >>> with CbinStore('gy6or6.evstore') as store:
+    ...     rawsong, samp_freq = store.load_cbin('gy6or6_baseline_230312_0808.138.cbin')
+    """
+    if root is None and isinstance(cbins, (str, Path)) and Path(cbins).is_dir():
+        root = Path(cbins)
+    cbins = _paths_from(cbins, recursive=True)
+
+    metadata = {'format': STORE_FORMAT, 'version': STORE_VERSION, 'files': {}}
+    with zipfile.ZipFile(store_path, mode='w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=compresslevel) as zf:
+        for cbin in cbins:
+            name = cbin.relative_to(root).as_posix() if root is not None else cbin.name
+            if name in metadata['files']:
+                raise ValueError(
+                    f"More than one .cbin file would have the name {name} in container; "
+                    f"specify ``root`` so names are relative paths"
+                )
+            rec_dict = readrecf(_rec_path(cbin))
+            num_channels = rec_dict['num_channels']
+            # native byte order, one row per channel
+            data, sample_freq = load_cbin(cbin, channel=list(range(num_channels)), dtype=np.int16)
+            with zf.open(_audio_name(name), mode='w', force_zip64=True) as fp:
+                np.lib.format.write_array(fp, data, allow_pickle=False)
+
+            notmat = _notmat_path(cbin)
+            if notmat.exists():
+                notmat_dict = load_notmat(notmat, reader='fast')
+                notmat_json = {key: _value_to_json(value) for key, value in notmat_dict.items()}
+            else:
+                notmat_json = None
+            metadata['files'][name] = {
+                'sample_freq': sample_freq,
+                'num_channels': num_channels,
+                'num_samples': data.shape[-1],
+                'rec': _rec_dict_to_json(rec_dict),
+                'notmat': notmat_json,
+            }
+        zf.writestr(METADATA_NAME, json.dumps(metadata))
+    return list(metadata['files'].keys())
+
+
+class CbinStore:
+    """read audio, .rec metadata and .not.mat annotations
+    from a container created by ``evfuncs.store.convert``
+
+    Parameters
+    ----------
+    store_path : str, Path
+        name of container file
+
+    Attributes
+    ----------
+    names : list
+        of str, names of .cbin files in container
+
+    Examples
+    --------
+    >>> with CbinStore('gy6or6.evstore') as store:
+    ...     for name in store.names:
+    ...         rawsong, samp_freq = store.load_cbin(name)
+    ...         notmat_dict = store.load_notmat(name)
+    """
+    def __init__(self, store_path):
+        self.store_path = Path(store_path)
+        self._zf = zipfile.ZipFile(self.store_path, mode='r')
+        metadata = json.loads(self._zf.read(METADATA_NAME))
+        if metadata.get('format') != STORE_FORMAT:
+            self._zf.close()
+            raise ValueError(f"Not a container created by evfuncs.store.convert: {store_path}")
+        self._files = metadata['files']
+        self.names = list(self._files.keys())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        self._zf.close()
+
+    def _file(self, name):
+        try:
+            return self._files[name]
+        except KeyError:
+            raise KeyError(f"No file named {name} in container {self.store_path}") from None
+
+    def load_cbin(self, name, channel=0, start=None, stop=None):
+        """load audio for a .cbin file in container,
+        returning the same values as ``evfuncs.load_cbin``,
+        except that audio is native-endian
+
+        Parameters
+        ----------
+        name : str
+            name of .cbin file in container
+        channel : int, list
+            Channel to load. Default is 0.
+            If a list of ints, those channels are loaded,
+            and ``data`` is returned as a 2-d array
+            with shape (number of channels, number of samples).
+        start : int
+            index of first sample to return. Default is None.
+        stop : int
+            index of sample after last sample to return. Default is None.
+
+        Returns
+        -------
+        data : numpy.ndarray
+            vector of 16-bit signed integers
+        sample_freq : int
+            sampling frequency in Hz
+
+        Notes
+        -----
+        Audio from all channels of a .cbin file is saved in one member of the container,
+        so this always decompresses the whole file, every channel and every sample,
+        even when only one channel or a range of samples is returned.
+        To load several channels of the same file, pass a list to ``channel``
+        instead of calling this once per channel.
+        """
+        file = self._file(name)
+        with self._zf.open(_audio_name(name)) as fp:
+            data = np.lib.format.read_array(fp, allow_pickle=False)
+        if np.isscalar(channel):
+            data = data[channel]
+        else:
+            data = data[list(channel)]
+        return data[..., start:stop], file['sample_freq']
+
+    def load_notmat(self, name):
+        """load annotations for a .cbin file in container,
+        returning the same dict as ``evfuncs.load_notmat`` with ``reader='fast'``
+
+        Parameters
+        ----------
+        name : str
+            name of .cbin file in container
+
+        Returns
+        -------
+        notmat_dict : dict
+            variables from .not.mat file,
+            or None if .cbin file did not have a .not.mat file
+        """
+        notmat_json = self._file(name)['notmat']
+        if notmat_json is None:
+            return None
+        return {key: _value_from_json(value) for key, value in notmat_json.items()}
+
+    def readrecf(self, name):
+        """load metadata from .rec file for a .cbin file in container,
+        returning the same dict as ``evfuncs.readrecf``
+
+        Parameters
+        ----------
+        name : str
+            name of .cbin file in container
+
+        Returns
+        -------
+        rec_dict : dict
+        """
+        return _rec_dict_from_json(self._file(name)['rec'])
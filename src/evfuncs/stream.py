@@ -0,0 +1,416 @@
+"""
+functions for smoothing and segmenting audio in fixed-size blocks,
+so that arbitrarily long recordings can be processed with bounded memory
+"""
+import numpy as np
+
+from .evfuncs import _bandpass_filter, load_cbin
+
+
+def iter_cbin_blocks(filename, blocksize=2 ** 16, channel=0):
+    """iterate over blocks of audio in a .cbin file
+
+    Parameters
+    ----------
+    filename : str, Path
+        name of .cbin file, can include path
+    blocksize : int
+        number of samples in each block. Default is 2 ** 16.
+        The last block may be shorter.
+    channel : int
+        Channel in file to load. Default is 0.
+
+    Yields
+    ------
+    block : numpy.ndarray
+        1-d vector of 16-bit signed integers
+    """
+    data, _ = load_cbin(filename, channel=channel, mmap=True)
+    for start in range(0, data.shape[0], blocksize):
+        yield np.array(data[start:start + blocksize])
+
+
+class Smoother:
+    """filters and smooths audio block by block,
+    giving the same result as ``evfuncs.smooth_data``
+    without holding the entire recording in memory
+
+    Parameters
+    ----------
+    samp_freq : int
+        sampling frequency
+    freq_cutoffs: list
+        two-element list of integers, [low freq., high freq.]
+        bandpass filter applied with this list defining pass band.
+        If None, in which case bandpass filter is not applied.
+    smooth_win : integer
+        size of smoothing window in milliseconds. Default is 2.
+
+    Examples
+    --------
+    >>> smoother = Smoother(32000)
+    >>> for block in iter_cbin_blocks('gy6or6_baseline_230312_0808.138.cbin'):
+    ...     smooth = smoother.push(block)
+    >>> smooth = smoother.flush()
+
+    Notes
+    -----
+    The zero-phase filtering done by ``scipy.signal.filtfilt`` with an FIR filter
+    is equivalent to convolving once with the filter convolved with its own reverse,
+    after padding the audio with an odd extension at each end.
+    Here that convolution is done block by block,
+    carrying over the samples needed to overlap with the next block.
+    Always uses the 512-tap filter that ``evfuncs.bandpass_filtfilt`` uses
+    for audio longer than 1538 samples.
+    The samples carried over are a fixed number, so the time to process each block
+    is proportional to its size, no matter how long the recording is.
+    """
+    numtaps = 512
+
+    def __init__(self, samp_freq, freq_cutoffs=(500, 10000), smooth_win=2):
+        self.samp_freq = samp_freq
+        self.freq_cutoffs = freq_cutoffs
+        self.smooth_win = smooth_win
+
+        if freq_cutoffs is not None:
+            b, _ = _bandpass_filter(samp_freq, tuple(freq_cutoffs), self.numtaps)
+            self._h = np.convolve(b, b[::-1])  # forward and backward pass, as one symmetric filter
+            self._padlen = self.numtaps
+
+        self._smooth_len = np.round(samp_freq * smooth_win / 1000).astype(int)
+        # same as offset used to trim output of np.convolve in evfuncs.smooth_data
+        self._smooth_offset = round((self._smooth_len - 1) / 2)
+        self._h_smooth = np.ones((self._smooth_len,)) / self._smooth_len
+        self.reset()
+
+    def reset(self):
+        """reset state, so that smoother can be used for a new recording"""
+        self._buffer = np.zeros((0,))
+        self._started = False
+        # samples carried over so that moving average overlaps with the previous block,
+        # the zeros here are the padding that np.convolve adds at the start of the audio
+        self._carry = np.zeros((self._smooth_len - 1,))
+        self._to_skip = self._smooth_offset
+
+    def _filter(self, block):
+        """apply bandpass filter to next block of audio"""
+        if self.freq_cutoffs is None:
+            return np.asarray(block, dtype=np.float64)
+        padlen = self._padlen
+        self._buffer = np.concatenate((self._buffer, np.asarray(block, dtype=np.float64)))
+        if not self._started:
+            if self._buffer.shape[0] <= padlen:
+                return np.zeros((0,))  # need more than padlen samples to make odd extension at start
+            start_ext = 2 * self._buffer[0] - self._buffer[padlen:0:-1]
+            self._buffer = np.concatenate((start_ext, self._buffer))
+            self._started = True
+        if self._buffer.shape[0] <= 2 * padlen:
+            return np.zeros((0,))
+        import scipy.signal
+
+        filtsong = scipy.signal.fftconvolve(self._buffer, self._h, mode='valid')
+        self._buffer = self._buffer[self._buffer.shape[0] - 2 * padlen:]
+        return filtsong
+
+    def _filter_flush(self):
+        """apply bandpass filter to audio remaining at end of recording"""
+        if self.freq_cutoffs is None:
+            return np.zeros((0,))
+        padlen = self._padlen
+        if not self._started:
+            raise ValueError(
+                f"Audio must have more than {padlen} samples to filter with bandpass filter, "
+                f"but only had {self._buffer.shape[0]} samples."
+            )
+        # odd extension at end; the last padlen + 1 samples of audio are always in buffer
+        end_ext = 2 * self._buffer[-1] - self._buffer[-2:-padlen - 2:-1]
+        import scipy.signal
+
+        return scipy.signal.fftconvolve(np.concatenate((self._buffer, end_ext)), self._h, mode='valid')
+
+    def _smooth(self, filtsong):
+        """square and smooth next block of filtered audio"""
+        squared_song = np.concatenate((self._carry, np.power(filtsong, 2)))
+        smooth = np.convolve(squared_song, self._h_smooth, mode='valid')
+        self._carry = squared_song[squared_song.shape[0] - (self._smooth_len - 1):]
+        if self._to_skip:
+            n_skip = min(self._to_skip, smooth.shape[0])
+            smooth = smooth[n_skip:]
+            self._to_skip -= n_skip
+        return smooth
+
+    def push(self, block):
+        """filter and smooth the next block of audio
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            1-d array, next block of "raw" audio. Can be of any size.
+
+        Returns
+        -------
+        smooth : numpy.ndarray
+            1-d array, smoothed waveform for as many samples as can be computed so far.
+            Not the same size as ``block``, and may be empty.
+        """
+        filtsong = self._filter(block)
+        if filtsong.shape[0] == 0:
+            return np.zeros((0,))
+        return self._smooth(filtsong)
+
+    def flush(self):
+        """finish filtering and smoothing at end of recording,
+        and reset state so smoother can be used for a new recording
+
+        Returns
+        -------
+        smooth : numpy.ndarray
+            1-d array, rest of smoothed waveform
+        """
+        smooth = self._smooth(self._filter_flush())
+        # zero padding that np.convolve adds at the end of the audio
+        squared_song = np.concatenate((self._carry, np.zeros((self._smooth_offset,))))
+        smooth_end = np.convolve(squared_song, self._h_smooth, mode='valid')[self._to_skip:]
+        self.reset()
+        return np.concatenate((smooth, smooth_end))
+
+
+def smooth_data_stream(blocks, samp_freq, freq_cutoffs=(500, 10000), smooth_win=2):
+    """filter and smooth audio block by block,
+    giving the same result as ``evfuncs.smooth_data``
+    without holding the entire recording in memory
+
+    Parameters
+    ----------
+    blocks : iterable
+        of 1-d numpy arrays, successive blocks of "raw" audio.
+        Blocks can be of any size.
+    samp_freq : int
+        sampling frequency
+    freq_cutoffs: list
+        two-element list of integers, [low freq., high freq.]
+        bandpass filter applied with this list defining pass band.
+        If None, in which case bandpass filter is not applied.
+    smooth_win : integer
+        size of smoothing window in milliseconds. Default is 2.
+
+    Yields
+    ------
+    smooth : numpy.ndarray
+        1-d numpy array, next block of smoothed waveform.
+        Blocks yielded are not the same size as the blocks passed in;
+        concatenating them gives the smoothed waveform for the entire recording.
+
+    Examples
+    --------
+    >>> blocks = iter_cbin_blocks('gy6or6_baseline_230312_0808.138.cbin')
+    >>> for smooth in smooth_data_stream(blocks, 32000):
+    ...     print(smooth.max())
+
+    Notes
+    -----
+    See ``evfuncs.stream.Smoother``.
+    """
+    smoother = Smoother(samp_freq, freq_cutoffs, smooth_win)
+    for block in blocks:
+        smooth = smoother.push(block)
+        if smooth.shape[0]:
+            yield smooth
+    smooth = smoother.flush()
+    if smooth.shape[0]:
+        yield smooth
+
+
+class Segmenter:
+    """segments audio into syllables block by block, as it is recorded,
+    giving the same segments as ``evfuncs.segment_song``,
+    and returning each segment as soon as it is final
+
+    Parameters
+    ----------
+    samp_freq : int
+        Sampling frequency at which audio was recorded.
+    threshold : int
+        value above which amplitude is considered part of a segment.
+        Default is 5000.
+    min_syl_dur : float
+        minimum duration of a segment, in seconds.
+        Default is 0.02, i.e. 20 ms.
+    min_silent_dur : float
+        minimum duration of silent gap between segment, in seconds.
+        Default is 0.002, i.e. 2 ms.
+    raw : bool
+        if True, blocks passed to ``push`` are "raw" audio,
+        that is filtered and smoothed with ``evfuncs.stream.Smoother``
+        before segmenting. Default is False, in which case
+        blocks are smoothed amplitude, e.g. returned by ``evfuncs.smooth_data``.
+    freq_cutoffs: list
+        two-element list of integers, [low freq., high freq.],
+        passed to ``Smoother`` when ``raw`` is True. Default is (500, 10000).
+    smooth_win : integer
+        size of smoothing window in milliseconds,
+        passed to ``Smoother`` when ``raw`` is True. Default is 2.
+
+    Attributes
+    ----------
+    n_samples : int
+        number of samples of smoothed amplitude segmented so far
+
+    Examples
+    --------
+    >>> segmenter = Segmenter(32000, raw=True)
+    >>> for block in iter_cbin_blocks('gy6or6_baseline_230312_0808.138.cbin', blocksize=1024):
+    ...     for onset, offset in segmenter.push(block):
+    ...         print(onset, offset)
+    >>> for onset, offset in segmenter.flush():
+    ...     print(onset, offset)
+
+    Notes
+    -----
+    A segment is returned as soon as the silent gap after its offset
+    is longer than ``min_silent_dur``, so it can no longer be merged with the next segment.
+    The only state kept between blocks is the segment still above threshold
+    at the end of the last block, and the segment that could still be merged,
+    so the time to process each block is proportional to its size,
+    no matter how long the recording is.
+    """
+    def __init__(self, samp_freq, threshold=5000, min_syl_dur=0.02, min_silent_dur=0.002,
+                 raw=False, freq_cutoffs=(500, 10000), smooth_win=2):
+        self.samp_freq = samp_freq
+        self.threshold = threshold
+        self.min_syl_dur = min_syl_dur
+        self.min_silent_dur = min_silent_dur
+        if raw:
+            self.smoother = Smoother(samp_freq, freq_cutoffs, smooth_win)
+        else:
+            self.smoother = None
+        self.reset()
+
+    def reset(self):
+        """reset state, so that segmenter can be used for a new recording"""
+        self.n_samples = 0  # index of first sample in next block
+        self._prev_above = False  # whether last sample of previous block was above threshold
+        self._run_start = None  # onset of segment that is above threshold at end of block
+        self._pending = None  # (onset, offset) of segment that could still merge with the next one
+        if self.smoother is not None:
+            self.smoother.reset()
+
+    def _is_gap(self, onset, offset):
+        return onset / self.samp_freq - offset / self.samp_freq > self.min_silent_dur
+
+    def _is_syl(self, segment):
+        return segment[1] / self.samp_freq - segment[0] / self.samp_freq > self.min_syl_dur
+
+    def _to_seconds(self, segment):
+        return segment[0] / self.samp_freq, segment[1] / self.samp_freq
+
+    def _segment(self, smooth):
+        """find segments in next block of smoothed amplitude"""
+        segments = []
+        above_th = smooth > self.threshold
+        crossings = np.diff(above_th.view(np.int8), prepend=np.int8(self._prev_above))
+        for ind in np.flatnonzero(crossings):
+            if crossings[ind] > 0:
+                onset = self.n_samples + ind
+                if self._pending is not None and not self._is_gap(onset, self._pending[1]):
+                    onset = self._pending[0]  # merge segments separated by too short a gap
+                elif self._pending is not None and self._is_syl(self._pending):
+                    segments.append(self._to_seconds(self._pending))
+                self._pending = None
+                self._run_start = onset
+            else:
+                self._pending = (self._run_start, self.n_samples + ind)
+                self._run_start = None
+        self.n_samples += smooth.shape[0]
+        if above_th.shape[0]:
+            self._prev_above = bool(above_th[-1])
+        # any gap will be long enough, so pending segment can't be merged with next one
+        if self._pending is not None and self._is_gap(self.n_samples, self._pending[1]):
+            if self._is_syl(self._pending):
+                segments.append(self._to_seconds(self._pending))
+            self._pending = None
+        return segments
+
+    def push(self, block):
+        """segment the next block of audio
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            1-d array, next block of smoothed amplitude,
+            or of "raw" audio if ``raw`` is True. Can be of any size.
+
+        Returns
+        -------
+        segments : list
+            of (onset_s, offset_s) tuples, in seconds,
+            segments that became final in this block
+        """
+        if self.smoother is not None:
+            block = self.smoother.push(block)
+        return self._segment(block)
+
+    def flush(self):
+        """finish segmenting at end of recording,
+        and reset state so segmenter can be used for a new recording
+
+        Returns
+        -------
+        segments : list
+            of (onset_s, offset_s) tuples, in seconds,
+            segments that were not final until the end of the recording
+        """
+        if self.smoother is not None:
+            segments = self._segment(self.smoother.flush())
+        else:
+            segments = []
+        pending = self._pending
+        if self._run_start is not None:
+            pending = (self._run_start, self.n_samples)
+        if pending is not None and self._is_syl(pending):
+            segments.append(self._to_seconds(pending))
+        self.reset()
+        return segments
+
+
+def segment_song_stream(smooth_blocks, samp_freq, threshold=5000, min_syl_dur=0.02,
+                        min_silent_dur=0.002):
+    """segment smoothed audio into syllables block by block,
+    giving the same segments as ``evfuncs.segment_song``,
+    and yielding each segment as soon as it is final
+
+    Parameters
+    ----------
+    smooth_blocks : iterable
+        of 1-d numpy arrays, successive blocks of smoothed audio,
+        e.g., yielded by ``evfuncs.stream.smooth_data_stream``
+    samp_freq : int
+        Sampling frequency at which audio was recorded.
+    threshold : int
+        value above which amplitude is considered part of a segment.
+        Default is 5000.
+    min_syl_dur : float
+        minimum duration of a segment, in seconds.
+        Default is 0.02, i.e. 20 ms.
+    min_silent_dur : float
+        minimum duration of silent gap between segment, in seconds.
+        Default is 0.002, i.e. 2 ms.
+
+    Yields
+    ------
+    onset_s : float
+        Onset time of syllable, in seconds.
+    offset_s : float
+        Offset time of syllable, in seconds.
+
+    Examples
+    --------
+    >>> blocks = iter_cbin_blocks('gy6or6_baseline_230312_0808.138.cbin')
+    >>> smooth_blocks = smooth_data_stream(blocks, 32000)
+    >>> for onset, offset in segment_song_stream(smooth_blocks, 32000):
+    ...     print(onset, offset)
+    """
+    segmenter = Segmenter(samp_freq, threshold, min_syl_dur, min_silent_dur)
+    for smooth in smooth_blocks:
+        yield from segmenter.push(smooth)
+    yield from segmenter.flush()
@@ -0,0 +1,297 @@
+"""
+functions for sweeping the parameters of ``evfuncs.segment_song``
+over a grid of values, and scoring the segments against annotations,
+e.g. to find parameters that best match hand-annotated songs
+"""
+
+import numpy as np
+
+from .evfuncs import _notmat_path, _paths_from, load_cbin, load_notmat, smooth_data
+
+
+def _crossing_candidates(smooth, thresholds):
+    """helper function that finds every pair of consecutive samples
+    that could cross any of the thresholds,
+    so that crossings for each threshold only have to be found among these pairs
+
+    Returns index of each pair (the same index that ``segment_song`` uses for onsets and offsets),
+    the lower and higher value in each pair, and whether the pair is rising.
+    """
+    # pad with -inf, so that every segment has an onset and an offset,
+    # like the padding that np.convolve adds in segment_song
+    padded = np.empty((smooth.shape[0] + 2,), dtype=np.float64)
+    padded[0] = padded[-1] = -np.inf
+    padded[1:-1] = smooth
+    before, after = padded[:-1], padded[1:]
+    lo = np.minimum(before, after)
+    hi = np.maximum(before, after)
+    # above_th changes from one sample to the next when lo <= threshold < hi
+    is_candidate = (lo <= np.max(thresholds)) & (hi > np.min(thresholds))
+    inds = np.flatnonzero(is_candidate)
+    return inds, lo[inds], hi[inds], after[inds] > before[inds]
+
+
+def _iter_sweep(smooth, samp_freq, thresholds, min_syl_durs, min_silent_durs):
+    """helper function that yields indices into parameter grid,
+    and onsets and offsets in seconds, for every point in grid"""
+    inds, lo, hi, rising = _crossing_candidates(smooth, thresholds)
+    for i, threshold in enumerate(thresholds):
+        crosses = (lo <= threshold) & (hi > threshold)
+        crossing_inds = inds[crosses]
+        # onsets and offsets alternate, starting with an onset
+        onsets_s = crossing_inds[rising[crosses]] / samp_freq
+        offsets_s = crossing_inds[~rising[crosses]] / samp_freq
+        for k, min_silent_dur in enumerate(min_silent_durs):
+            # get rid of silent intervals that are shorter than min_silent_dur
+            if onsets_s.shape[0]:
+                is_boundary = onsets_s[1:] - offsets_s[:-1] > min_silent_dur
+                merged_onsets_s = onsets_s[np.concatenate(([True], is_boundary))]
+                merged_offsets_s = offsets_s[np.concatenate((is_boundary, [True]))]
+            else:
+                merged_onsets_s, merged_offsets_s = onsets_s, offsets_s
+            syl_durs = merged_offsets_s - merged_onsets_s
+            for j, min_syl_dur in enumerate(min_syl_durs):
+                # eliminate syllables with duration shorter than min_syl_dur
+                keep_these = syl_durs > min_syl_dur
+                yield (i, j, k), merged_onsets_s[keep_these], merged_offsets_s[keep_these]
+
+
+def segment_song_sweep(smooth, samp_freq, thresholds, min_syl_durs, min_silent_durs,
+                       return_segments=True):
+    """segment smoothed audio with every combination of parameters in a grid,
+    giving the same onsets and offsets as calling ``evfuncs.segment_song``
+    once for each combination, but much faster
+
+    Parameters
+    ----------
+    smooth : np.ndarray
+        Smoothed audio waveform, returned by evfuncs.smooth_data.
+    samp_freq : int
+        Sampling frequency at which audio was recorded.
+    thresholds : sequence
+        of values above which amplitude is considered part of a segment.
+    min_syl_durs : sequence
+        of minimum durations of a segment, in seconds.
+    min_silent_durs : sequence
+        of minimum durations of silent gap between segment, in seconds.
+    return_segments : bool
+        if True, return onsets and offsets for every point in grid.
+        Default is True. If False, only return number of segments.
+
+    Returns
+    -------
+    sweep : dict
+        with the following keys:
+            thresholds, min_syl_durs, min_silent_durs : numpy.ndarray
+                parameter values that define grid
+            n_segments : numpy.ndarray
+                number of segments for each point in grid, with shape
+                (len(thresholds), len(min_syl_durs), len(min_silent_durs))
+            segments : dict
+                mapping (threshold, min_syl_dur, min_silent_dur) tuples
+                to (onsets_s, offsets_s) tuples.
+                Unlike ``segment_song``, onsets and offsets are empty arrays,
+                not None, when there are no segments.
+                Only returned if ``return_segments`` is True.
+
+    Examples
+    --------
+    >>> rawsong, samp_freq = load_cbin('gy6or6_baseline_230312_0808.138.cbin')
+    >>> smooth = smooth_data(rawsong, samp_freq)
+    >>> sweep = segment_song_sweep(smooth, samp_freq, thresholds=[3000, 5000, 7000],
+    ...                            min_syl_durs=[0.01, 0.02], min_silent_durs=[0.002, 0.005])
+    >>> onsets_s, offsets_s = sweep['segments'][(5000, 0.02, 0.002)]
+
+    Notes
+    -----
+    Pairs of consecutive samples that could cross any threshold in the grid are found once,
+    then crossings for each threshold are found among just those pairs,
+    and merging gaps and removing short segments is done on the onsets and offsets,
+    instead of on the entire smoothed waveform.
+    """
+    thresholds = np.asarray(thresholds)
+    min_syl_durs = np.asarray(min_syl_durs)
+    min_silent_durs = np.asarray(min_silent_durs)
+    sweep = {
+        'thresholds': thresholds,
+        'min_syl_durs': min_syl_durs,
+        'min_silent_durs': min_silent_durs,
+        'n_segments': np.zeros((thresholds.shape[0], min_syl_durs.shape[0], min_silent_durs.shape[0]),
+                               dtype=np.int64),
+    }
+    if return_segments:
+        sweep['segments'] = {}
+    for (i, j, k), onsets_s, offsets_s in _iter_sweep(smooth, samp_freq, thresholds,
+                                                      min_syl_durs, min_silent_durs):
+        sweep['n_segments'][i, j, k] = onsets_s.shape[0]
+        if return_segments:
+            params = (thresholds[i].item(), min_syl_durs[j].item(), min_silent_durs[k].item())
+            sweep['segments'][params] = (onsets_s, offsets_s)
+    return sweep
+
+
+def _count_hits(onsets, offsets, ref_onsets, ref_offsets, tolerance):
+    """helper function that counts reference segments
+    matched by a segment whose onset and offset are both within ``tolerance``,
+    where each segment can only match one reference segment"""
+    if onsets.shape[0] == 0 or ref_onsets.shape[0] == 0:
+        return 0
+    # onsets are sorted, so candidates for each reference segment are the range of segments
+    # with onset within tolerance of the reference onset
+    lo = np.searchsorted(onsets, ref_onsets - tolerance, side='left')
+    hi = np.searchsorted(onsets, ref_onsets + tolerance, side='right')
+    n_candidates = np.maximum(hi - lo, 0)
+    refs = np.repeat(np.arange(ref_onsets.shape[0]), n_candidates)
+    candidates = (np.arange(refs.shape[0])
+                  - np.repeat(np.cumsum(n_candidates) - n_candidates, n_candidates)
+                  + lo[refs])
+    is_hit = (
+        (np.abs(onsets[candidates] - ref_onsets[refs]) <= tolerance)
+        & (np.abs(offsets[candidates] - ref_offsets[refs]) <= tolerance)
+    )
+    refs, candidates = refs[is_hit], candidates[is_hit]
+    if np.unique(refs).shape[0] == refs.shape[0] and np.unique(candidates).shape[0] == candidates.shape[0]:
+        return refs.shape[0]  # usual case, where no segment or reference segment matches twice
+    # otherwise match in order. Both are sorted, so candidate ranges move forward with references,
+    # and matching each reference to the first unmatched candidate gives the most matches
+    n_hits = 0
+    last_matched = -1
+    for ref in np.unique(refs):
+        ref_candidates = candidates[(refs == ref) & (candidates > last_matched)]
+        if ref_candidates.shape[0]:
+            last_matched = ref_candidates[0]
+            n_hits += 1
+    return n_hits
+
+
+def score_segments(onsets_s, offsets_s, ref_onsets_s, ref_offsets_s, tolerance=0.01):
+    """score segments against reference segments, e.g. from a .not.mat file
+
+    A segment is a hit if its onset and offset are both
+    within ``tolerance`` of the onset and offset of a reference segment.
+    Each segment can only match one reference segment, and vice versa.
+
+    Parameters
+    ----------
+    onsets_s, offsets_s : numpy.ndarray
+        onsets and offsets of segments, in seconds, e.g. returned by ``segment_song``.
+        If None, there are no segments.
+    ref_onsets_s, ref_offsets_s : numpy.ndarray
+        onsets and offsets of reference segments, in seconds.
+        Note that onsets and offsets in .not.mat files are in milliseconds.
+    tolerance : float
+        maximum difference between onsets and between offsets, in seconds,
+        for a segment to match a reference segment. Default is 0.01, i.e. 10 ms.
+
+    Returns
+    -------
+    scores : dict
+        with keys ``n_hits``, ``n_segments``, ``n_ref``,
+        ``precision``, ``recall`` and ``f1``.
+        ``precision`` is NaN if there are no segments,
+        and ``recall`` is NaN if there are no reference segments.
+
+    Examples
+    --------
+    >>> notmat_dict = load_notmat('gy6or6_baseline_230312_0808.138.cbin')
+    >>> onsets_s, offsets_s = segment_song(smooth, samp_freq)
+    >>> scores = score_segments(onsets_s, offsets_s,
+    ...                         notmat_dict['onsets'] / 1000, notmat_dict['offsets'] / 1000)
+    """
+    onsets_s = np.array([]) if onsets_s is None else np.atleast_1d(onsets_s)
+    offsets_s = np.array([]) if offsets_s is None else np.atleast_1d(offsets_s)
+    ref_onsets_s = np.atleast_1d(np.asarray(ref_onsets_s, dtype=np.float64))
+    ref_offsets_s = np.atleast_1d(np.asarray(ref_offsets_s, dtype=np.float64))
+    n_hits = _count_hits(onsets_s, offsets_s, ref_onsets_s, ref_offsets_s, tolerance)
+    return _scores(n_hits, onsets_s.shape[0], ref_onsets_s.shape[0])
+
+
+def _scores(n_hits, n_segments, n_ref):
+    """helper function that computes precision, recall and F1 score from counts.
+    Works on scalars and on arrays of counts for a grid."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.divide(n_hits, n_segments, dtype=np.float64)
+        recall = np.divide(n_hits, n_ref, dtype=np.float64)
+        f1 = np.divide(2 * n_hits, n_segments + n_ref, dtype=np.float64)
+    return {
+        'n_hits': n_hits,
+        'n_segments': n_segments,
+        'n_ref': n_ref,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+    }
+
+
+def sweep_files(cbins, thresholds, min_syl_durs, min_silent_durs, tolerance=0.01,
+                channel=0, freq_cutoffs=(500, 10000), smooth_win=2):
+    """sweep parameters of ``segment_song`` over a grid for many .cbin files,
+    and score the segments against the annotations in their .not.mat files
+
+    Each file is loaded and smoothed once, and then segmented with every point in the grid.
+    Counts of hits, segments and reference segments are summed across files,
+    and precision, recall and F1 score are computed from the sums.
+
+    Parameters
+    ----------
+    cbins : str, Path, list
+        a directory containing .cbin files, a single .cbin file, or a list of .cbin files.
+        Files without a .not.mat file are skipped.
+    thresholds, min_syl_durs, min_silent_durs : sequence
+        parameter values that define grid, see ``segment_song_sweep``.
+    tolerance : float
+        see ``score_segments``. Default is 0.01, i.e. 10 ms.
+    channel : int
+        Channel in .cbin files to load. Default is 0.
+    freq_cutoffs : list
+        passed to ``smooth_data``. Default is (500, 10000).
+    smooth_win : integer
+        passed to ``smooth_data``. Default is 2.
+
+    Returns
+    -------
+    scores : dict
+        with keys ``thresholds``, ``min_syl_durs`` and ``min_silent_durs``,
+        plus the keys returned by ``score_segments``, where each value is an array
+        with shape (len(thresholds), len(min_syl_durs), len(min_silent_durs)),
+        except for ``n_ref``, which is the same for every point in grid.
+
+    Examples
+    --------
+    >>> scores = sweep_files('gy6or6_032312_subset', thresholds=np.arange(1000, 10000, 500),
+    ...                      min_syl_durs=[0.01, 0.02, 0.03], min_silent_durs=[0.002, 0.005])
+    >>> i, j, k = np.unravel_index(np.nanargmax(scores['f1']), scores['f1'].shape)
+    >>> print(scores['thresholds'][i], scores['min_syl_durs'][j], scores['min_silent_durs'][k])
+    """
+    cbins = _paths_from(cbins)
+    thresholds = np.asarray(thresholds)
+    min_syl_durs = np.asarray(min_syl_durs)
+    min_silent_durs = np.asarray(min_silent_durs)
+    shape = (thresholds.shape[0], min_syl_durs.shape[0], min_silent_durs.shape[0])
+    n_hits = np.zeros(shape, dtype=np.int64)
+    n_segments = np.zeros(shape, dtype=np.int64)
+    n_ref = 0
+
+    for cbin in cbins:
+        notmat = _notmat_path(cbin)
+        if not notmat.exists():
+            continue
+        notmat_dict = load_notmat(notmat, reader='fast', variables=('onsets', 'offsets'))
+        ref_onsets_s = np.atleast_1d(np.asarray(notmat_dict['onsets'], dtype=np.float64)) / 1000
+        ref_offsets_s = np.atleast_1d(np.asarray(notmat_dict['offsets'], dtype=np.float64)) / 1000
+        n_ref += ref_onsets_s.shape[0]
+
+        rawsong, samp_freq = load_cbin(cbin, channel=channel)
+        smooth = smooth_data(rawsong, samp_freq, freq_cutoffs, smooth_win)
+        for ijk, onsets_s, offsets_s in _iter_sweep(smooth, samp_freq, thresholds,
+                                                    min_syl_durs, min_silent_durs):
+            n_segments[ijk] += onsets_s.shape[0]
+            n_hits[ijk] += _count_hits(onsets_s, offsets_s, ref_onsets_s, ref_offsets_s, tolerance)
+
+    scores = {
+        'thresholds': thresholds,
+        'min_syl_durs': min_syl_durs,
+        'min_silent_durs': min_silent_durs,
+    }
+    scores.update(_scores(n_hits, n_segments, n_ref))
+    return scores
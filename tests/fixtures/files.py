@@ -1,4 +1,8 @@
+import shutil
+
+import numpy as np
 import pytest
+import scipy.io
 
 
 @pytest.fixture
@@ -34,3 +38,23 @@ def segment_mats(gy6or6_032312_subset_root):
 @pytest.fixture
 def notmat_with_single_annotated_segment(data_for_tests_root):
     return data_for_tests_root / 'or60yw70-song-edited-to-have-single-segment' / 'or60yw70_300912_0725.437.cbin.not.mat'
+
+
+@pytest.fixture
+def root_with_empty_notmat(cbins, tmp_path):
+    """directory with two songs, where the first song has a .not.mat file
+    with no annotated segments, like files that were opened in evsonganaly but not labeled"""
+    root = tmp_path / 'with_empty_notmat'
+    root.mkdir()
+    for cbin in cbins[:2]:
+        for path in (cbin, cbin.with_suffix('.rec'), cbin.parent / (cbin.name + '.not.mat')):
+            shutil.copy(path, root / path.name)
+    empty_notmat = root / (cbins[0].name + '.not.mat')
+    notmat_dict = {
+        key: value for key, value in scipy.io.loadmat(empty_notmat).items() if not key.startswith('__')
+    }
+    notmat_dict['labels'] = ''
+    notmat_dict['onsets'] = np.zeros((0, 1))
+    notmat_dict['offsets'] = np.zeros((0, 1))
+    scipy.io.savemat(empty_notmat, notmat_dict)
+    return root
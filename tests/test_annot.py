@@ -0,0 +1,111 @@
+"""
+test annot module
+"""
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.annot
+import evfuncs.index
+
+
+def test_annotations_from_notmats(notmats, tmp_path):
+    annots = evfuncs.annot.Annotations.from_notmats(notmats)
+    assert annots.n_files == len(notmats)
+    for ind, notmat in enumerate(notmats):
+        notmat_dict = evfuncs.load_notmat(notmat)
+        annot_dict = annots.file(ind)
+        assert annot_dict['labels'] == notmat_dict['labels']
+        assert np.array_equal(annot_dict['onsets'], notmat_dict['onsets'])
+        assert np.array_equal(annot_dict['offsets'], notmat_dict['offsets'])
+
+    annots.save(tmp_path / 'annots.npz')
+    loaded = evfuncs.annot.Annotations.load(tmp_path / 'annots.npz')
+    assert np.array_equal(loaded.labels, annots.labels)
+    assert np.array_equal(loaded.file_offsets, annots.file_offsets)
+
+
+def test_annotations_from_notmats_single_file(notmats):
+    for notmat in (notmats[0], str(notmats[0])):
+        annots = evfuncs.annot.Annotations.from_notmats(notmat)
+        assert annots.n_files == 1
+        assert annots.file(0)['labels'] == evfuncs.load_notmat(notmats[0])['labels']
+
+
+def test_annotations_save_concurrent(notmats, tmp_path):
+    annots = evfuncs.annot.Annotations.from_notmats(notmats)
+    # another process saving to the same path would have a temporary file with a different name
+    tmp_path.joinpath('annots.npz.tmp').mkdir()
+    annots.save(tmp_path / 'annots.npz')
+    loaded = evfuncs.annot.Annotations.load(tmp_path / 'annots.npz')
+    assert np.array_equal(loaded.labels, annots.labels)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['annots.npz', 'annots.npz.tmp']
+
+
+def test_annotations_from_index(gy6or6_032312_subset_root):
+    index = evfuncs.index.build_index(gy6or6_032312_subset_root)
+    annots = evfuncs.annot.Annotations.from_index(index)
+    expected = evfuncs.annot.Annotations.from_notmats(gy6or6_032312_subset_root)
+    assert np.array_equal(annots.onsets, expected.onsets)
+    assert np.array_equal(annots.labels, expected.labels)
+    assert np.array_equal(annots.file_offsets, expected.file_offsets)
+
+
+def test_annotations_empty_notmat(root_with_empty_notmat):
+    annots = evfuncs.annot.Annotations.from_notmats(root_with_empty_notmat)
+    assert annots.n_files == 2
+    assert annots.file(0)['labels'] == ''
+    assert annots.file(0)['onsets'].shape == (0,)
+    notmat_dict = evfuncs.load_notmat(sorted(root_with_empty_notmat.glob('*.not.mat'))[1])
+    assert annots.file(1)['labels'] == notmat_dict['labels']
+    assert annots.stats()['counts'].sum() == len(notmat_dict['labels'])
+
+    index = evfuncs.index.build_index(root_with_empty_notmat)
+    from_index = evfuncs.annot.Annotations.from_index(index)
+    assert np.array_equal(from_index.labels, annots.labels)
+    assert np.array_equal(from_index.file_offsets, annots.file_offsets)
+
+
+def test_annotations_stats(notmats):
+    annots = evfuncs.annot.Annotations.from_notmats(notmats)
+    stats = annots.stats()
+    labels, durations, gaps = annots.labels, annots.durations, annots.gaps
+    assert stats['counts'].sum() == len(annots)
+    for ind, label in enumerate(stats['labels']):
+        is_label = labels == label
+        assert stats['counts'][ind] == is_label.sum()
+        assert np.isclose(stats['duration_mean'][ind], durations[is_label].mean())
+        assert np.allclose(stats['duration_percentiles'][ind],
+                           np.percentile(durations[is_label], stats['percentiles']))
+        has_gap = is_label & ~np.isnan(gaps)
+        if has_gap.any():
+            assert np.allclose(stats['gap_percentiles'][ind],
+                               np.percentile(gaps[has_gap], stats['percentiles']))
+
+    transition_counts = np.zeros_like(stats['transition_counts'])
+    label_list = list(stats['labels'])
+    for ind in range(annots.n_files):
+        file_labels = annots.file(ind)['labels']
+        for label, next_label in zip(file_labels[:-1], file_labels[1:]):
+            transition_counts[label_list.index(label), label_list.index(next_label)] += 1
+    assert np.array_equal(stats['transition_counts'], transition_counts)
+
+
+def test_annotations_from_segments(cbins):
+    segments = []
+    for cbin in cbins[:3]:
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        segments.append(evfuncs.segment_song(smooth, fs))
+    segments.append((None, None))
+    annots = evfuncs.annot.Annotations.from_segments(segments, files=cbins[:3] + ['silent'])
+    assert annots.n_files == 4
+    assert annots.file(3)['onsets'].shape == (0,)
+    assert np.array_equal(annots.label_names, [evfuncs.annot.UNLABELED])
+    assert np.allclose(annots.file(0)['onsets'], segments[0][0] * 1000)
+    stats = annots.stats()
+    assert stats['counts'][0] == len(annots)
+    assert stats['transition_counts'][0, 0] == len(annots) - 3
+
+    with pytest.raises(ValueError):
+        evfuncs.annot.Annotations.from_segments(segments, files=cbins[:2])
@@ -0,0 +1,94 @@
+"""
+test batch module
+"""
+import csv
+
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.batch
+import evfuncs.cache
+import evfuncs.cli
+
+
+@pytest.mark.parametrize(
+    'n_workers, ordered',
+    [
+        (0, True),
+        (2, True),
+        (2, False),
+    ]
+)
+def test_segment_files(cbins, n_workers, ordered):
+    results = list(
+        evfuncs.batch.segment_files(cbins, n_workers=n_workers, chunksize=3,
+                                    ordered=ordered, params_from_notmat=True)
+    )
+    assert len(results) == len(cbins)
+    if ordered:
+        assert [result['cbin'] for result in results] == cbins
+    results = {result['cbin']: result for result in results}
+    for cbin in cbins:
+        result = results[cbin]
+        assert result['error'] is None
+        dat, fs = evfuncs.load_cbin(cbin)
+        nmd = evfuncs.load_notmat(cbin)
+        smooth = evfuncs.smooth_data(dat, fs, smooth_win=nmd['sm_win'])
+        onsets, offsets = evfuncs.segment_song(smooth, fs, nmd['threshold'],
+                                               nmd['min_dur'] / 1000, nmd['min_int'] / 1000)
+        assert np.array_equal(result['onsets'], onsets)
+        assert np.array_equal(result['offsets'], offsets)
+
+
+def test_segment_files_captures_errors(cbins, tmp_path):
+    bad_cbin = tmp_path / 'bad.cbin'
+    bad_cbin.write_bytes(b'\x00' * 64)  # no .rec file
+    results = list(evfuncs.batch.segment_files([bad_cbin] + cbins[:2], n_workers=2, chunksize=1))
+    assert results[0]['error'] is not None
+    assert all(result['error'] is None for result in results[1:])
+
+
+def test_cli_segment(gy6or6_032312_subset_root, cbins, tmp_path):
+    output = tmp_path / 'segments.csv'
+    returncode = evfuncs.cli.main(
+        ['segment', str(gy6or6_032312_subset_root), '-o', str(output),
+         '--workers', '2', '--params-from-notmat']
+    )
+    assert returncode == 0
+    with output.open() as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert set(row['cbin'] for row in rows) == set(str(cbin) for cbin in cbins)
+
+
+def test_segment_files_single_file(cbins):
+    for cbin in (cbins[0], str(cbins[0])):
+        results = list(evfuncs.batch.segment_files(cbin, n_workers=0))
+        assert len(results) == 1
+        assert results[0]['cbin'] == cbins[0]
+        assert results[0]['error'] is None
+
+
+def test_cli_segment_single_file(cbins, tmp_path):
+    output = tmp_path / 'segments.csv'
+    returncode = evfuncs.cli.main(
+        ['segment', str(cbins[0]), '-o', str(output), '--workers', '0', '--params-from-notmat']
+    )
+    assert returncode == 0
+    with output.open() as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert len(rows) > 0
+    assert set(row['cbin'] for row in rows) == {str(cbins[0])}
+
+
+def test_segment_files_envelope_cache(cbins, tmp_path):
+    envelope_cache = evfuncs.cache.EnvelopeCache(tmp_path / 'envelopes')
+    for _ in range(2):
+        results = list(evfuncs.batch.segment_files(cbins[:3], n_workers=0, envelope_cache=envelope_cache))
+        for cbin, result in zip(cbins, results):
+            assert result['error'] is None
+            dat, fs = evfuncs.load_cbin(cbin)
+            onsets, offsets = evfuncs.segment_song(evfuncs.smooth_data(dat, fs), fs)
+            assert np.array_equal(result['onsets'], onsets)
+    assert envelope_cache.misses == 3
+    assert envelope_cache.hits == 3
@@ -0,0 +1,110 @@
+"""
+test cache module
+"""
+import os
+import time
+
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.cache
+
+
+def test_rec_cache(rec_files, tmp_path):
+    cache_path = tmp_path / 'rec_cache.json'
+    with evfuncs.cache.RecCache(cache_path) as rec_cache:
+        for rec_file in rec_files:
+            assert rec_cache.readrecf(rec_file) == evfuncs.readrecf(rec_file)
+        assert rec_cache.misses == len(rec_files)
+        assert rec_cache.hits == 0
+    assert cache_path.exists()
+
+    rec_cache = evfuncs.cache.RecCache(cache_path)
+    assert len(rec_cache) == len(rec_files)
+    for rec_file in rec_files:
+        assert rec_cache.readrecf(rec_file) == evfuncs.readrecf(rec_file)
+    assert rec_cache.hits == len(rec_files)
+    assert rec_cache.misses == 0
+
+
+def test_rec_cache_file_changed(rec_files, tmp_path):
+    rec_file = tmp_path / rec_files[0].name
+    rec_file.write_text(rec_files[0].read_text())
+    rec_cache = evfuncs.cache.RecCache(tmp_path / 'rec_cache.json')
+    rec_cache.readrecf(rec_file)
+    rec_file.write_text(rec_files[0].read_text().replace('Samples = 393769', 'Samples = 42'))
+    stat = rec_file.stat()
+    os.utime(rec_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rec_dict = rec_cache.readrecf(rec_file)
+    assert rec_dict['num_samples'] == 42
+    assert rec_cache.misses == 2
+
+
+def test_rec_cache_save_concurrent(rec_files, tmp_path):
+    # a temporary file left by another process saving the same cache doesn't block saving
+    cache_path = tmp_path / 'rec_cache.json'
+    (tmp_path / 'rec_cache.json.tmp').mkdir()
+    with evfuncs.cache.RecCache(cache_path) as rec_cache:
+        rec_cache.readrecf(rec_files[0])
+    assert len(evfuncs.cache.RecCache(cache_path)) == 1
+    assert not list(tmp_path.glob(f'rec_cache.json.{os.getpid()}.tmp'))
+
+
+def test_envelope_cache(cbins, tmp_path):
+    envelope_cache = evfuncs.cache.EnvelopeCache(tmp_path / 'envelopes')
+    for _ in range(2):
+        for cbin in cbins[:2]:
+            smooth, samp_freq = envelope_cache.smooth_data(cbin)
+            dat, fs = evfuncs.load_cbin(cbin)
+            assert samp_freq == fs
+            assert np.array_equal(smooth, evfuncs.smooth_data(dat, fs))
+    assert envelope_cache.misses == 2
+    assert envelope_cache.hits == 2
+    assert len(envelope_cache) == 2
+
+    # different parameters are a different entry
+    envelope_cache.smooth_data(cbins[0], smooth_win=4)
+    assert envelope_cache.misses == 3
+    envelope_cache.clear()
+    assert len(envelope_cache) == 0
+
+
+@pytest.mark.parametrize(
+    'dtype, compress, key',
+    [
+        ('float32', False, 'stat'),
+        ('float64', True, 'content'),
+    ]
+)
+def test_envelope_cache_options(cbins, tmp_path, dtype, compress, key):
+    envelope_cache = evfuncs.cache.EnvelopeCache(tmp_path / 'envelopes', dtype=dtype,
+                                                 compress=compress, key=key)
+    smooth, samp_freq = envelope_cache.smooth_data(cbins[0])
+    smooth_cached, _ = envelope_cache.smooth_data(cbins[0])
+    assert envelope_cache.hits == 1
+    assert smooth.dtype == smooth_cached.dtype == np.dtype(dtype)
+    assert np.array_equal(smooth, smooth_cached)
+    dat, fs = evfuncs.load_cbin(cbins[0])
+    assert np.allclose(smooth_cached, evfuncs.smooth_data(dat, fs), rtol=1e-4)
+
+
+def test_envelope_cache_evicts_least_recently_used(cbins, tmp_path):
+    envelope_cache = evfuncs.cache.EnvelopeCache(tmp_path / 'envelopes')
+    envelope_cache.smooth_data(cbins[0])
+    entry_bytes = envelope_cache.total_bytes
+    envelope_cache.max_bytes = int(2.5 * entry_bytes)
+    envelope_cache.smooth_data(cbins[1])
+    # use first file again, so second file is least recently used
+    past = time.time() - 10
+    for path in (tmp_path / 'envelopes').iterdir():
+        os.utime(path, (past, past))
+    envelope_cache.smooth_data(cbins[0])
+    envelope_cache.smooth_data(cbins[2])
+    assert len(envelope_cache) == 2
+    assert envelope_cache.total_bytes <= envelope_cache.max_bytes
+    hits = envelope_cache.hits
+    envelope_cache.smooth_data(cbins[0])
+    assert envelope_cache.hits == hits + 1
+    envelope_cache.smooth_data(cbins[1])
+    assert envelope_cache.hits == hits + 1  # was evicted
@@ -0,0 +1,52 @@
+"""
+test clips module
+"""
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.clips
+
+
+def test_iter_syllable_clips(gy6or6_032312_subset_root, cbins):
+    clips = list(evfuncs.clips.iter_syllable_clips(gy6or6_032312_subset_root))
+    n_syls = sum(
+        len(evfuncs.load_notmat(cbin)['labels']) for cbin in cbins
+    )
+    assert len(clips) == n_syls
+    for clip in clips[:10]:
+        assert isinstance(clip, evfuncs.clips.SyllableClip)
+        dat, fs = evfuncs.load_cbin(clip.cbin)
+        start = int(round(clip.onset / 1000 * fs))
+        stop = int(round(clip.offset / 1000 * fs))
+        assert np.array_equal(clip.audio, dat[start:stop])
+
+
+def test_extract_syllable_clips(cbins):
+    clips_dict = evfuncs.clips.extract_syllable_clips(cbins)
+    clips = list(evfuncs.clips.iter_syllable_clips(cbins))
+    offs = clips_dict['clip_offsets']
+    assert offs.shape[0] == len(clips) + 1
+    assert clips_dict['audio'].shape[0] == offs[-1]
+    for ind, clip in enumerate(clips):
+        assert np.array_equal(clips_dict['audio'][offs[ind]:offs[ind + 1]], clip.audio)
+        assert clips_dict['labels'][ind] == clip.label
+        assert clips_dict['onsets'][ind] == clip.onset
+        assert clips_dict['cbins'][clips_dict['file_index'][ind]] == clip.cbin
+
+
+def test_extract_syllable_clips_many_files(cbins):
+    # memory-mapping every file at once would run out of file descriptors
+    pytest.importorskip('resource')  # only on Unix
+    code = (
+        "import resource, sys\n"
+        "import evfuncs.clips\n"
+        "soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)\n"
+        "resource.setrlimit(resource.RLIMIT_NOFILE, (64, hard))\n"
+        "clips_dict = evfuncs.clips.extract_syllable_clips([sys.argv[1]] * 200)\n"
+        "assert len(clips_dict['cbins']) == 200\n"
+    )
+    subprocess.run([sys.executable, '-c', code, str(cbins[0])], check=True)
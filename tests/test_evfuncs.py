@@ -1,12 +1,30 @@
 """
 test evfuncs module
 """
+import subprocess
+import sys
+
 import numpy as np
+import pytest
 from scipy.io import loadmat
 
 import evfuncs
 
 
+def test_import_does_not_import_scipy(rec_files, cbins):
+    # run in a new interpreter, since scipy is already imported by tests
+    code = (
+        "import sys\n"
+        "import evfuncs\n"
+        f"evfuncs.readrecf({str(rec_files[0])!r})\n"
+        f"evfuncs.load_cbin({str(cbins[0])!r})\n"
+        f"evfuncs.load_notmat({str(cbins[0])!r}, reader='fast')\n"
+        "print(any(name == 'scipy' or name.startswith('scipy.') for name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+
+
 def test_readrecf(rec_files):
     for rec_file in rec_files:
         rec_dict = evfuncs.readrecf(rec_file)
@@ -33,6 +51,14 @@ def test_readrecf(rec_files):
         assert type(rec_dict['feedback_info']) == dict
 
 
+def test_readrecf_crlf(rec_files, tmp_path):
+    # .rec files written on Windows have \r\n line endings
+    for rec_file in rec_files:
+        rec_file_crlf = tmp_path / rec_file.name
+        rec_file_crlf.write_bytes(rec_file.read_bytes().replace(b'\r\n', b'\n').replace(b'\n', b'\r\n'))
+        assert evfuncs.readrecf(rec_file_crlf) == evfuncs.readrecf(rec_file)
+
+
 def test_load_cbin(cbins):
     for cbin in cbins:
         dat, fs = evfuncs.load_cbin(cbin)
@@ -41,6 +67,79 @@ def test_load_cbin(cbins):
         assert type(fs) == int
 
 
+def test_load_cbin_mmap(cbins):
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        dat_mmap, fs_mmap = evfuncs.load_cbin(cbin, mmap=True)
+        assert isinstance(dat_mmap, np.memmap)
+        assert not dat_mmap.flags.writeable
+        assert dat_mmap.dtype == '>i2'
+        assert fs_mmap == fs
+        assert np.array_equal(dat_mmap, dat)
+        assert np.array_equal(np.array(dat_mmap[1000:2000]), dat[1000:2000])
+
+
+def test_load_cbin_start_stop(cbins):
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        for mmap in (False, True):
+            dat_seg, fs_seg = evfuncs.load_cbin(cbin, mmap=mmap, start=1000, stop=2000)
+            assert fs_seg == fs
+            assert np.array_equal(dat_seg, dat[1000:2000])
+            dat_seg_s, _ = evfuncs.load_cbin(cbin, mmap=mmap, start=1000 / fs, stop=2000 / fs, units='s')
+            assert np.array_equal(dat_seg_s, dat_seg)
+
+
+def test_load_cbin_multiple_channels(cbins):
+    for cbin in cbins:
+        dat0, _ = evfuncs.load_cbin(cbin, channel=0)
+        dat1, _ = evfuncs.load_cbin(cbin, channel=1)
+        dat, _ = evfuncs.load_cbin(cbin, channel=[0, 1], start=500)
+        assert dat.shape == (2, dat0.shape[0] - 500)
+        assert np.array_equal(dat[0], dat0[500:])
+        assert np.array_equal(dat[1], dat1[500:])
+
+
+@pytest.mark.parametrize(
+    'dtype',
+    [
+        'int16',
+        'float32',
+        'float64',
+        '>i2',
+    ]
+)
+def test_load_cbin_dtype(cbins, dtype):
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        dat_dtype, fs_dtype = evfuncs.load_cbin(cbin, dtype=dtype)
+        assert dat_dtype.dtype == np.dtype(dtype)
+        assert fs_dtype == fs
+        assert np.array_equal(dat_dtype, dat)
+        dat_2ch, _ = evfuncs.load_cbin(cbin, channel=[0, 1], dtype=dtype, start=100)
+        assert dat_2ch.dtype == np.dtype(dtype)
+        assert np.array_equal(dat_2ch, evfuncs.load_cbin(cbin, channel=[0, 1], start=100)[0])
+
+
+def test_load_cbin_scale_and_out(cbins):
+    out = np.zeros((max(cbin.stat().st_size for cbin in cbins) // 4,), dtype=np.float32)
+    for cbin in cbins:
+        dat, _ = evfuncs.load_cbin(cbin)
+        dat_scaled, _ = evfuncs.load_cbin(cbin, dtype='float32', scale=1 / 32768)
+        assert np.allclose(dat_scaled, dat / 32768)
+        dat_out, _ = evfuncs.load_cbin(cbin, out=out)
+        assert np.shares_memory(dat_out, out)
+        assert dat_out.dtype == np.float32
+        assert np.array_equal(dat_out, dat)
+
+    with pytest.raises(ValueError):
+        evfuncs.load_cbin(cbins[0], dtype='int16', scale=2.)
+    with pytest.raises(ValueError):
+        evfuncs.load_cbin(cbins[0], dtype='float32', mmap=True)
+    with pytest.raises(ValueError):
+        evfuncs.load_cbin(cbins[0], out=np.zeros((10,)))
+
+
 def test_load_notmat(notmats):
     for notmat in notmats:
         notmat_dict = evfuncs.load_notmat(notmat)
@@ -67,6 +166,49 @@ def test_load_notmat(notmats):
         assert type(notmat_dict['sm_win']) == int
 
 
+def test_load_notmat_fast_reader(notmats, notmat_with_single_annotated_segment):
+    for notmat in notmats + [notmat_with_single_annotated_segment]:
+        notmat_dict = evfuncs.load_notmat(notmat)
+        notmat_dict_fast = evfuncs.load_notmat(notmat, reader='fast')
+        assert set(notmat_dict_fast.keys()) == set(evfuncs.evfuncs.NOTMAT_VARIABLES)
+        for key, value in notmat_dict_fast.items():
+            assert type(value) == type(notmat_dict[key])
+            if isinstance(value, np.ndarray):
+                assert value.dtype == notmat_dict[key].dtype
+                assert np.array_equal(value, notmat_dict[key])
+            else:
+                assert value == notmat_dict[key]
+
+
+def test_load_notmat_fast_reader_unsupported(notmats, tmp_path):
+    notmat_bytes = notmats[0].read_bytes()
+    notmat = tmp_path / notmats[0].name
+
+    # version 7.3 MAT-files are HDF5 files, with version 0x0200 in the header
+    notmat.write_bytes(notmat_bytes[:124] + b'\x00\x02' + notmat_bytes[126:])
+    with pytest.raises(evfuncs._matv5.UnsupportedMatFileError):
+        evfuncs._matv5.loadmat(notmat, evfuncs.evfuncs.NOTMAT_VARIABLES)
+
+    for n_bytes in (200, 300, 131, len(notmat_bytes) // 2, len(notmat_bytes) - 10):
+        notmat.write_bytes(notmat_bytes[:n_bytes])
+        with pytest.raises(evfuncs._matv5.UnsupportedMatFileError):
+            evfuncs._matv5.loadmat(notmat, evfuncs.evfuncs.NOTMAT_VARIABLES)
+        # falls back to scipy, so raises the same error as the scipy reader
+        with pytest.raises(Exception) as scipy_error:
+            evfuncs.load_notmat(notmat, reader='scipy')
+        with pytest.raises(scipy_error.type):
+            evfuncs.load_notmat(notmat, reader='fast')
+
+
+def test_load_notmat_variables(notmats):
+    variables = ['labels', 'onsets', 'offsets']
+    for notmat in notmats:
+        for reader in ('scipy', 'fast'):
+            notmat_dict = evfuncs.load_notmat(notmat, reader=reader, variables=variables)
+            assert all(variable in notmat_dict for variable in variables)
+            assert 'threshold' not in notmat_dict
+
+
 def test_load_notmat_single_annotated_segment(notmat_with_single_annotated_segment):
     notmat_dict = evfuncs.load_notmat(notmat_with_single_annotated_segment)
     assert type(notmat_dict) is dict
@@ -92,22 +234,71 @@ def test_load_notmat_single_annotated_segment(notmat_with_single_annotated_segme
     assert type(notmat_dict['sm_win']) == int
 
 
-def test_bandpass_filtfilt_works(cbins, filtsong_mat_files):
+@pytest.mark.parametrize(
+    'method',
+    [
+        'filtfilt',
+        'fft',
+        'oa',
+    ]
+)
+def test_bandpass_filtfilt_works(cbins, filtsong_mat_files, method):
     for cbin, filtsong_mat_file in zip(cbins, filtsong_mat_files):
         dat, fs = evfuncs.load_cbin(cbin)
-        filtsong = evfuncs.bandpass_filtfilt(dat, fs)
+        filtsong = evfuncs.bandpass_filtfilt(dat, fs, method=method)
         assert type(filtsong) == np.ndarray
         filtsong_mat = loadmat(filtsong_mat_file)
         filtsong_mat = np.squeeze(filtsong_mat['filtsong'])
         assert np.allclose(filtsong, filtsong_mat)
 
 
-def test_smooth_data(cbins, smooth_data_mat_files):
+@pytest.mark.parametrize(
+    'method',
+    [
+        'fft',
+        'oa',
+    ]
+)
+def test_bandpass_filtfilt_methods_2d(cbins, method):
+    dat0, fs = evfuncs.load_cbin(cbins[0])
+    dat1, _ = evfuncs.load_cbin(cbins[0], channel=1)
+    dat = np.stack((dat0, dat1))
+    filtsong = evfuncs.bandpass_filtfilt(dat, fs, method=method)
+    assert filtsong.shape == dat.shape
+    assert np.allclose(filtsong, evfuncs.bandpass_filtfilt(dat, fs))
+
+
+def test_bandpass_filtfilt_cache(cbins):
+    evfuncs.bandpass_filter_cache_clear()
+    cache_info = evfuncs.bandpass_filter_cache_info()
+    assert cache_info.hits == 0 and cache_info.misses == 0 and cache_info.currsize == 0
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        evfuncs.bandpass_filtfilt(dat, fs, freq_cutoffs=[500, 10000])
+    cache_info = evfuncs.bandpass_filter_cache_info()
+    # all files have same sampling rate and are long enough to use same number of taps
+    assert cache_info.misses == 1
+    assert cache_info.hits == len(cbins) - 1
+    assert cache_info.currsize == 1
+    evfuncs.bandpass_filter_cache_clear()
+    assert evfuncs.bandpass_filter_cache_info().currsize == 0
+
+
+@pytest.mark.parametrize(
+    'filter_method',
+    [
+        'filtfilt',
+        'fft',
+        'oa',
+    ]
+)
+def test_smooth_data(cbins, smooth_data_mat_files, filter_method):
     for cbin, smooth_data_mat_file in zip(cbins, smooth_data_mat_files):
         dat, fs = evfuncs.load_cbin(cbin)
         smoothed = evfuncs.smooth_data(dat, fs, freq_cutoffs=None)
         smoothed_500_10k = evfuncs.smooth_data(dat, fs,
-                                               freq_cutoffs=(500, 10000))
+                                               freq_cutoffs=(500, 10000),
+                                               filter_method=filter_method)
         assert type(smoothed) == np.ndarray
         assert type(smoothed_500_10k) == np.ndarray
         assert not np.all(np.equal(smoothed, smoothed_500_10k))
@@ -116,6 +307,45 @@ def test_smooth_data(cbins, smooth_data_mat_files):
         assert np.allclose(smoothed_500_10k, smooth_data_mat)
 
 
+@pytest.mark.parametrize(
+    'smooth_method, dtype',
+    [
+        ('convolve', 'float32'),
+        ('running', None),
+        ('running', 'float32'),
+    ]
+)
+def test_smooth_data_smooth_method_dtype(cbins, smooth_data_mat_files, smooth_method, dtype):
+    for cbin, smooth_data_mat_file in zip(cbins, smooth_data_mat_files):
+        dat, fs = evfuncs.load_cbin(cbin)
+        smoothed = evfuncs.smooth_data(dat, fs, filter_method='fft',
+                                       smooth_method=smooth_method, dtype=dtype)
+        if dtype is None:
+            assert smoothed.dtype == np.float64
+            rtol = 1e-05  # numpy default
+        else:
+            assert smoothed.dtype == dtype
+            rtol = 1e-04  # single precision
+        smooth_data_mat = loadmat(smooth_data_mat_file)
+        smooth_data_mat = np.squeeze(smooth_data_mat['sm'])
+        assert np.allclose(smoothed, smooth_data_mat, rtol=rtol)
+
+
+@pytest.mark.parametrize(
+    'smooth_method',
+    [
+        'convolve',
+        'running',
+    ]
+)
+def test_smooth_data_2d(cbins, smooth_method):
+    dat, fs = evfuncs.load_cbin(cbins[0], channel=[0, 1])
+    smoothed = evfuncs.smooth_data(dat, fs, smooth_method=smooth_method)
+    assert smoothed.shape == dat.shape
+    for row in range(dat.shape[0]):
+        assert np.allclose(smoothed[row], evfuncs.smooth_data(dat[row], fs))
+
+
 def test_segment_song(cbins, notmats, segment_mats):
     for cbin, notmat, segment_mat in zip(cbins, notmats, segment_mats):
         dat, fs = evfuncs.load_cbin(cbin)
@@ -139,3 +369,67 @@ def test_segment_song(cbins, notmats, segment_mats):
         # i.e., 0.0005 + 0.00001 * some_onsets_or_offset_array ~ [0.0005, 0.0005, ...]
         assert np.allclose(onsets, onsets_mat, rtol, atol)
         assert np.allclose(offsets, offsets_mat, rtol, atol)
+
+
+def test_segment_song_return_Hz(cbins, notmats, segment_mats):
+    for cbin, notmat, segment_mat in zip(cbins, notmats, segment_mats):
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        nmd = evfuncs.load_notmat(notmat)
+        min_syl_dur = nmd['min_dur'] / 1000
+        min_silent_dur = nmd['min_int'] / 1000
+        threshold = nmd['threshold']
+        onsets, offsets, onsets_Hz, offsets_Hz = evfuncs.segment_song(
+            smooth, fs, threshold, min_syl_dur, min_silent_dur, return_Hz=True
+        )
+        assert np.issubdtype(onsets_Hz.dtype, np.integer)
+        assert np.issubdtype(offsets_Hz.dtype, np.integer)
+        assert np.array_equal(onsets, onsets_Hz / fs)
+        assert np.array_equal(offsets, offsets_Hz / fs)
+        segment_dict = loadmat(segment_mat, squeeze_me=True)
+        assert np.allclose(onsets, segment_dict['onsets'], 0.00001, 0.0005)
+        assert np.allclose(offsets, segment_dict['offsets'], 0.00001, 0.0005)
+
+
+def test_segment_song_durations_in_seconds():
+    # durations are compared in seconds, so that results are the same as SegmentNotes.m:
+    # 64 samples at 32 kHz is exactly 2 ms, but 1064 / 32000 - 1000 / 32000 > 0.002
+    fs = 32000
+    smooth = np.zeros((3000,))
+    smooth[100:1000] = 10000
+    smooth[1064:2000] = 10000
+    onsets, offsets = evfuncs.segment_song(smooth, fs, threshold=5000, min_silent_dur=0.002)
+    assert 1064 / fs - 1000 / fs > 0.002
+    assert np.array_equal(onsets, np.array([100, 1064]) / fs)
+    assert np.array_equal(offsets, np.array([1000, 2000]) / fs)
+
+    assert evfuncs.segment_song(np.zeros((3000,)), fs) == (None, None)
+
+
+def test_segment_song_2d(cbins, notmats):
+    # stack files, truncated to have equal length
+    dats = [evfuncs.load_cbin(cbin)[0] for cbin in cbins]
+    fs = evfuncs.load_cbin(cbins[0])[1]
+    n_samples = min(dat.shape[0] for dat in dats)
+    dat = np.stack([dat[:n_samples] for dat in dats])
+    smooth = evfuncs.smooth_data(dat, fs, filter_method='fft')
+    nmd = evfuncs.load_notmat(notmats[0])
+    min_syl_dur = nmd['min_dur'] / 1000
+    min_silent_dur = nmd['min_int'] / 1000
+    threshold = nmd['threshold']
+    onsets, offsets, rows = evfuncs.segment_song(smooth, fs,
+                                                 threshold, min_syl_dur, min_silent_dur)
+    assert onsets.shape == offsets.shape == rows.shape
+    for row in range(smooth.shape[0]):
+        onsets_row, offsets_row = evfuncs.segment_song(smooth[row], fs,
+                                                       threshold, min_syl_dur, min_silent_dur)
+        assert np.array_equal(onsets[rows == row], onsets_row)
+        assert np.array_equal(offsets[rows == row], offsets_row)
+
+
+def test_segment_song_2d_no_segments():
+    onsets, offsets, rows = evfuncs.segment_song(np.zeros((2, 3000)), 32000)
+    assert onsets.shape == offsets.shape == rows.shape == (0,)
+    onsets, offsets, onsets_Hz, offsets_Hz, rows = evfuncs.segment_song(np.zeros((2, 3000)), 32000,
+                                                                        return_Hz=True)
+    assert onsets_Hz.shape == offsets_Hz.shape == (0,)
@@ -0,0 +1,113 @@
+"""
+test index module
+"""
+import concurrent.futures
+import shutil
+
+import numpy as np
+
+import evfuncs
+import evfuncs.cache
+import evfuncs.index
+
+
+def test_build_index(data_for_tests_root, tmp_path):
+    index_path = tmp_path / 'index.npz'
+    index = evfuncs.index.build_index(data_for_tests_root, index_path)
+    cbins = sorted(data_for_tests_root.rglob('*.cbin'))
+    assert index['cbin'].shape[0] == len(cbins)
+    assert index_path.exists()
+    for ind, cbin_rel in enumerate(index['cbin']):
+        cbin = data_for_tests_root / cbin_rel
+        rec_dict = evfuncs.readrecf(cbin.parent / (cbin.stem + '.rec'))
+        assert index['sample_freq'][ind] == rec_dict['sample_freq']
+        assert index['num_samples'][ind] == rec_dict['num_samples']
+        assert index['num_channels'][ind] == rec_dict['num_channels']
+        assert index['has_notmat'][ind]
+        notmat_dict = evfuncs.load_notmat(cbin)
+        assert index['labels'][ind] == notmat_dict['labels']
+        assert index['threshold'][ind] == notmat_dict['threshold']
+        start, stop = index['segment_offsets'][ind], index['segment_offsets'][ind + 1]
+        assert np.array_equal(index['onsets'][start:stop], notmat_dict['onsets'])
+        assert np.array_equal(index['offsets'][start:stop], notmat_dict['offsets'])
+
+    loaded = evfuncs.index.load_index(index_path)
+    assert loaded.keys() == index.keys()
+    for key in index:
+        assert np.array_equal(loaded[key], index[key])
+
+
+def test_build_index_update(gy6or6_032312_subset_root, tmp_path, monkeypatch):
+    root = tmp_path / 'corpus'
+    shutil.copytree(gy6or6_032312_subset_root, root)
+    index_path = tmp_path / 'index.npz'
+    index = evfuncs.index.build_index(root, index_path)
+
+    # remove one .not.mat, and one .cbin
+    notmat_removed = sorted(root.glob('*.not.mat'))[0]
+    notmat_removed.unlink()
+    cbin_removed = sorted(root.glob('*.cbin'))[-1]
+    cbin_removed.unlink()
+
+    indexed = []
+
+    def _index_file(cbin, *args, **kwargs):
+        indexed.append(cbin)
+        return original_index_file(cbin, *args, **kwargs)
+
+    original_index_file = evfuncs.index._index_file
+    monkeypatch.setattr(evfuncs.index, '_index_file', _index_file)
+    updated = evfuncs.index.build_index(root, index_path)
+    # only the file whose .not.mat changed should be read again
+    assert [cbin.name + '.not.mat' for cbin in indexed] == [notmat_removed.name]
+    assert updated['cbin'].shape[0] == index['cbin'].shape[0] - 1
+    assert not updated['has_notmat'][0]
+    assert updated['segment_offsets'][1] == 0
+    assert np.isnan(updated['threshold'][0])
+    assert np.array_equal(updated['onsets'], index['onsets'][index['segment_offsets'][1]:index['segment_offsets'][-2]])
+
+
+def test_build_index_rec_cache(gy6or6_032312_subset_root, tmp_path):
+    expected = evfuncs.index.build_index(gy6or6_032312_subset_root)
+    n_files = expected['cbin'].shape[0]
+    with evfuncs.cache.RecCache(tmp_path / 'rec_cache.json') as rec_cache:
+        for _ in range(2):
+            index = evfuncs.index.build_index(gy6or6_032312_subset_root, rec_cache=rec_cache)
+            for key in expected:
+                assert np.array_equal(index[key], expected[key])
+        assert rec_cache.misses == n_files
+        assert rec_cache.hits == n_files
+
+
+def _save_index_repeatedly(index, index_path, n_saves=20):
+    for _ in range(n_saves):
+        evfuncs.index.save_index(index, index_path)
+
+
+def test_save_index_concurrent(gy6or6_032312_subset_root, tmp_path):
+    index = evfuncs.index.build_index(gy6or6_032312_subset_root)
+    index_path = tmp_path / 'index.npz'
+    with concurrent.futures.ProcessPoolExecutor(4) as executor:
+        futures = [executor.submit(_save_index_repeatedly, index, index_path) for _ in range(4)]
+        for future in futures:
+            future.result()
+    assert [path.name for path in tmp_path.iterdir()] == ['index.npz']
+    loaded = evfuncs.index.load_index(index_path)
+    for key in index:
+        assert np.array_equal(loaded[key], index[key])
+
+
+def test_build_index_empty_notmat(root_with_empty_notmat):
+    index = evfuncs.index.build_index(root_with_empty_notmat)
+    assert index['labels'].shape == (2,)
+    assert index['labels'][0] == ''
+    assert index['segment_offsets'][1] == 0
+    assert index['has_notmat'].all()
+
+    # only the file with an empty .not.mat
+    second_cbin = sorted(root_with_empty_notmat.glob('*.cbin'))[1]
+    for path in root_with_empty_notmat.glob(second_cbin.stem + '.*'):
+        path.unlink()
+    index = evfuncs.index.build_index(root_with_empty_notmat)
+    assert index['labels'].shape == (1,)
+    assert index['labels'][0] == ''
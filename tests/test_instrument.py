@@ -0,0 +1,76 @@
+"""
+test instrument module
+"""
+import concurrent.futures
+
+import evfuncs
+import evfuncs.instrument
+
+
+def test_collect(cbins):
+    evfuncs.bandpass_filter_cache_clear()
+    assert not evfuncs.instrument.is_enabled()
+    with evfuncs.instrument.collect() as collector:
+        assert evfuncs.instrument.is_enabled()
+        for cbin in cbins:
+            dat, fs = evfuncs.load_cbin(cbin)
+            smooth = evfuncs.smooth_data(dat, fs)
+            evfuncs.segment_song(smooth, fs)
+            evfuncs.load_notmat(cbin)
+    assert not evfuncs.instrument.is_enabled()
+
+    stats = collector.stats
+    n_files = len(cbins)
+    for stage in ('readrecf', 'load_cbin', 'load_notmat', 'bandpass_filtfilt',
+                  'smooth_data', 'segment_song'):
+        assert stats[stage]['calls'] == n_files
+    # filter is only designed once, then cached
+    assert stats['firwin']['calls'] == 1
+    assert stats['load_cbin']['bytes_read'] == sum(cbin.stat().st_size for cbin in cbins)
+    assert stats['load_cbin']['bytes_allocated'] == sum(cbin.stat().st_size for cbin in cbins) // 2
+    assert stats['readrecf']['bytes_read'] == sum(
+        cbin.parent.joinpath(cbin.stem + '.rec').stat().st_size for cbin in cbins
+    )
+    assert stats['load_notmat']['bytes_read'] > 0
+    # time in nested stages is not included in self time
+    assert stats['smooth_data']['self_time'] < stats['smooth_data']['time']
+    assert stats['smooth_data']['time'] >= stats['bandpass_filtfilt']['time']
+    assert 'smooth_data' in collector.report()
+
+
+def test_enable_and_callback(cbins):
+    records = []
+    evfuncs.instrument.reset()
+    evfuncs.instrument.enable()
+    evfuncs.instrument.add_callback(records.append)
+    try:
+        evfuncs.readrecf(cbins[0].parent.joinpath(cbins[0].stem + '.rec'))
+    finally:
+        evfuncs.instrument.remove_callback(records.append)
+        evfuncs.instrument.disable()
+    assert [record.stage for record in records] == ['readrecf']
+    assert evfuncs.instrument.get_stats()['readrecf']['calls'] == 1
+
+    # nothing recorded when disabled
+    evfuncs.readrecf(cbins[0].parent.joinpath(cbins[0].stem + '.rec'))
+    assert len(records) == 1
+    assert evfuncs.instrument.get_stats()['readrecf']['calls'] == 1
+    evfuncs.instrument.reset()
+
+
+def test_collector_add_from_threads():
+    collector = evfuncs.instrument.Collector()
+    record = evfuncs.instrument.CallRecord('load_cbin', 1., 1., 2, 3)
+    n_threads, n_records = 8, 10000
+
+    def add_records():
+        for _ in range(n_records):
+            collector.add(record)
+
+    with concurrent.futures.ThreadPoolExecutor(n_threads) as executor:
+        for future in [executor.submit(add_records) for _ in range(n_threads)]:
+            future.result()
+    stats = collector.stats['load_cbin']
+    assert stats['calls'] == n_threads * n_records
+    assert stats['time'] == n_threads * n_records
+    assert stats['bytes_read'] == 2 * n_threads * n_records
@@ -0,0 +1,61 @@
+"""
+test prefetch module
+"""
+import time
+
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.prefetch
+
+
+@pytest.mark.parametrize(
+    'prefetch',
+    [
+        1,
+        3,
+    ]
+)
+def test_prefetcher(gy6or6_032312_subset_root, cbins, prefetch):
+    with evfuncs.prefetch.Prefetcher(gy6or6_032312_subset_root, prefetch=prefetch) as prefetcher:
+        loaded = list(prefetcher)
+    assert [loaded_file.cbin for loaded_file in loaded] == cbins
+    for loaded_file, cbin in zip(loaded, cbins):
+        audio, sample_freq = evfuncs.load_cbin(cbin)
+        assert np.array_equal(loaded_file.audio, audio)
+        assert loaded_file.sample_freq == sample_freq
+        notmat_dict = evfuncs.load_notmat(cbin)
+        assert loaded_file.notmat['labels'] == notmat_dict['labels']
+        assert np.array_equal(loaded_file.notmat['onsets'], notmat_dict['onsets'])
+
+    stats = prefetcher.stats()
+    assert stats['n_files'] == len(cbins)
+    assert 0 <= stats['n_stalls'] <= len(cbins)
+    assert stats['stall_time'] >= 0
+    assert 0 <= stats['mean_queue_depth'] <= prefetch
+
+
+def test_prefetcher_overlaps_processing(cbins):
+    prefetcher = evfuncs.prefetch.Prefetcher(cbins, prefetch=len(cbins))
+    for _ in prefetcher:
+        time.sleep(0.2)  # "processing" that is slower than reading files
+    # after the first file, every file was already read when it was needed
+    assert prefetcher.n_stalls <= 1
+    assert prefetcher.queue_depth_total > 0
+
+
+def test_prefetcher_single_file(cbins):
+    for cbin in (cbins[0], str(cbins[0])):
+        with evfuncs.prefetch.Prefetcher(cbin) as prefetcher:
+            loaded = list(prefetcher)
+        assert [loaded_file.cbin for loaded_file in loaded] == [cbins[0]]
+
+
+def test_prefetcher_error(tmp_path, cbins):
+    missing = tmp_path / 'missing.cbin'
+    prefetcher = evfuncs.prefetch.Prefetcher([cbins[0], missing], notmat=False)
+    iterator = iter(prefetcher)
+    assert next(iterator).notmat is None
+    with pytest.raises(FileNotFoundError):
+        next(iterator)
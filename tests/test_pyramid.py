@@ -0,0 +1,82 @@
+"""
+test pyramid module
+"""
+import shutil
+
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.pyramid
+
+
+@pytest.mark.parametrize('factor', [2, 16, 37])
+def test_build_pyramid(factor):
+    smooth = np.random.default_rng(0).random(10000) * 10000
+    pyramid = evfuncs.pyramid.build_pyramid(smooth, factor=factor)
+    assert pyramid.maxs[-1].shape == (1,)
+    assert pyramid.maxs[-1][0] == smooth.max()
+    assert pyramid.mins[-1][0] == smooth.min()
+    assert np.isclose(pyramid.means[-1][0], smooth.mean())
+    assert np.array_equal(pyramid.maxs[0], [block.max() for block in np.array_split(
+        smooth, np.arange(factor, smooth.shape[0], factor))])
+
+    mins, maxs, means, block_start, block_size = pyramid.overview(n_points=100, start=1000, stop=5000)
+    assert maxs.shape[0] <= 100
+    assert block_start <= 1000 and block_start + maxs.shape[0] * block_size >= 5000
+
+
+def test_segment_song_pyramid(cbins):
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        for factor in (4, 16):
+            pyramid = evfuncs.pyramid.build_pyramid(smooth, factor=factor, samp_freq=fs)
+            for threshold in (500, 5000, 20000, 10 ** 9):
+                expected = evfuncs.segment_song(smooth, fs, threshold, return_Hz=True)
+                result = evfuncs.segment_song(smooth, fs, threshold, return_Hz=True, pyramid=pyramid)
+                if expected[0] is None:
+                    assert result == (None, None)
+                else:
+                    for expected_arr, result_arr in zip(expected, result):
+                        assert np.array_equal(expected_arr, result_arr)
+
+
+def test_segment_song_pyramid_boundaries():
+    # segments that start and end exactly at block boundaries, and at the ends of the envelope
+    smooth = np.zeros(1003)
+    smooth[:16] = 1.
+    smooth[48:64] = 1.
+    smooth[65:100] = 1.
+    smooth[990:] = 1.
+    pyramid = evfuncs.pyramid.build_pyramid(smooth, factor=16)
+    expected = evfuncs.segment_song(smooth, 1000, 0.5, 0.001, 0.0005, return_Hz=True)
+    result = evfuncs.segment_song(smooth, 1000, 0.5, 0.001, 0.0005, return_Hz=True, pyramid=pyramid)
+    for expected_arr, result_arr in zip(expected, result):
+        assert np.array_equal(expected_arr, result_arr)
+
+    with pytest.raises(ValueError):
+        evfuncs.segment_song(smooth[:-1], 1000, 0.5, pyramid=pyramid)
+
+
+def test_cbin_pyramid(cbins, tmp_path):
+    cbin = tmp_path / cbins[0].name
+    shutil.copy(cbins[0], cbin)
+    shutil.copy(cbins[0].with_suffix('.rec'), cbin.with_suffix('.rec'))
+
+    pyramid = evfuncs.pyramid.cbin_pyramid(cbin)
+    path = evfuncs.pyramid.pyramid_path(cbin)
+    assert path.exists()
+    loaded = evfuncs.pyramid.EnvelopePyramid.load(path)
+    assert loaded.n_levels == pyramid.n_levels
+    assert loaded.samp_freq == pyramid.samp_freq
+    for level in range(pyramid.n_levels):
+        assert np.array_equal(loaded.maxs[level], pyramid.maxs[level])
+        assert np.array_equal(loaded.means[level], pyramid.means[level])
+
+    # saved pyramid is used, unless parameters are different
+    mtime_ns = path.stat().st_mtime_ns
+    evfuncs.pyramid.cbin_pyramid(cbin)
+    assert path.stat().st_mtime_ns == mtime_ns
+    other = evfuncs.pyramid.cbin_pyramid(cbin, smooth_win=4)
+    assert other.attrs['smooth_win'] == 4
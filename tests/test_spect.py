@@ -0,0 +1,68 @@
+"""
+test spect module
+"""
+import numpy as np
+import pytest
+import scipy.signal
+
+import evfuncs
+import evfuncs.spect
+
+
+@pytest.mark.parametrize(
+    'output, dtype, kwargs',
+    [
+        ('padded', 'float64', {}),
+        ('ragged', 'float64', {}),
+        ('padded', 'float32', {}),
+        ('ragged', 'float64', dict(nperseg=255, noverlap=128, scaling='spectrum', detrend=False)),
+    ]
+)
+def test_syllable_spectrograms(cbins, notmats, output, dtype, kwargs):
+    for cbin, notmat in zip(cbins, notmats):
+        dat, fs = evfuncs.load_cbin(cbin)
+        notmat_dict = evfuncs.load_notmat(notmat)
+        spects_dict = evfuncs.spect.syllable_spectrograms(
+            dat, fs, notmat_dict['onsets'], notmat_dict['offsets'], units='ms',
+            output=output, dtype=dtype, **kwargs
+        )
+        spects = spects_dict['spects']
+        assert spects.dtype == dtype
+        frame_offsets = spects_dict['frame_offsets']
+        for ind, (start, stop) in enumerate(zip(spects_dict['starts'], spects_dict['stops'])):
+            freqs, times, expected = scipy.signal.spectrogram(
+                dat[start:stop].astype(np.float64), fs, window='hann',
+                nperseg=kwargs.get('nperseg', 512), noverlap=kwargs.get('noverlap'),
+                scaling=kwargs.get('scaling', 'density'), detrend=kwargs.get('detrend', 'constant'),
+            )
+            if output == 'padded':
+                spect = spects[ind]
+                assert np.all(spect[:, spects_dict['n_frames'][ind]:] == 0)
+                spect = spect[:, :spects_dict['n_frames'][ind]]
+            else:
+                spect = spects[:, frame_offsets[ind]:frame_offsets[ind + 1]]
+            assert spect.shape == expected.shape
+            rtol = 1e-5 if dtype == 'float32' else 1e-10
+            assert np.allclose(spect, expected, rtol=rtol, atol=rtol * expected.max())
+            assert np.allclose(spects_dict['freqs'], freqs)
+            assert np.allclose(spects_dict['times'][:times.shape[0]], times)
+
+
+def test_syllable_spectrograms_short():
+    rawsong = np.random.default_rng(0).standard_normal(3000)
+    onsets = np.array([0, 1000, 1500, 2900])
+    offsets = np.array([1000, 1100, 1500, 3000])
+    spects_dict = evfuncs.spect.syllable_spectrograms(rawsong, 32000, onsets, offsets, units='samples',
+                                                      nperseg=256, output='ragged')
+    # syllables shorter than nperseg get one frame, empty syllables get none
+    assert np.array_equal(spects_dict['n_frames'], [4, 1, 0, 1])
+    assert spects_dict['spects'].shape == (129, 6)
+
+    # short syllable is detrended, then padded with zeros
+    samples = rawsong[1000:1100] - rawsong[1000:1100].mean()
+    _, _, expected = scipy.signal.spectrogram(np.pad(samples, (0, 156)), 32000, window='hann',
+                                              nperseg=256, detrend=False)
+    assert np.allclose(spects_dict['spects'][:, 4:5], expected)
+
+    with pytest.raises(ValueError):
+        evfuncs.spect.syllable_spectrograms(rawsong, 32000, onsets, offsets, units='Hz')
@@ -0,0 +1,64 @@
+"""
+test store module
+"""
+import numpy as np
+
+import evfuncs
+import evfuncs.cli
+import evfuncs.store
+
+
+def test_convert(gy6or6_032312_subset_root, cbins, tmp_path):
+    store_path = tmp_path / 'gy6or6.evstore'
+    names = evfuncs.store.convert(gy6or6_032312_subset_root, store_path)
+    assert names == [cbin.name for cbin in cbins]
+
+    with evfuncs.store.CbinStore(store_path) as store:
+        assert store.names == names
+        for name, cbin in zip(store.names, cbins):
+            for channel in (0, 1):
+                dat, fs = evfuncs.load_cbin(cbin, channel=channel)
+                dat_store, fs_store = store.load_cbin(name, channel=channel)
+                assert dat_store.dtype == np.int16
+                assert dat_store.dtype.isnative
+                assert np.array_equal(dat_store, dat)
+                assert fs_store == fs
+            dat, _ = evfuncs.load_cbin(cbin, channel=[0, 1], start=100, stop=200)
+            assert np.array_equal(store.load_cbin(name, channel=[0, 1], start=100, stop=200)[0], dat)
+
+            assert store.readrecf(name) == evfuncs.readrecf(cbin.parent / (cbin.stem + '.rec'))
+
+            notmat_dict = evfuncs.load_notmat(cbin, reader='fast')
+            notmat_dict_store = store.load_notmat(name)
+            assert notmat_dict_store.keys() == notmat_dict.keys()
+            for key, value in notmat_dict.items():
+                assert type(notmat_dict_store[key]) == type(value)
+                assert np.array_equal(notmat_dict_store[key], value)
+
+
+def test_cli_convert(gy6or6_032312_subset_root, cbins, tmp_path):
+    store_path = tmp_path / 'gy6or6.evstore'
+    returncode = evfuncs.cli.main(
+        ['convert', str(gy6or6_032312_subset_root), '-o', str(store_path)]
+    )
+    assert returncode == 0
+    with evfuncs.store.CbinStore(store_path) as store:
+        assert len(store) == len(cbins)
+
+
+def test_convert_single_file(cbins, tmp_path):
+    store_path = tmp_path / 'gy6or6.evstore'
+    for cbin in (cbins[0], str(cbins[0])):
+        names = evfuncs.store.convert(cbin, store_path)
+        assert names == [cbins[0].name]
+        with evfuncs.store.CbinStore(store_path) as store:
+            dat, fs = evfuncs.load_cbin(cbins[0])
+            assert np.array_equal(store.load_cbin(names[0])[0], dat)
+
+
+def test_cli_convert_single_file(cbins, tmp_path):
+    store_path = tmp_path / 'gy6or6.evstore'
+    returncode = evfuncs.cli.main(['convert', str(cbins[0]), '-o', str(store_path)])
+    assert returncode == 0
+    with evfuncs.store.CbinStore(store_path) as store:
+        assert store.names == [cbins[0].name]
@@ -0,0 +1,87 @@
+"""
+test stream module
+"""
+import numpy as np
+import pytest
+
+import evfuncs
+import evfuncs.stream
+
+
+@pytest.mark.parametrize(
+    'blocksize',
+    [
+        1000,
+        2 ** 16,
+    ]
+)
+def test_smooth_data_stream(cbins, blocksize):
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        blocks = evfuncs.stream.iter_cbin_blocks(cbin, blocksize)
+        smooth_stream = np.concatenate(
+            list(evfuncs.stream.smooth_data_stream(blocks, fs))
+        )
+        assert smooth_stream.shape == smooth.shape
+        assert np.allclose(smooth_stream, smooth)
+
+
+@pytest.mark.parametrize(
+    'blocksize',
+    [
+        333,
+        2 ** 16,
+    ]
+)
+def test_segment_song_stream(cbins, notmats, blocksize):
+    for cbin, notmat in zip(cbins, notmats):
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        nmd = evfuncs.load_notmat(notmat)
+        min_syl_dur = nmd['min_dur'] / 1000
+        min_silent_dur = nmd['min_int'] / 1000
+        threshold = nmd['threshold']
+        onsets, offsets = evfuncs.segment_song(smooth, fs,
+                                               threshold, min_syl_dur, min_silent_dur)
+        smooth_blocks = (smooth[ind:ind + blocksize] for ind in range(0, smooth.shape[0], blocksize))
+        segments = np.array(
+            list(evfuncs.stream.segment_song_stream(smooth_blocks, fs,
+                                                    threshold, min_syl_dur, min_silent_dur))
+        )
+        assert np.array_equal(segments[:, 0], onsets)
+        assert np.array_equal(segments[:, 1], offsets)
+
+
+@pytest.mark.parametrize(
+    'blocksize',
+    [
+        1024,
+        2 ** 16,
+    ]
+)
+def test_segmenter(cbins, notmats, blocksize):
+    for cbin, notmat in zip(cbins, notmats):
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        nmd = evfuncs.load_notmat(notmat)
+        min_syl_dur = nmd['min_dur'] / 1000
+        min_silent_dur = nmd['min_int'] / 1000
+        threshold = nmd['threshold']
+        onsets, offsets = evfuncs.segment_song(smooth, fs,
+                                               threshold, min_syl_dur, min_silent_dur)
+
+        segmenter = evfuncs.stream.Segmenter(fs, threshold, min_syl_dur, min_silent_dur, raw=True)
+        # use segmenter twice, to test that flush resets state
+        for _ in range(2):
+            segments = []
+            for block in evfuncs.stream.iter_cbin_blocks(cbin, blocksize):
+                new_segments = segmenter.push(block)
+                # every segment is returned soon after its offset
+                for onset, offset in new_segments:
+                    assert segmenter.n_samples / fs - offset < min_silent_dur + 2 * blocksize / fs
+                segments.extend(new_segments)
+            segments.extend(segmenter.flush())
+            segments = np.array(segments)
+            assert np.array_equal(segments[:, 0], onsets)
+            assert np.array_equal(segments[:, 1], offsets)
@@ -0,0 +1,93 @@
+"""
+test sweep module
+"""
+import numpy as np
+
+import evfuncs
+import evfuncs.sweep
+
+
+THRESHOLDS = [500, 3000, 5000, 20000]
+MIN_SYL_DURS = [0.005, 0.02]
+MIN_SILENT_DURS = [0.002, 0.01]
+
+
+def test_segment_song_sweep(cbins):
+    for cbin in cbins:
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        sweep = evfuncs.sweep.segment_song_sweep(smooth, fs, THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS)
+        assert sweep['n_segments'].shape == (len(THRESHOLDS), len(MIN_SYL_DURS), len(MIN_SILENT_DURS))
+        for i, threshold in enumerate(THRESHOLDS):
+            for j, min_syl_dur in enumerate(MIN_SYL_DURS):
+                for k, min_silent_dur in enumerate(MIN_SILENT_DURS):
+                    onsets, offsets = evfuncs.segment_song(smooth, fs, threshold, min_syl_dur, min_silent_dur)
+                    if onsets is None:
+                        onsets, offsets = np.array([]), np.array([])
+                    onsets_sweep, offsets_sweep = sweep['segments'][(threshold, min_syl_dur, min_silent_dur)]
+                    assert np.array_equal(onsets_sweep, onsets)
+                    assert np.array_equal(offsets_sweep, offsets)
+                    assert sweep['n_segments'][i, j, k] == onsets.shape[0]
+
+
+def test_score_segments():
+    ref_onsets = np.array([0.1, 0.5, 1.0])
+    ref_offsets = np.array([0.2, 0.7, 1.3])
+    scores = evfuncs.sweep.score_segments(ref_onsets, ref_offsets, ref_onsets, ref_offsets)
+    assert scores['n_hits'] == 3
+    assert scores['f1'] == 1.0
+
+    # second segment has offset outside tolerance, and there's an extra segment
+    onsets = np.array([0.105, 0.5, 0.8, 1.0])
+    offsets = np.array([0.2, 0.75, 0.9, 1.295])
+    scores = evfuncs.sweep.score_segments(onsets, offsets, ref_onsets, ref_offsets, tolerance=0.01)
+    assert scores['n_hits'] == 2
+    assert scores['precision'] == 2 / 4
+    assert scores['recall'] == 2 / 3
+
+    scores = evfuncs.sweep.score_segments(None, None, ref_onsets, ref_offsets)
+    assert scores['n_hits'] == 0
+    assert np.isnan(scores['precision'])
+
+    # second segment matches, even though first segment also has onset within tolerance
+    scores = evfuncs.sweep.score_segments([0.991, 0.996], [0.995, 1.1], [1.0], [1.1], tolerance=0.01)
+    assert scores['n_hits'] == 1
+
+    # two segments within tolerance of one reference segment only count as one hit
+    scores = evfuncs.sweep.score_segments([0.995, 1.005], [1.1, 1.105], [1.0], [1.1], tolerance=0.01)
+    assert scores['n_hits'] == 1
+
+
+def test_sweep_files(gy6or6_032312_subset_root, cbins, notmats):
+    scores = evfuncs.sweep.sweep_files(gy6or6_032312_subset_root,
+                                       THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS)
+    assert scores['f1'].shape == (len(THRESHOLDS), len(MIN_SYL_DURS), len(MIN_SILENT_DURS))
+    assert scores['n_ref'] == sum(
+        evfuncs.load_notmat(notmat)['onsets'].shape[0] for notmat in notmats
+    )
+    # must match what we get by scoring each file separately
+    n_hits = 0
+    for cbin, notmat in zip(cbins, notmats):
+        dat, fs = evfuncs.load_cbin(cbin)
+        smooth = evfuncs.smooth_data(dat, fs)
+        onsets, offsets = evfuncs.segment_song(smooth, fs, THRESHOLDS[2], MIN_SYL_DURS[1], MIN_SILENT_DURS[0])
+        nmd = evfuncs.load_notmat(notmat)
+        n_hits += evfuncs.sweep.score_segments(onsets, offsets,
+                                               nmd['onsets'] / 1000, nmd['offsets'] / 1000)['n_hits']
+    assert scores['n_hits'][2, 1, 0] == n_hits
+
+
+def test_sweep_files_list(gy6or6_032312_subset_root, cbins):
+    # list of str paths, not only a directory
+    scores = evfuncs.sweep.sweep_files([str(cbin) for cbin in cbins], THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS)
+    expected = evfuncs.sweep.sweep_files(gy6or6_032312_subset_root, THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS)
+    assert np.array_equal(scores['n_hits'], expected['n_hits'])
+
+
+def test_sweep_files_single_file(cbins, notmats):
+    expected = evfuncs.sweep.sweep_files([cbins[0]], THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS)
+    assert expected['n_ref'] == evfuncs.load_notmat(notmats[0])['onsets'].shape[0]
+    for cbin in (cbins[0], str(cbins[0])):
+        scores = evfuncs.sweep.sweep_files(cbin, THRESHOLDS, MIN_SYL_DURS, MIN_SILENT_DURS)
+        assert scores['n_ref'] == expected['n_ref']
+        assert np.array_equal(scores['n_hits'], expected['n_hits'])